@@ -1,7 +1,9 @@
+import asyncio
 import os
 from WargamesAI.utils.easyLLM import EasyLLM
 from WargamesAI.utils.easyRAG import EasyRAG
 from WargamesAI.utils import json_schemas, pdf_utils
+from WargamesAI.utils.verdict_engine import VerdictEngine, describe_action
 
 class Agent:
     """
@@ -24,6 +26,10 @@ class Agent:
         is_human=False,
         model_name=None,
         bio_folder=".",
+        llm_backend=None,
+        constrained_decoding=False,
+        response_cache=None,
+        verdict_engine=None,
     ):
         """
         Initializes an Agent instance.
@@ -42,13 +48,25 @@ class Agent:
             max_tokens (int): Maximum tokens for LLM responses.
             model_name (str): Name of the language model to use.
             bio_folder (str): Folder to store the bio PDFs.
+            llm_backend (LLMBackend): Inference backend for the agent's LLM, e.g. a shared OpenAIHTTPBackend.
+            constrained_decoding (bool): Whether JSON answers are constrained to their schema during generation.
+            response_cache (ResponseCache): Cache of LLM answers to repeated questions, e.g. get_response_cache().
+            verdict_engine (VerdictEngine): Checks whether actions are in character. Defaults to a VerdictEngine over
+                the bio that escalates to the agent's LLM when unsure.
         """
         if pdf_bio is None and deployment_directive is None:
             raise ValueError("Both 'deployment_directive' and 'pdf_bio' cannot be None!")
 
         self.game = game
-        self.llm = EasyLLM(max_new_tokens=max_tokens, model_name=model_name)
+        self.llm = EasyLLM(
+            max_new_tokens=max_tokens,
+            model_name=model_name,
+            backend=llm_backend,
+            constrained_decoding=constrained_decoding,
+            response_cache=response_cache,
+        )
         self.rag = EasyRAG()
+        self.verdict_engine = verdict_engine or VerdictEngine(self.rag, llm=self.llm)
         self.action_history = []
 
         self._pdf_bio = pdf_bio
@@ -90,12 +108,106 @@ class Agent:
             pdf_utils.write_pdf(self._bio_text, self._pdf_bio)
 
         # Initialize the agent in the LLM
+        rules_prompt = f"Game Rules:\n'{self.game._game_rules_text}'."
         generated_prompt = self.llm.generate_json_prompt(
             json_schemas.DefaultModel,
             f"You are a player in the game with the following rules. Be ready to play the game. Enjoy!\n\n"
-            f"Game Rules:\n'{self.game._game_rules_text}'.\n\nYour player character bio:\n'{self._bio_text}'",
+            f"{rules_prompt}\n\nYour player character bio:\n'{self._bio_text}'",
         )
-        self.llm.ask_question(generated_prompt)
+        # The rules prefix is shared by every agent on the same model, the rules plus bio prefix by this agent
+        self.llm.cache_prefix(generated_prompt, text_end=rules_prompt)
+        self.llm.ask_question(generated_prompt, pin=True)
+        self.llm.cache_prefix()
+
+    def to_state(self):
+        """
+        Returns the agent's parameters, action history and dialogue as plain data for a checkpoint.
+
+        Returns:
+            dict: The agent's state.
+        """
+        return {
+            "pdf_bio": self._pdf_bio,
+            "deployment_directive": self._deployment_directive,
+            "factions": self._factions,
+            "beliefs": self._beliefs,
+            "disposition": self._disposition,
+            "empathy": self._empathy,
+            "exercise_objectives": self._exercise_objectives,
+            "strategic_objectives": self._strategic_objectives,
+            "notes": self._notes,
+            "is_human": self._is_human,
+            "bio_text": self._bio_text,
+            "name": self._name,
+            "action_history": self.action_history,
+            "llm": self.llm.to_state(),
+        }
+
+    @classmethod
+    def from_state(
+        cls,
+        game,
+        state,
+        llm_backend=None,
+        constrained_decoding=False,
+        response_cache=None,
+        verdict_engine=None,
+    ):
+        """
+        Restores an agent saved by to_state(). Its dialogue already holds the rules and bio primer, so no
+        initialization prompt is asked again.
+
+        Args:
+            game: The game instance.
+            state (dict): The saved state.
+            llm_backend (LLMBackend): Inference backend for the agent's LLM.
+            constrained_decoding (bool): Whether JSON answers are constrained to their schema during generation.
+            response_cache (ResponseCache): Cache of LLM answers to repeated questions.
+            verdict_engine (VerdictEngine): Checks whether actions are in character. Defaults to a VerdictEngine over
+                the bio that escalates to the agent's LLM when unsure.
+
+        Returns:
+            Agent: The restored agent.
+        """
+        agent = cls.__new__(cls)
+        agent.game = game
+        agent.llm = EasyLLM(
+            max_new_tokens=state["llm"]["max_new_tokens"],
+            model_name=state["llm"]["model_name"],
+            backend=llm_backend,
+            constrained_decoding=constrained_decoding,
+            response_cache=response_cache,
+        )
+        agent.llm.load_state(state["llm"])
+        agent.rag = EasyRAG()
+        agent.verdict_engine = verdict_engine or VerdictEngine(agent.rag, llm=agent.llm)
+        agent.action_history = list(state["action_history"])
+
+        agent._pdf_bio = state["pdf_bio"]
+        agent._deployment_directive = state["deployment_directive"]
+        agent._factions = state["factions"]
+        agent._beliefs = state["beliefs"]
+        agent._disposition = state["disposition"]
+        agent._empathy = state["empathy"]
+        agent._exercise_objectives = state["exercise_objectives"]
+        agent._strategic_objectives = state["strategic_objectives"]
+        agent._notes = state["notes"]
+        agent._is_human = state["is_human"]
+        agent._bio_text = state["bio_text"]
+        agent._name = state["name"]
+
+        # The in-character check needs the bio, which may not have been copied along with the checkpoint
+        if not os.path.exists(agent._pdf_bio):
+            bio_folder = os.path.dirname(agent._pdf_bio)
+            if bio_folder and not os.path.exists(bio_folder):
+                os.makedirs(bio_folder)
+            pdf_utils.write_pdf(agent._bio_text, agent._pdf_bio)
+
+        # Rebuild the cached prefixes __init__ would have: the rules shared by every agent on the model, then this
+        # agent's restored dialogue, which every later prompt starts with
+        agent.llm.cache_prefix(text_end=f"Game Rules:\n'{game._game_rules_text}'.")
+        agent.llm.cache_prefix()
+        return agent
 
     def _generate_params_from_pdf(self):
         """
@@ -183,13 +295,32 @@ class Agent:
 
         return "\n".join(bio_parts)
 
-    def request_action(self, scenario, attempts=5):
+    def _check_in_character(self, response):
+        """
+        Checks whether an action is in character for the agent's bio.
+
+        Args:
+            response: The action to check.
+
+        Returns:
+            Verdict: The verdict, truthy if the action is in character.
+        """
+        return self.verdict_engine.judge(
+            f"This person does the following: {describe_action(response)}",
+            self._pdf_bio,
+            question=f"Would this user perform the following action? Action: {response}",
+            kind="in_character",
+        )
+
+    def request_action(self, scenario, attempts=5, cache_context=None):
         """
         Requests an action from the agent based on a scenario.
 
         Args:
             scenario (str): The scenario to present to the agent.
             attempts (int): Maximum number of attempts to generate an in-character action.
+            cache_context: What the action depends on besides the scenario, e.g. a digest of the game state, so a
+                cached action is only reused in the same situation.
 
         Returns:
             The agent's action response if valid, else False.
@@ -197,13 +328,43 @@ class Agent:
         original_prompt = f"Scenario: {scenario}"
         for attempt in range(attempts):
             response = self.llm.ask_question(
-                self.llm.generate_json_prompt(json_schemas.ActionResponseModel, original_prompt)
+                self.llm.generate_json_prompt(json_schemas.ActionResponseModel, original_prompt),
+                cache_context=cache_context,
             )
 
-            is_in_character = self.rag.ask_question_with_pdf(
-                f"Would this user perform the following action? Action: {response}", self._pdf_bio
+            is_in_character = self._check_in_character(response)
+
+            if is_in_character:
+                self.action_history.append(response)
+                return response
+            else:
+                original_prompt = f"Your last response was deemed out of character. Try again. {scenario}"
+
+        return False  # Failed to generate a valid action
+
+    async def request_action_async(self, scenario, attempts=5, cache_context=None):
+        """
+        Asynchronous variant of request_action. Generation and the in-character check run in worker threads so
+        other players' turns can overlap with them.
+
+        Args:
+            scenario (str): The scenario to present to the agent.
+            attempts (int): Maximum number of attempts to generate an in-character action.
+            cache_context: What the action depends on besides the scenario, e.g. a digest of the game state, so a
+                cached action is only reused in the same situation.
+
+        Returns:
+            The agent's action response if valid, else False.
+        """
+        original_prompt = f"Scenario: {scenario}"
+        for attempt in range(attempts):
+            response = await self.llm.ask_question_async(
+                self.llm.generate_json_prompt(json_schemas.ActionResponseModel, original_prompt),
+                cache_context=cache_context,
             )
 
+            is_in_character = await asyncio.to_thread(self._check_in_character, response)
+
             if is_in_character:
                 self.action_history.append(response)
                 return response
@@ -1,4 +1,8 @@
 from .umpire import Umpire
 from .game import Game
 from .game_runner import GameRunner
-from .story_teller import StoryTeller
\ No newline at end of file
+from .scheduler import TurnScheduler
+from .game_state import GameStateView
+from .story_teller import StoryTeller
+from .verdicts import VerdictCache
+from .game_farm import GameFarm
\ No newline at end of file
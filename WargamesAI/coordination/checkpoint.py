@@ -0,0 +1,56 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict
+
+# Bump when the checkpoint format changes
+CHECKPOINT_FORMAT_VERSION = 2
+
+
+def write_checkpoint(path: str, state: Dict[str, Any]) -> int:
+    """
+    Writes a game checkpoint as gzip-compressed JSON. The file is replaced atomically, so a crash while writing
+    leaves the previous checkpoint intact.
+
+    Args:
+        path (str): Path of the checkpoint file, e.g. "game.ckpt.json.gz".
+        state (dict): The state to save, e.g. from GameRunner.to_state().
+
+    Returns:
+        int: Size of the checkpoint in bytes.
+    """
+    payload = {"version": CHECKPOINT_FORMAT_VERSION, "created": time.time(), "state": state}
+    data = gzip.compress(json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8"))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".checkpoint-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(data)
+
+
+def read_checkpoint(path: str) -> Dict[str, Any]:
+    """
+    Reads a checkpoint written by write_checkpoint().
+
+    Args:
+        path (str): Path of the checkpoint file.
+
+    Returns:
+        dict: The saved state.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        payload = json.load(file)
+    if payload.get("version") != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {payload.get('version')} in '{path}'.")
+    return payload["state"]
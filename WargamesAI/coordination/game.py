@@ -1,5 +1,6 @@
 import os
-from WargamesAI.utils import pdf_utils
+from WargamesAI.agents.agent import Agent
+from WargamesAI.utils import ingestion, pdf_utils
 
 class Game:
     """
@@ -55,6 +56,62 @@ class Game:
         self._resources = resources
         self._use_dice = use_dice
 
+    def to_state(self):
+        """
+        Returns the game, including the cards left in the deck and every agent's state, as plain data for a
+        checkpoint.
+
+        Returns:
+            dict: The game's state.
+        """
+        return {
+            "rounds": self._rounds,
+            "use_dice": self._use_dice,
+            "cards": self._cards,
+            "resources": self._resources,
+            "game_rules_text": self._game_rules_text,
+            "game_rules_pdf": self._game_rules_pdf,
+            "teams": {
+                team: [{name: agent.to_state() for name, agent in player.items()} for player in players]
+                for team, players in self._teams.items()
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state, **agent_options):
+        """
+        Restores a game saved by to_state(), restoring its agents without re-running their initialization.
+
+        Args:
+            state (dict): The saved state.
+            **agent_options: Passed on to Agent.from_state, e.g. llm_backend or response_cache.
+
+        Returns:
+            Game: The restored game.
+        """
+        game = cls.__new__(cls)
+        game._rounds = state["rounds"]
+        game._use_dice = state["use_dice"]
+        game._cards = state["cards"]
+        game._resources = state["resources"]
+        game._game_rules_text = state["game_rules_text"]
+        game._game_rules_pdf = state["game_rules_pdf"]
+
+        if not os.path.exists(game._game_rules_pdf):
+            rules_folder = os.path.dirname(game._game_rules_pdf)
+            if rules_folder and not os.path.exists(rules_folder):
+                os.makedirs(rules_folder)
+            pdf_utils.write_pdf(game._game_rules_text, game._game_rules_pdf)
+
+        game._teams = {
+            team: [
+                {name: Agent.from_state(game, agent_state, **agent_options) for name, agent_state in player.items()}
+                for player in players
+            ]
+            for team, players in state["teams"].items()
+        }
+        return game
+
     def add_team(self, team_name, actors):
         """
         Adds a team to the game.
@@ -67,6 +124,31 @@ class Game:
             raise ValueError(f"Team '{team_name}' already exists!")
         self._teams[team_name] = actors
 
+    def ingest_documents(self, extra_pdfs=None, rag=None, max_workers=None):
+        """
+        Builds the retrieval indexes for the rules PDF and every agent's PDF bio in parallel, so later rule and
+        in-character checks only need to embed their query.
+
+        Args:
+            extra_pdfs (list): Additional PDFs to ingest, e.g. bios of agents that have not been created yet.
+            rag: The EasyRAG instance whose settings are used. Defaults to a new EasyRAG.
+            max_workers (int): Number of worker processes used for PDF parsing.
+
+        Returns:
+            IngestionReport: Pages/sec, chunks/sec and totals for the run.
+        """
+        pdf_paths = [self._game_rules_pdf]
+        for team in self._teams.values():
+            for player in team:
+                for agent in player.values():
+                    if getattr(agent, "_pdf_bio", None):
+                        pdf_paths.append(agent._pdf_bio)
+        pdf_paths.extend(extra_pdfs or [])
+
+        report = ingestion.ingest_pdfs(pdf_paths, rag=rag, max_workers=max_workers)
+        print(report)
+        return report
+
     @property
     def teams(self):
         """Returns a copy of the teams dictionary."""
@@ -0,0 +1,257 @@
+import os
+import statistics
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from WargamesAI.coordination.game_runner import GameRunner
+from WargamesAI.utils.llm_backends import get_default_backend, set_default_backend, set_generation_seed
+
+
+class ReplicateResult:
+    """
+    The outcome of one replicate of a game run by a GameFarm.
+    """
+
+    def __init__(self, index: int, seed: int) -> None:
+        self.index = index
+        self.seed = seed
+        self.winner: Optional[Dict[str, Any]] = None
+        self.action_counts: Counter = Counter()
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def winning_side(self) -> Optional[str]:
+        """Returns the winning team, with the winning player if a single player won."""
+        if not isinstance(self.winner, dict):
+            return None
+        team = self.winner.get("WINNING_TEAN", self.winner.get("WINNING_TEAM"))
+        player = self.winner.get("WINNING_PLAYER")
+        if player and str(player).strip().lower() != "none":
+            return f"{team}/{player}"
+        return str(team)
+
+    def __str__(self) -> str:
+        if self.error:
+            return f"Replicate {self.index} (seed {self.seed}) failed after {self.seconds:.2f}s: {self.error}"
+        return f"Replicate {self.index} (seed {self.seed}): winner {self.winning_side} in {self.seconds:.2f}s."
+
+
+class FarmReport:
+    """
+    Aggregated outcomes of the replicates run by a GameFarm.
+    """
+
+    def __init__(self, replicates: int, workers: int) -> None:
+        self.replicates = replicates
+        self.workers = workers
+        self.completed = 0
+        self.failed = 0
+        self.winners: Counter = Counter()
+        self.action_counts: Counter = Counter()
+        self.game_seconds: List[float] = []
+        self.wall_seconds = 0.0
+
+    def add(self, result: ReplicateResult) -> None:
+        """
+        Adds a replicate's outcome to the totals.
+
+        Args:
+            result (ReplicateResult): The replicate's outcome.
+        """
+        if result.error:
+            self.failed += 1
+            return
+        self.completed += 1
+        self.winners[result.winning_side] += 1
+        self.action_counts.update(result.action_counts)
+        self.game_seconds.append(result.seconds)
+
+    @property
+    def winner_distribution(self) -> Dict[str, float]:
+        """Returns the fraction of completed games won by each side."""
+        return {side: count / self.completed for side, count in self.winners.most_common()} if self.completed else {}
+
+    @property
+    def games_per_hour(self) -> float:
+        """Returns the number of completed games per hour of wall-clock time."""
+        return self.completed * 3600 / self.wall_seconds if self.wall_seconds else 0.0
+
+    def latency(self) -> Dict[str, float]:
+        """
+        Returns per-game latency statistics in seconds.
+
+        Returns:
+            dict: The mean, median and 95th percentile game time.
+        """
+        if not self.game_seconds:
+            return {"mean": 0.0, "p50": 0.0, "p95": 0.0}
+        ordered = sorted(self.game_seconds)
+        return {
+            "mean": statistics.fmean(ordered),
+            "p50": statistics.median(ordered),
+            "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        }
+
+    def __str__(self) -> str:
+        latency = self.latency()
+        winners = ", ".join(f"{side} {share:.0%}" for side, share in self.winner_distribution.items()) or "none"
+        actions = ", ".join(f"'{action}' x{count}" for action, count in self.action_counts.most_common(5)) or "none"
+        return (
+            f"{self.completed}/{self.replicates} games completed ({self.failed} failed) on {self.workers} workers in "
+            f"{self.wall_seconds:.1f}s, {self.games_per_hour:.1f} games/hour. "
+            f"Game time mean {latency['mean']:.2f}s, p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s. "
+            f"Winners: {winners}. Most frequent actions: {actions}."
+        )
+
+
+def _action_label(action: Any, max_chars: int = 80) -> str:
+    """
+    Returns the normalized text an action is counted under.
+    """
+    text = action.get("ACTION", action) if isinstance(action, dict) else action
+    text = " ".join(str(text).split()).lower()
+    return text[:max_chars]
+
+
+def _init_worker(backend_factory: Optional[Callable[[], Any]]) -> None:
+    """
+    Sets up a worker process: every EasyLLM it builds uses the backend returned by backend_factory.
+    """
+    if backend_factory is not None:
+        set_default_backend(backend_factory())
+
+
+def _run_replicate(job: Tuple[Callable[[int], Tuple[Any, Any]], int, int]) -> ReplicateResult:
+    """
+    Builds and plays one replicate, then asks the umpire for the winner. Runs in a worker.
+
+    The seed is not applied to the shared global random module, which threads running other replicates also use.
+    The builder passes it to the umpire's own generator, and every EasyLLM built for the game samples with it.
+
+    Args:
+        job (Tuple[Callable, int, int]): The game builder, the replicate index and its seed.
+
+    Returns:
+        ReplicateResult: The replicate's outcome.
+    """
+    build_game, index, seed = job
+    result = ReplicateResult(index, seed)
+    start = time.perf_counter()
+    try:
+        set_generation_seed(seed)
+        game, umpire = build_game(seed)
+        GameRunner(game, umpire).run_all_rounds()
+        result.winner = umpire.deduce_winner()
+        result.action_counts = Counter(_action_label(action) for action in umpire.actions)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    finally:
+        # Pool threads are reused, so the next replicate on this thread must not inherit the seed
+        set_generation_seed(None)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+class GameFarm:
+    """
+    Runs many seeded replicates of a game to estimate the distribution of its outcomes.
+
+    A game is defined by a builder, build_game(seed) -> (game, umpire), which should pass the seed on to
+    Umpire(seed=seed); the game's models sample with seeds derived from it. Replicates run in a pool of threads
+    sharing this process's model pool, or in a pool of worker processes each generating through a shared model
+    server (backend_factory, e.g. a function returning an OpenAIHTTPBackend). Results are streamed as replicates
+    finish and aggregated into a FarmReport.
+    """
+
+    def __init__(
+        self,
+        build_game: Callable[[int], Tuple[Any, Any]],
+        replicates: int = 10,
+        workers: Optional[int] = None,
+        base_seed: int = 0,
+        use_processes: bool = False,
+        backend_factory: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """
+        Initializes the GameFarm.
+
+        Args:
+            build_game (Callable): Builds a replicate's game and umpire from its seed. Must be picklable, i.e. a
+                module-level function, when use_processes is True.
+            replicates (int): Number of games to run.
+            workers (int): Number of games run at once. Defaults to the number of CPUs.
+            base_seed (int): Seed of the first replicate; replicate i uses base_seed + i.
+            use_processes (bool): Whether to run replicates in worker processes rather than threads. Requires
+                backend_factory, as each process would otherwise load its own copy of every model.
+            backend_factory (Callable): Builds the LLM backend each worker generates with. Must be picklable when
+                use_processes is True. If None, threads share this process's in-process models.
+        """
+        if use_processes and backend_factory is None:
+            raise ValueError(
+                "use_processes requires a backend_factory: without a shared model server every worker process "
+                "would load its own copy of the models."
+            )
+        self.build_game = build_game
+        self.replicates = replicates
+        self.workers = max(1, min(workers or os.cpu_count() or 1, replicates))
+        self.base_seed = base_seed
+        self.use_processes = use_processes
+        self.backend_factory = backend_factory
+        self.report = FarmReport(replicates, self.workers)
+
+    def _executor(self) -> Executor:
+        if self.use_processes:
+            return ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.backend_factory,)
+            )
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def stream(self) -> Iterator[ReplicateResult]:
+        """
+        Runs every replicate, yielding each result as soon as its game finishes. The totals are kept in report.
+
+        With threads and a backend_factory, the backend is this process's default only while the farm runs; the
+        previous default is restored afterwards.
+
+        Yields:
+            ReplicateResult: The outcome of each replicate, in completion order.
+        """
+        self.report = FarmReport(self.replicates, self.workers)
+        previous_backend = get_default_backend()
+        backend = None
+        if not self.use_processes and self.backend_factory is not None:
+            backend = self.backend_factory()
+            set_default_backend(backend)
+        start = time.perf_counter()
+        try:
+            with self._executor() as executor:
+                futures = [
+                    executor.submit(_run_replicate, (self.build_game, index, self.base_seed + index))
+                    for index in range(self.replicates)
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    self.report.add(result)
+                    self.report.wall_seconds = time.perf_counter() - start
+                    yield result
+        finally:
+            if backend is not None:
+                set_default_backend(previous_backend)
+                backend.close()
+
+    def run(self) -> FarmReport:
+        """
+        Runs every replicate, printing each result as it arrives.
+
+        Returns:
+            FarmReport: The aggregated outcomes.
+        """
+        for result in self.stream():
+            print(result)
+        print(self.report)
+        return self.report
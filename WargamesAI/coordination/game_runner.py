@@ -1,19 +1,144 @@
+from WargamesAI.coordination.checkpoint import read_checkpoint, write_checkpoint
+from WargamesAI.coordination.game import Game
+from WargamesAI.coordination.scheduler import TurnScheduler
+from WargamesAI.coordination.umpire import Umpire
+
+CHECKPOINT_INTERVALS = ("round", "turn")
+
+
 class GameRunner:
     """
     Runs the game rounds and handles the flow of the game.
     """
 
-    def __init__(self, game, umpire):
+    def __init__(self, game, umpire, checkpoint_path=None, checkpoint_every="round"):
         """
         Initializes the GameRunner.
 
         Args:
             game: The game instance.
             umpire: The umpire instance.
+            checkpoint_path (str): File the game is checkpointed to as it runs, e.g. "game.ckpt.json.gz". Disabled
+                if None.
+            checkpoint_every (str): Whether a checkpoint is written after every "round" or every "turn". The
+                asyncio path always checkpoints per round, as the turns of a round may finish out of order.
         """
+        if checkpoint_every not in CHECKPOINT_INTERVALS:
+            raise ValueError(f"checkpoint_every must be one of {CHECKPOINT_INTERVALS}, got '{checkpoint_every}'.")
+
         self._game = game
         self._umpire = umpire
         self._current_round_index = 0
+        # Turns of the current round already played, and their responses, when stopped or resumed mid-round
+        self._current_turn_index = 0
+        self._turn_responses = []
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.round_reports = []
+
+    @property
+    def game(self):
+        """Returns the game being run."""
+        return self._game
+
+    @property
+    def umpire(self):
+        """Returns the game's umpire."""
+        return self._umpire
+
+    def to_state(self):
+        """
+        Returns the position in the game, the game with its agents and the umpire as plain data for a checkpoint.
+
+        Returns:
+            dict: The runner's state.
+        """
+        return {
+            "round_index": self._current_round_index,
+            "turn_index": self._current_turn_index,
+            "turn_responses": self._turn_responses,
+            "game": self._game.to_state(),
+            "umpire": self._umpire.to_state(),
+        }
+
+    def checkpoint(self, path=None):
+        """
+        Writes a checkpoint the game can be resumed from with GameRunner.resume().
+
+        Args:
+            path (str): File to write. Defaults to checkpoint_path.
+
+        Returns:
+            int: Size of the checkpoint in bytes.
+        """
+        path = path or self.checkpoint_path
+        if path is None:
+            raise ValueError("No checkpoint path given.")
+        return write_checkpoint(path, self.to_state())
+
+    def _turn_finished(self, response):
+        """
+        Records a finished turn of the current round and checkpoints if checkpoints are per turn.
+        """
+        self._turn_responses.append(response)
+        self._current_turn_index += 1
+        if self.checkpoint_path and self.checkpoint_every == "turn":
+            self.checkpoint()
+
+    def _round_finished(self):
+        """
+        Moves on to the next round and checkpoints.
+        """
+        self._current_round_index += 1
+        self._current_turn_index = 0
+        self._turn_responses = []
+        if self.checkpoint_path:
+            self.checkpoint()
+
+    @classmethod
+    def resume(
+        cls,
+        path,
+        llm_backend=None,
+        constrained_decoding=False,
+        response_cache=None,
+        checkpoint_path=None,
+        checkpoint_every="round",
+    ):
+        """
+        Restores a game from a checkpoint, ready to continue from the next unplayed turn. The agents and the umpire
+        get their saved dialogues back, so none of their initialization prompts are asked again.
+
+        Args:
+            path (str): The checkpoint file.
+            llm_backend (LLMBackend): Inference backend for every restored LLM.
+            constrained_decoding (bool): Whether JSON answers are constrained to their schema during generation.
+            response_cache (ResponseCache): Cache of LLM answers to repeated questions.
+            checkpoint_path (str): File later checkpoints are written to. Defaults to path.
+            checkpoint_every (str): Whether later checkpoints are written every "round" or every "turn".
+
+        Returns:
+            GameRunner: The restored runner; its game and umpire are available as runner.game and runner.umpire.
+        """
+        state = read_checkpoint(path)
+        options = {
+            "llm_backend": llm_backend,
+            "constrained_decoding": constrained_decoding,
+            "response_cache": response_cache,
+        }
+
+        game = Game.from_state(state["game"], **options)
+        umpire = Umpire.from_state(game, state["umpire"], **options)
+
+        runner = cls(game, umpire, checkpoint_path=checkpoint_path or path, checkpoint_every=checkpoint_every)
+        runner._current_round_index = state["round_index"]
+        runner._current_turn_index = state["turn_index"]
+        runner._turn_responses = list(state["turn_responses"])
+        print(
+            f"Resumed game from '{path}' at round {runner._current_round_index + 1}, "
+            f"turn {runner._current_turn_index + 1}."
+        )
+        return runner
 
     def perform_round(self):
         """
@@ -27,15 +152,17 @@ class GameRunner:
         if self._current_round_index >= len(rounds):
             return False
 
-        round_results = {}
         current_round = rounds[self._current_round_index]
+        self._umpire.start_round(self._current_round_index)
 
-        for turn in current_round:
+        for turn in current_round[self._current_turn_index:]:
             response = self._umpire.engage_turn(turn)
-            activity = turn["ACTIVITY"]
-            round_results[activity] = response
+            self._turn_finished(response)
 
-        self._current_round_index += 1
+        round_results = {
+            turn["ACTIVITY"]: response for turn, response in zip(current_round, self._turn_responses)
+        }
+        self._round_finished()
         return round_results
 
     def run_all_rounds(self):
@@ -54,9 +181,10 @@ class GameRunner:
 
         for round_index in range(self._current_round_index, len(rounds)):
             current_round = rounds[round_index]
-            round_results = {}
+            self._umpire.start_round(round_index)
 
-            for turn_index, turn in enumerate(current_round):
+            for turn_index in range(self._current_turn_index, len(current_round)):
+                turn = current_round[turn_index]
                 team = turn.get("TEAM", "Unknown Team")
                 player = turn.get("PLAYER", "Unknown Player")
                 activity = turn.get("ACTIVITY", "No Activity")
@@ -65,10 +193,65 @@ class GameRunner:
                 )
 
                 response = self._umpire.engage_turn(turn)
-                round_results[turn_index] = response
                 print(f"Response: {response}")
+                self._turn_finished(response)
+
+            results[round_index] = dict(enumerate(self._turn_responses))
+            self._round_finished()
+
+        return results
+
+    async def run_all_rounds_async(self, max_concurrency=1, scheduler=None):
+        """
+        Runs all remaining rounds in the game on the asyncio execution path. Turns within a round are scheduled by a
+        TurnScheduler: independent turns run concurrently, up to max_concurrency at a time, turns that depend on each
+        other keep their order, and results are returned in turn order. Timing for each round is kept in
+        round_reports.
+
+        Args:
+            max_concurrency (int): Maximum number of turns of a round in flight at once. 1 keeps the serial order.
+            scheduler (TurnScheduler): Scheduler to use instead of the default one built from max_concurrency.
+
+        Returns:
+            A dictionary with the results of all rounds.
+        """
+        results = {}
+
+        rounds = self._game._rounds
+
+        if self._current_round_index >= len(rounds):
+            return False
+
+        scheduler = scheduler or TurnScheduler(width=max_concurrency, teams=self._game._teams)
+
+        for round_index in range(self._current_round_index, len(rounds)):
+            current_round = rounds[round_index]
+            self._umpire.start_round(round_index)
+            # A round resumed mid-way only plays its remaining turns
+            first_turn = self._current_turn_index
+            remaining_turns = current_round[first_turn:]
+            turn_numbers = {id(turn): first_turn + turn_index for turn_index, turn in enumerate(remaining_turns)}
+
+            async def engage(turn):
+                team = turn.get("TEAM", "Unknown Team")
+                player = turn.get("PLAYER", "Unknown Player")
+                activity = turn.get("ACTIVITY", "No Activity")
+                print(
+                    f"Round {round_index + 1}, Turn {turn_numbers[id(turn)] + 1}: {team} - {player}: {activity}"
+                )
+
+                response = await self._umpire.engage_turn_async(turn)
+                print(f"Response: {response}")
+                return response
+
+            round_results, report = await scheduler.run_round(remaining_turns, engage, round_index)
+            print(report)
 
-            results[round_index] = round_results
-            self._current_round_index += 1
+            results[round_index] = {
+                **dict(enumerate(self._turn_responses)),
+                **{first_turn + turn_index: response for turn_index, response in round_results.items()},
+            }
+            self.round_reports.append(report)
+            self._round_finished()
 
         return results
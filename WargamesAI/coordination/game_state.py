@@ -0,0 +1,287 @@
+import copy
+import json
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from WargamesAI.utils.dialogue_memory import approximate_token_count
+from WargamesAI.utils.verdict_engine import describe_action
+
+
+def _action_targets(action: Any) -> List[str]:
+    """
+    Returns the targets of an action as a list of names.
+
+    Args:
+        action: The action, usually an ActionResponse dictionary.
+
+    Returns:
+        List[str]: The targets, or an empty list.
+    """
+    targets = action.get("TARGETS") if isinstance(action, dict) else None
+    if not targets:
+        return []
+    return [str(target) for target in targets] if isinstance(targets, list) else [str(targets)]
+
+
+class _ActionEntry:
+    """
+    An action recorded in the game state, with its renderings and their token counts computed once.
+    """
+
+    def __init__(
+        self,
+        round_index: int,
+        actor: Optional[str],
+        action: Any,
+        summary_chars: int,
+        count_tokens: Callable[[str], int],
+    ) -> None:
+        self.round_index = round_index
+        self.actor = actor
+        self.action = action
+        self.description = describe_action(action, rationale=False, targets=True, max_chars=summary_chars)
+        self.full = {"ROUND": round_index + 1, "ACTION": action}
+        if actor:
+            self.full["PLAYER"] = actor
+        self.full_tokens = count_tokens(json.dumps(self.full, default=str))
+
+
+class GameStateView:
+    """
+    A compact, incrementally maintained view of the game state for use in prompts.
+
+    The view holds a team roster by name, the most recent actions in full, and a digest of each older round. Actions
+    that leave the recent window are folded into their round's digest, which keeps per team only how many actions
+    it took, its latest action, the umpire's latest outcome for it and its net resource changes, so a round's digest
+    stays the same size however many actions it had. The view is updated as each action is recorded rather than
+    rebuilt from the full history, and when rendered it is kept within a token budget by dropping the oldest round
+    digests first and then the oldest recent actions.
+    """
+
+    def __init__(
+        self,
+        recent_window: int = 8,
+        token_budget: Optional[int] = 1500,
+        summary_chars: int = 160,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        """
+        Initializes the GameStateView.
+
+        Args:
+            recent_window (int): Number of most recent actions kept in full.
+            token_budget (int): Maximum tokens for the rendered view. None means no limit.
+            summary_chars (int): Maximum characters per action or outcome in the round digests.
+            count_tokens (Callable): Function returning the token count of a text. Defaults to an estimate.
+        """
+        self.recent_window = recent_window
+        self.token_budget = token_budget
+        self.summary_chars = summary_chars
+        self.count_tokens = count_tokens or approximate_token_count
+        self.round_index = 0
+        self._recent: "deque[_ActionEntry]" = deque()
+        # Digests of each round by team, built from actions that left the recent window and from resource changes,
+        # with the token counts of their rendered lines cached
+        self._digests: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._digest_tokens: Dict[int, int] = {}
+        self._roster: Dict[str, List[str]] = {}
+        self._roster_key: Optional[Tuple] = None
+        self._roster_tokens = 0
+        self._rendered: Optional[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+
+    def start_round(self, round_index: int) -> None:
+        """
+        Marks the start of a new round. Later actions are attributed to this round.
+
+        Args:
+            round_index (int): The index of the round.
+        """
+        with self._lock:
+            self.round_index = round_index
+            self._rendered = None
+
+    def record(self, action: Any, actor: Optional[str] = None) -> None:
+        """
+        Records an action. Once more than recent_window actions are held, the oldest one is folded into the
+        digest of its round.
+
+        Args:
+            action: The action, usually an ActionResponse dictionary.
+            actor (str): Who took the action, e.g. "TEAM/Player" or "Umpire".
+        """
+        with self._lock:
+            self._recent.append(_ActionEntry(self.round_index, actor, action, self.summary_chars, self.count_tokens))
+            while len(self._recent) > self.recent_window:
+                self._fold(self._recent.popleft())
+            self._rendered = None
+
+    def record_resource_change(self, team: str, resource: str, delta: float) -> None:
+        """
+        Records a change to a team's resources in the digest of the current round.
+
+        Args:
+            team (str): The team whose resources changed.
+            resource (str): The resource name.
+            delta (float): The amount added, negative for an amount removed.
+        """
+        with self._lock:
+            changes = self._team_digest(self.round_index, team)["changes"]
+            changes[resource] = changes.get(resource, 0) + delta
+            self._digest_tokens.pop(self.round_index, None)
+            self._rendered = None
+
+    def _team_digest(self, round_index: int, team: str) -> Dict[str, Any]:
+        return self._digests.setdefault(round_index, {}).setdefault(
+            team, {"actions": 0, "latest": None, "outcome": None, "changes": {}}
+        )
+
+    def _team_of(self, name: str) -> Optional[str]:
+        """
+        Returns the team a player or team name belongs to according to the roster, or None if it is unknown.
+        """
+        if name in self._roster:
+            return name
+        return next((team for team, players in self._roster.items() if name in players), None)
+
+    def _fold(self, entry: _ActionEntry) -> None:
+        """
+        Folds an action that left the recent window into the digest of its round. An umpire action is the outcome
+        for the teams it targets, and any other action counts towards its actor's team.
+        """
+        if entry.actor == "Umpire":
+            teams = {self._team_of(target) for target in _action_targets(entry.action)} - {None}
+            for team in sorted(teams):
+                self._team_digest(entry.round_index, team)["outcome"] = entry.description
+            if teams:
+                self._digest_tokens.pop(entry.round_index, None)
+                return
+
+        team = entry.actor.split("/", 1)[0] if entry.actor else "Players"
+        digest = self._team_digest(entry.round_index, team)
+        digest["actions"] += 1
+        digest["latest"] = entry.description
+        if entry.actor and "/" in entry.actor:
+            digest["latest"] = f"{entry.actor.split('/', 1)[1]}: {entry.description}"
+        self._digest_tokens.pop(entry.round_index, None)
+
+    def set_roster(self, teams: Dict[str, list]) -> None:
+        """
+        Updates the team roster from the game's teams, keeping only team and player names.
+
+        Args:
+            teams (dict): The game's teams, mapping team names to lists of {player name: agent} dictionaries.
+        """
+        key = tuple((team, tuple(name for actor in actors for name in actor)) for team, actors in teams.items())
+        with self._lock:
+            if key == self._roster_key:
+                return
+            self._roster_key = key
+            self._roster = {team: list(names) for team, names in key}
+            self._roster_tokens = self.count_tokens(json.dumps(self._roster))
+            self._rendered = None
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Returns the view as plain data for a checkpoint. The roster is not stored, it is rebuilt from the game.
+
+        Returns:
+            dict: The current round, the recent actions and the round digests.
+        """
+        with self._lock:
+            return {
+                "round_index": self.round_index,
+                "recent": [[entry.round_index, entry.actor, entry.action] for entry in self._recent],
+                "digests": [[round_index, copy.deepcopy(teams)] for round_index, teams in self._digests.items()],
+            }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Replaces the view with one saved by to_state().
+
+        Args:
+            state (dict): The saved view.
+        """
+        with self._lock:
+            self.round_index = state["round_index"]
+            self._recent = deque(
+                _ActionEntry(round_index, actor, action, self.summary_chars, self.count_tokens)
+                for round_index, actor, action in state["recent"]
+            )
+            self._digests = {round_index: teams for round_index, teams in state["digests"]}
+            self._digest_tokens = {}
+            self._roster_key = None
+            self._rendered = None
+
+    def _digest_line(self, round_index: int) -> Tuple[str, int]:
+        parts = []
+        for team, digest in self._digests[round_index].items():
+            details = []
+            if digest["actions"]:
+                plural = "action" if digest["actions"] == 1 else "actions"
+                details.append(f"{digest['actions']} {plural}, latest {digest['latest']}")
+            if digest["outcome"]:
+                details.append(f"outcome: {digest['outcome']}")
+            if digest["changes"]:
+                details.append(
+                    "resources " + ", ".join(f"{resource} {delta:+g}" for resource, delta in digest["changes"].items())
+                )
+            parts.append(f"{team}: " + "; ".join(details))
+        line = f"Round {round_index + 1}: " + ". ".join(parts)
+        if round_index not in self._digest_tokens:
+            self._digest_tokens[round_index] = self.count_tokens(line)
+        return line, self._digest_tokens[round_index]
+
+    def render(self) -> Dict[str, Any]:
+        """
+        Returns the view as a dictionary of roster, round digests and recent actions, within the token budget.
+        The result is reused until the state changes.
+
+        Returns:
+            dict: The compact game state.
+        """
+        with self._lock:
+            if self._rendered is not None:
+                return self._rendered
+
+            remaining = self.token_budget - self._roster_tokens if self.token_budget is not None else None
+
+            # The newest actions are the most relevant, so they are kept first
+            recent = []
+            for entry in reversed(self._recent):
+                if remaining is not None and entry.full_tokens > remaining:
+                    break
+                recent.append(entry.full)
+                if remaining is not None:
+                    remaining -= entry.full_tokens
+            recent.reverse()
+
+            summary = []
+            omitted_rounds = 0
+            rounds = sorted(self._digests, reverse=True)
+            for position, round_index in enumerate(rounds):
+                line, tokens = self._digest_line(round_index)
+                if remaining is not None and tokens > remaining:
+                    omitted_rounds = len(rounds) - position
+                    break
+                summary.append(line)
+                if remaining is not None:
+                    remaining -= tokens
+            summary.reverse()
+            if omitted_rounds:
+                summary.insert(0, f"({omitted_rounds} earlier rounds omitted)")
+
+            self._rendered = {
+                "round": self.round_index + 1,
+                "teams": self._roster,
+                "summary": summary,
+                "recent_actions": recent,
+            }
+            return self._rendered
+
+    def token_count(self) -> int:
+        """
+        Returns the token count of the rendered view.
+        """
+        return self.count_tokens(json.dumps(self.render(), default=str))
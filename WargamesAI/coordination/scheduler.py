@@ -0,0 +1,248 @@
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+UMPIRE = "Umpire"
+
+# Time the running turn spent waiting for and holding work shared with other turns, such as the umpire's dialogue.
+# Set per turn task; asyncio.to_thread copies it to the worker threads the turn runs in.
+_TURN_TIMING: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("turn_timing", default=None)
+
+
+@contextlib.contextmanager
+def serialized(lock: threading.RLock) -> Iterator[None]:
+    """
+    Holds a lock that serialises work shared between turns, e.g. the umpire's dialogue, recording for the
+    TurnScheduler how long the current turn waited for it and held it.
+
+    Args:
+        lock (threading.RLock): The lock.
+    """
+    timing = _TURN_TIMING.get()
+    start = time.perf_counter()
+    with lock:
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            if timing is not None:
+                timing["waited"] += acquired - start
+                timing["serialized"] += time.perf_counter() - acquired
+
+
+class RoundReport:
+    """
+    Timing statistics for one round run by the TurnScheduler.
+    """
+
+    def __init__(self, round_index: int, width: int, dependencies: List[Set[int]]) -> None:
+        self.round_index = round_index
+        self.width = width
+        self.turns = len(dependencies)
+        self.depth = _depth(dependencies)
+        self.turn_seconds: List[float] = [0.0] * self.turns
+        self.makespan_seconds = 0.0
+        self.critical_path_seconds = 0.0
+        # Time spent in work no two turns can do at once, e.g. on the umpire's dialogue
+        self.serialized_seconds = 0.0
+
+    @property
+    def serial_seconds(self) -> float:
+        """
+        Returns the time the round would have taken with every turn run one after another. Turn times exclude
+        waiting for serialised work held by other turns.
+        """
+        return sum(self.turn_seconds)
+
+    @property
+    def speedup(self) -> float:
+        """Returns the serial time divided by the makespan."""
+        return self.serial_seconds / self.makespan_seconds if self.makespan_seconds else 1.0
+
+    def __str__(self) -> str:
+        return (
+            f"Round {self.round_index + 1}: {self.turns} turns in {self.depth} dependent steps, "
+            f"makespan {self.makespan_seconds:.2f}s vs {self.serial_seconds:.2f}s serial "
+            f"({self.speedup:.2f}x, critical path {self.critical_path_seconds:.2f}s, "
+            f"{self.serialized_seconds:.2f}s serialised on the umpire, width {self.width})."
+        )
+
+
+def _depth(dependencies: List[Set[int]]) -> int:
+    """
+    Returns the number of turns on the longest dependency chain.
+    """
+    levels: List[int] = []
+    for predecessors in dependencies:
+        levels.append(1 + max((levels[i] for i in predecessors), default=0))
+    return max(levels, default=0)
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+class TurnScheduler:
+    """
+    Runs the turns of a round concurrently while respecting the order between turns that depend on each other.
+
+    A dependency DAG is built per round. A turn waits for every earlier turn that:
+        - belongs to the same team (or the same player when serialize_teams is False),
+        - is played by, or targets, a player or team it targets,
+        - is listed in its optional DEPENDS_ON key (turn indices within the round, or team/player names).
+    Umpire turns, and turns that target the Umpire, act on the shared game state and so wait for every earlier turn
+    and are waited on by every later one. Umpire-side work within other turns, such as legality follow-ons, runs
+    under the umpire's lock (see serialized()); the time turns wait for it is not counted as turn time, and the time
+    spent in it bounds the critical path. Results are always returned in turn order.
+    """
+
+    def __init__(self, width: int = 4, teams: Optional[Dict[str, list]] = None, serialize_teams: bool = True) -> None:
+        """
+        Initializes the TurnScheduler.
+
+        Args:
+            width (int): Maximum number of turns in flight at once.
+            teams (dict): The game's teams, used to resolve target and DEPENDS_ON names to teams and players.
+            serialize_teams (bool): Whether turns of different players in the same team are kept in order.
+        """
+        if width < 1:
+            raise ValueError("width must be at least 1.")
+        self.width = width
+        self.teams = teams if teams is not None else {}
+        self.serialize_teams = serialize_teams
+
+    def _unit(self, team: str, player: str) -> Any:
+        """
+        Returns the unit two turns must share to be ordered: the team, or the (team, player) pair.
+        """
+        return team if self.serialize_teams else (team, player)
+
+    def _resolve(self, name: str) -> Set[Any]:
+        """
+        Resolves a team or player name to the units it refers to.
+
+        Args:
+            name (str): A team or player name.
+
+        Returns:
+            Set[Any]: The matching units. Unknown names resolve to themselves.
+        """
+        if name in self.teams:
+            if self.serialize_teams:
+                return {name}
+            return {(name, player) for actor in self.teams[name] for player in actor}
+
+        units = {
+            self._unit(team, name)
+            for team, actors in self.teams.items()
+            for actor in actors
+            if name in actor
+        }
+        return units or {name}
+
+    def _units(self, turn: dict) -> Set[Any]:
+        """
+        Returns the units a turn acts on: its own player plus its targets.
+        """
+        units = {self._unit(turn.get("TEAM"), turn.get("PLAYER"))}
+        for target in _as_list(turn.get("TARGETS")):
+            if target != UMPIRE:
+                units |= self._resolve(target)
+        return units
+
+    @staticmethod
+    def _is_barrier(turn: dict) -> bool:
+        return turn.get("PLAYER") == UMPIRE or UMPIRE in _as_list(turn.get("TARGETS"))
+
+    def build_dependencies(self, turns: List[dict]) -> List[Set[int]]:
+        """
+        Builds the dependency DAG of a round.
+
+        Args:
+            turns (List[dict]): The turns of the round, in their written order.
+
+        Returns:
+            List[Set[int]]: For each turn, the indices of the earlier turns it must wait for.
+        """
+        units = [self._units(turn) for turn in turns]
+        barriers = [self._is_barrier(turn) for turn in turns]
+        dependencies: List[Set[int]] = []
+
+        for j, turn in enumerate(turns):
+            predecessors = set()
+            for i in range(j):
+                if barriers[i] or barriers[j] or units[i] & units[j]:
+                    predecessors.add(i)
+
+            for dependency in _as_list(turn.get("DEPENDS_ON")):
+                if isinstance(dependency, int):
+                    if not 0 <= dependency < j:
+                        raise ValueError(f"Turn {j} can only depend on earlier turns, not on turn {dependency}.")
+                    predecessors.add(dependency)
+                else:
+                    named = self._resolve(dependency) | {dependency}
+                    predecessors.update(i for i in range(j) if units[i] & named)
+
+            dependencies.append(predecessors)
+        return dependencies
+
+    async def run_round(
+        self,
+        turns: List[dict],
+        engage: Callable[[dict], Awaitable[Any]],
+        round_index: int = 0,
+    ) -> Tuple[Dict[int, Any], RoundReport]:
+        """
+        Runs every turn of a round, starting each one as soon as the turns it depends on have finished.
+
+        Args:
+            turns (List[dict]): The turns of the round.
+            engage (Callable): Coroutine function that plays one turn, e.g. Umpire.engage_turn_async.
+            round_index (int): The index of the round, used for reporting.
+
+        Returns:
+            Tuple[Dict[int, Any], RoundReport]: The responses keyed by turn index in turn order, and timing stats.
+        """
+        dependencies = self.build_dependencies(turns)
+        report = RoundReport(round_index, self.width, dependencies)
+        semaphore = asyncio.Semaphore(self.width)
+        path_seconds = [0.0] * len(turns)
+        tasks: List[asyncio.Task] = []
+        start = time.perf_counter()
+
+        async def run_turn(index: int) -> Any:
+            predecessors = dependencies[index]
+            if predecessors:
+                await asyncio.gather(*(tasks[i] for i in predecessors))
+            async with semaphore:
+                timing = {"waited": 0.0, "serialized": 0.0}
+                _TURN_TIMING.set(timing)
+                turn_start = time.perf_counter()
+                response = await engage(turns[index])
+                report.turn_seconds[index] = time.perf_counter() - turn_start - timing["waited"]
+                report.serialized_seconds += timing["serialized"]
+            path_seconds[index] = report.turn_seconds[index] + max((path_seconds[i] for i in predecessors), default=0.0)
+            return response
+
+        # Tasks are created in turn order, so every predecessor's task exists before it is awaited
+        for index in range(len(turns)):
+            tasks.append(asyncio.ensure_future(run_turn(index)))
+
+        try:
+            responses = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        report.makespan_seconds = time.perf_counter() - start
+        # Serialised work cannot overlap, so the round can be no shorter than its total
+        report.critical_path_seconds = max(max(path_seconds, default=0.0), report.serialized_seconds)
+        return dict(enumerate(responses)), report
@@ -11,13 +11,14 @@ class StoryTeller:
     generating the game rules, players, and rounds based on the narrative.
     """
 
-    def __init__(self, narrative: Optional[str] = None) -> None:
+    def __init__(self, narrative: Optional[str] = None, llm_backend=None) -> None:
         """
         Initializes the StoryTeller class.
 
         :param narrative: Optional string to define the theme of the game narrative.
+        :param llm_backend: Optional inference backend for the LLM, e.g. a shared OpenAIHTTPBackend.
         """
-        self._llm = EasyLLM(max_new_tokens=10000)
+        self._llm = EasyLLM(max_new_tokens=10000, backend=llm_backend)
         self._narrative = self._create_narrative(narrative)
         self._rules = self._create_game_rules()
         self._players = self._create_players()
@@ -112,7 +113,8 @@ class StoryTeller:
                 empathy=empathy,
                 exercise_objectives=exercise_objectives,
                 strategic_objectives=strategic_objectives,
-                bio_folder="."
+                bio_folder=".",
+                llm_backend=self._llm.backend,
             )
             if team not in agents:
                 agents[team] = [{name: agent_instance}]
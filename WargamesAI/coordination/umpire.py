@@ -1,7 +1,17 @@
+import asyncio
 import random
+import threading
 from WargamesAI.utils.easyLLM import EasyLLM
 from WargamesAI.utils.easyRAG import EasyRAG
 from WargamesAI.utils import json_schemas
+from WargamesAI.utils.replay import get_recorder, get_replay
+from WargamesAI.coordination.game_state import GameStateView
+from WargamesAI.coordination.scheduler import serialized
+from WargamesAI.coordination.verdicts import VerdictCache, state_digest
+from WargamesAI.utils.verdict_engine import VerdictEngine, describe_action
+
+# Number of times an actor is asked for an action before it is deemed unable to follow the rules
+MAX_ACTION_ATTEMPTS = 5
 
 class Umpire:
     """
@@ -13,6 +23,14 @@ class Umpire:
         game,
         model_name=None,
         max_tokens=5000,
+        llm_backend=None,
+        constrained_decoding=False,
+        response_cache=None,
+        state_token_budget=1500,
+        recent_actions_window=8,
+        seed=None,
+        verdict_cache_size=1024,
+        verdict_engine=None,
     ):
         """
         Initializes the Umpire instance.
@@ -21,12 +39,50 @@ class Umpire:
             game: The game instance.
             model_name (str): Name of the language model to use.
             max_tokens (int): Maximum tokens for LLM responses.
+            llm_backend (LLMBackend): Inference backend for the umpire's LLM, e.g. a shared OpenAIHTTPBackend.
+            constrained_decoding (bool): Whether JSON answers are constrained to their schema during generation.
+            response_cache (ResponseCache): Cache of LLM answers to repeated questions, e.g. get_response_cache().
+            state_token_budget (int): Token budget for the game state included in prompts. None means no limit.
+            recent_actions_window (int): Number of most recent actions included in full in the game state.
+            seed (int): Seed for dice rolls and card draws. Random if None, or the recorded seed when replaying.
+            verdict_cache_size (int): Number of legality verdicts cached, keyed by action and game state.
+            verdict_engine (VerdictEngine): Checks the legality of actions. Defaults to a VerdictEngine over the rules
+                that escalates to the umpire's LLM when unsure.
         """
         self._game = game
-        self.llm = EasyLLM(max_new_tokens=max_tokens, model_name=model_name)
+
+        replay = get_replay()
+        if replay is not None:
+            seed = replay.seeds.get("umpire", seed)
+            if replay.deck is not None and replay.deck != game._cards:
+                print("The game's card deck differs from the recorded one, the recorded deck is used.")
+                game._cards = list(replay.deck)
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(32)
+        self.seed = seed
+        self._rng = random.Random(seed)
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.record_seed("umpire", seed)
+            recorder.record_deck(game._cards)
+
+        self.llm = EasyLLM(
+            max_new_tokens=max_tokens,
+            model_name=model_name,
+            backend=llm_backend,
+            constrained_decoding=constrained_decoding,
+            response_cache=response_cache,
+        )
         self.rag = EasyRAG()
+        self.verdict_engine = verdict_engine or VerdictEngine(self.rag, llm=self.llm)
         self.actions = []
+        self.state_view = GameStateView(recent_window=recent_actions_window, token_budget=state_token_budget)
         self._resource_tracker = {}
+        self.verdict_cache = VerdictCache(verdict_cache_size)
+        # Guards actions, resources and the card deck when turns run concurrently
+        self._state_lock = threading.RLock()
+        # Serialises the umpire's multi-question exchanges on its dialogue
+        self._dialogue_turn_lock = threading.RLock()
 
         if game._resources:
             self._resources = game._resources.copy()
@@ -40,7 +96,92 @@ class Umpire:
             f"You are an umpire/game master of the game with the following rules. Respond True acknowledging this. \n Game Rules: \n\n"
             f"Game Rules:\n'{game_rules}'",
         )
-        self.llm.ask_question(initial_prompt)
+        self.llm.cache_prefix(initial_prompt, text_end=f"Game Rules:\n'{game_rules}'")
+        self.llm.ask_question(initial_prompt, pin=True)
+        self.llm.cache_prefix()
+
+    def to_state(self):
+        """
+        Returns the umpire's seed and random number generator, recorded actions, resources, game state view and
+        dialogue as plain data for a checkpoint.
+
+        Returns:
+            dict: The umpire's state.
+        """
+        with self._state_lock:
+            version, internal, gauss = self._rng.getstate()
+            return {
+                "seed": self.seed,
+                "rng": [version, list(internal), gauss],
+                "actions": self.actions,
+                "resource_tracker": self._resource_tracker,
+                "resources": self._resources,
+                "state_view": self.state_view.to_state(),
+                "state_token_budget": self.state_view.token_budget,
+                "recent_actions_window": self.state_view.recent_window,
+                "llm": self.llm.to_state(),
+            }
+
+    @classmethod
+    def from_state(
+        cls,
+        game,
+        state,
+        llm_backend=None,
+        constrained_decoding=False,
+        response_cache=None,
+        verdict_cache_size=1024,
+        verdict_engine=None,
+    ):
+        """
+        Restores an umpire saved by to_state(). Its dialogue already holds the rules primer, so no initialization
+        prompt is asked again, and dice rolls and card draws continue the saved random sequence.
+
+        Args:
+            game: The game instance, e.g. from Game.from_state().
+            state (dict): The saved state.
+            llm_backend (LLMBackend): Inference backend for the umpire's LLM.
+            constrained_decoding (bool): Whether JSON answers are constrained to their schema during generation.
+            response_cache (ResponseCache): Cache of LLM answers to repeated questions.
+            verdict_cache_size (int): Number of legality verdicts cached, keyed by action and game state.
+            verdict_engine (VerdictEngine): Checks the legality of actions. Defaults to a VerdictEngine over the rules
+                that escalates to the umpire's LLM when unsure.
+
+        Returns:
+            Umpire: The restored umpire.
+        """
+        umpire = cls.__new__(cls)
+        umpire._game = game
+        umpire.seed = state["seed"]
+        umpire._rng = random.Random()
+        version, internal, gauss = state["rng"]
+        umpire._rng.setstate((version, tuple(internal), gauss))
+
+        umpire.llm = EasyLLM(
+            max_new_tokens=state["llm"]["max_new_tokens"],
+            model_name=state["llm"]["model_name"],
+            backend=llm_backend,
+            constrained_decoding=constrained_decoding,
+            response_cache=response_cache,
+        )
+        umpire.llm.load_state(state["llm"])
+        umpire.rag = EasyRAG()
+        umpire.verdict_engine = verdict_engine or VerdictEngine(umpire.rag, llm=umpire.llm)
+        umpire.actions = list(state["actions"])
+        umpire.state_view = GameStateView(
+            recent_window=state["recent_actions_window"], token_budget=state["state_token_budget"]
+        )
+        umpire.state_view.load_state(state["state_view"])
+        umpire._resource_tracker = state["resource_tracker"]
+        umpire._resources = state["resources"]
+        umpire.verdict_cache = VerdictCache(verdict_cache_size)
+        umpire._state_lock = threading.RLock()
+        umpire._dialogue_turn_lock = threading.RLock()
+
+        # Rebuild the cached prefixes __init__ would have: the rules, then the restored dialogue
+        umpire.llm.cache_prefix(text_end=f"Game Rules:\n'{game._game_rules_text}'")
+        umpire.llm.cache_prefix()
+        return umpire
 
     def roll_dice(self, highest, lowest=1, times=1):
         """
@@ -54,7 +195,7 @@ class Umpire:
         Returns:
             int: The total score from the dice rolls.
         """
-        return sum(random.randint(lowest, highest) for _ in range(times))
+        return sum(self._rng.randint(lowest, highest) for _ in range(times))
 
     def pick_card(self, number):
         """
@@ -66,18 +207,35 @@ class Umpire:
         Returns:
             list: The drawn cards.
         """
-        if self._game._cards:
-            drawn_cards  = []
+        with self._state_lock:
+            if self._game._cards:
+                drawn_cards  = []
+
+                for i in range(0, number):
+                    if len(self._game._cards) > 1:
+                        card = self._rng.choice(self._game._cards)
+                        drawn_cards.append(card)
+                        self._game._cards.remove(card)
+
+                return drawn_cards
+            else:
+                return []
+
+    @staticmethod
+    def _system_use(resp):
+        """
+        Reads the answer to a dice or card question. The SystemUse schema is a list of items, so answers are usually
+        a list, of which the first item is used.
 
-            for i in range(0, number):
-                if len(self._game._cards) > 1:
-                    card = random.sample(self._game._cards, 1)
-                    drawn_cards.append(card)
-                    self._game._cards.remove(card)
+        Args:
+            resp: The parsed answer.
 
-            return drawn_cards
-        else:
-            return []
+        Returns:
+            dict: The requested item, or an empty dictionary if none was requested.
+        """
+        if isinstance(resp, list):
+            resp = resp[0] if resp else {}
+        return resp if isinstance(resp, dict) else {}
 
     def _perform_umpire_action(self, required_action):
         """
@@ -89,64 +247,88 @@ class Umpire:
         Returns:
             The response from the umpire's action.
         """
-        main_query = (
-            f"Following the rules of this game, perform the following action as Umpire: '{required_action}'. "
-            f"The game state is: {self.get_game_status()}."
-        )
-
-        # Check if dice are required
-        if self._game._use_dice:
-            query = (
-                f"Based on the current turn, is the use of a dice required by the Umpire? Current turn: {required_action}."
-            )
-            resp = self.llm.ask_question(
-                self.llm.generate_json_prompt(json_schemas.SystemUseModel, query)
+        # The dice, card, action and retry questions are one exchange on the umpire's dialogue, so turns running
+        # concurrently must not interleave their questions with it
+        with serialized(self._dialogue_turn_lock):
+            main_query = (
+                f"Following the rules of this game, perform the following action as Umpire: '{required_action}'. "
+                f"The game state is: {self.get_game_status()}."
             )
-            if resp.get("ITEM") == "DICE":
-                dice = resp["ACTION"]
-                number_of_dice, dice_sides = map(int, dice.split("d"))
-                result = self.roll_dice(times=number_of_dice, highest=dice_sides)
-                main_query += f" A '{dice}' was rolled and the result was '{result}'."
-
-        # Check if cards are required
-        if self._game._cards:
-            query = (
-                f"Based on the current turn, is the use of drawing a random card required by the Umpire? Current turn: {required_action}."
-            )
-            resp = self.llm.ask_question(
-                self.llm.generate_json_prompt(json_schemas.SystemUseModel, query)
-            )
-            if resp.get("ITEM") == "CARD":
-                number = int(resp["ACTION"])
-                result = self.pick_card(number)
-                main_query += f" {number} cards were drawn with the following results: {result}."
-
-        # Get the umpire's action response
-        resp = self.llm.ask_question(
-            self.llm.generate_json_prompt(json_schemas.ActionResponseModel, main_query)
-        )
 
-        # Check legality
-        is_legal = self._check_legality_of_action(resp)
-        max_attempts = 5
-        attempt = 1
+            # Check if dice are required
+            if self._game._use_dice:
+                query = (
+                    f"Based on the current turn, is the use of a dice required by the Umpire? Current turn: {required_action}."
+                )
+                resp = self._system_use(self.llm.ask_question(
+                    self.llm.generate_json_prompt(json_schemas.SystemUseModel, query)
+                ))
+                if resp.get("ITEM") == "DICE":
+                    dice = resp["ACTION"]
+                    number_of_dice, dice_sides = map(int, dice.split("d"))
+                    result = self.roll_dice(times=number_of_dice, highest=dice_sides)
+                    main_query += f" A '{dice}' was rolled and the result was '{result}'."
+
+            # Check if cards are required
+            if self._game._cards:
+                query = (
+                    f"Based on the current turn, is the use of drawing a random card required by the Umpire? Current turn: {required_action}."
+                )
+                resp = self._system_use(self.llm.ask_question(
+                    self.llm.generate_json_prompt(json_schemas.SystemUseModel, query)
+                ))
+                if resp.get("ITEM") == "CARD":
+                    number = int(resp["ACTION"])
+                    result = self.pick_card(number)
+                    main_query += f" {number} cards were drawn with the following results: {result}."
+
+            # Get the umpire's action response, asking again until it is legal
+            for prompt in self._action_prompts(main_query):
+                resp = self.llm.ask_question(self.llm.generate_json_prompt(json_schemas.ActionResponseModel, prompt))
+                if self._check_legality_of_action(resp):
+                    self._record_action(resp, "Umpire")
+                    return resp
 
-        while not is_legal and attempt < max_attempts:
-            new_prompt = (
+            raise Exception("Game failed. LLM couldn't follow the game rules.")
+
+    def _action_prompts(self, prompt):
+        """
+        Yields the prompt for each attempt at a legal action: the prompt itself, then up to MAX_ACTION_ATTEMPTS - 1
+        retries telling the actor that its last action was not legal.
+
+        Args:
+            prompt (str): The prompt asking for the action.
+
+        Yields:
+            str: The prompt for the next attempt.
+        """
+        yield prompt
+        for _ in range(MAX_ACTION_ATTEMPTS - 1):
+            yield (
                 f"Your last action was deemed not legal in the game rules. The game rules are: "
-                f"{self._game._game_rules_text}. Try again. {main_query}"
-            )
-            resp = self.llm.ask_question(
-                self.llm.generate_json_prompt(json_schemas.ActionResponseModel, new_prompt)
+                f"{self._game._game_rules_text}. Try again. {prompt}"
             )
-            is_legal = self._check_legality_of_action(resp)
-            attempt += 1
 
-        if not is_legal:
-            raise Exception("Game failed. LLM couldn't follow the game rules.")
+    def _record_action(self, action, actor=None):
+        """
+        Records an action that has been accepted as legal.
+
+        Args:
+            action: The action to record.
+            actor (str): Who took the action, e.g. "TEAM/Player" or "Umpire".
+        """
+        with self._state_lock:
+            self.actions.append(action)
+            self.state_view.record(action, actor)
+
+    def start_round(self, round_index):
+        """
+        Signals the start of a new round, so later actions are summarised under it.
 
-        self.actions.append(resp)
-        return resp
+        Args:
+            round_index (int): The index of the round.
+        """
+        self.state_view.start_round(round_index)
 
     def ask_human_player_for_action(self, action, extra_info = ""):
         """
@@ -166,7 +348,7 @@ class Umpire:
         response = input(prompt)
 
         is_legal = self._check_legality_of_action(response)
-        max_attempts = 5
+        max_attempts = MAX_ACTION_ATTEMPTS
         attempt = 1
 
         while not is_legal and attempt < max_attempts:
@@ -181,12 +363,12 @@ class Umpire:
         if not is_legal:
             raise Exception(f"Player failed to follow rules with response: {response}")
 
-        self.actions.append(response)
+        self._record_action(response)
         return response
 
-    def _ask_player_for_action(self, team, player, action,extra_info=""):
+    def _player_turn(self, team, player, action, extra_info=""):
         """
-        Asks an AI player for their action.
+        Prepares an AI player's turn: finds the player's agent and builds the prompt and the cache context.
 
         Args:
             team (str): The player's team.
@@ -194,10 +376,8 @@ class Umpire:
             action (str): The action required.
 
         Returns:
-            The player's response.
+            tuple: The agent, the prompt and the game state digest cached actions are keyed on.
         """
-        prompt = f"It is your turn in the game. {action} {extra_info}"
-        
         agent = None
         for existing_player in self._game._teams[team]:
             if player in existing_player:
@@ -206,26 +386,53 @@ class Umpire:
         if agent is None:
             raise Exception(f"Couldn't find player '{player}'")
 
-        resp = agent.request_action(prompt)
+        # Cached actions are only reused in the same game state
+        state = state_digest(self.get_game_status())
+        return agent, f"It is your turn in the game. {action} {extra_info}", state
 
-        is_legal = self._check_legality_of_action(resp)
-        max_attempts = 5
-        attempt = 1
+    def _ask_player_for_action(self, team, player, action,extra_info=""):
+        """
+        Asks an AI player for their action.
 
-        while not is_legal and attempt < max_attempts:
-            new_prompt = (
-                f"Your last action was deemed not legal in the game rules. The game rules are: "
-                f"{self._game._game_rules_text}. Try again. {prompt}"
-            )
-            resp = agent.request_action(new_prompt)
-            is_legal = self._check_legality_of_action(resp)
-            attempt += 1
+        Args:
+            team (str): The player's team.
+            player (str): The player's name.
+            action (str): The action required.
 
-        if not is_legal:
-            return False  # Player failed to make legal move
+        Returns:
+            The player's response.
+        """
+        agent, prompt, state = self._player_turn(team, player, action, extra_info)
+
+        for attempt_prompt in self._action_prompts(prompt):
+            resp = agent.request_action(attempt_prompt, cache_context=state)
+            if self._check_legality_of_action(resp):
+                self._record_action(resp, f"{team}/{player}")
+                return resp
+
+        return False  # Player failed to make legal move
+
+    async def _ask_player_for_action_async(self, team, player, action, extra_info=""):
+        """
+        Asynchronous variant of _ask_player_for_action.
+
+        Args:
+            team (str): The player's team.
+            player (str): The player's name.
+            action (str): The action required.
+
+        Returns:
+            The player's response.
+        """
+        agent, prompt, state = self._player_turn(team, player, action, extra_info)
 
-        self.actions.append(resp)
-        return resp
+        for attempt_prompt in self._action_prompts(prompt):
+            resp = await agent.request_action_async(attempt_prompt, cache_context=state)
+            if await self._check_legality_of_action_async(resp):
+                self._record_action(resp, f"{team}/{player}")
+                return resp
+
+        return False  # Player failed to make legal move
 
     def engage_turn(self, turn, extra_info = ""):
         """
@@ -284,6 +491,44 @@ class Umpire:
 
         return final_responses
 
+    async def engage_turn_async(self, turn, extra_info = ""):
+        """
+        Asynchronous variant of engage_turn. Blocking work runs in worker threads so independent turns can overlap.
+
+        Args:
+            turn (dict): The turn information.
+
+        Returns:
+            The responses resulting from the turn.
+        """
+        player_team = turn["TEAM"]
+        target_player = turn["PLAYER"]
+        required_action = turn["ACTIVITY"]
+
+        if target_player == "Umpire":
+            response = await asyncio.to_thread(self._perform_umpire_action, required_action)
+
+        else:
+            teams = self._game._teams
+            if player_team in teams:
+                for existing_player in teams[player_team]:
+                    if target_player in existing_player:
+                        if existing_player[target_player]._is_human:
+                            return await asyncio.to_thread(self.ask_human_player_for_action, required_action, extra_info)
+                        else:
+                            return await self._ask_player_for_action_async(player_team, target_player, required_action, extra_info)
+            raise Exception (f"Agent/ player {target_player} of team {player_team} not found!")
+
+        final_responses = [response]
+
+        if "TARGETS" in response:
+            if "Umpire" in response["TARGETS"]:
+                umpire_turn = await asyncio.to_thread(self._check_response, player_team, target_player, required_action, response)
+                final_responses.extend(await self.engage_turn_async(umpire_turn))
+                print(f"Umpire turn: {umpire_turn}")
+
+        return final_responses
+
     def _check_response(self, team, player, action, response):
         """
         Checks if there are further actions required based on a player's response.
@@ -301,14 +546,16 @@ class Umpire:
             f"The player '{player}' of team '{team}' was asked to perform the following: '{action}'. "
             f"They responded with '{response}'. In line with the game rules, are there any follow-on actions that you as Umpire need to take (e.g. sharing information with a player, etc)? If so return a turn for the Umpire."
         )
-        further_actions = self.llm.ask_question(
-            self.llm.generate_json_prompt(json_schemas.TurnModel, query)
-        )
+        with serialized(self._dialogue_turn_lock):
+            further_actions = self.llm.ask_question(
+                self.llm.generate_json_prompt(json_schemas.TurnModel, query)
+            )
         return further_actions
 
     def _check_legality_of_action(self, action):
         """
-        Checks if an action is legal according to the game rules.
+        Checks if an action is legal according to the game rules. Verdicts are cached, so an action re-submitted in
+        the same game state is not checked again.
 
         Args:
             action: The action to check.
@@ -316,24 +563,48 @@ class Umpire:
         Returns:
             bool: True if legal, False otherwise.
         """
-        query = (
-            f"Does the following action follow the rules of the game? {action}. "
-            f"The game state is: {self.get_game_status()}."
-        )
-        return bool(self.rag.ask_question_with_pdf(query, self._game._game_rules_pdf))
+        status = self.get_game_status()
+        key = self.verdict_cache.key(action, status, self._game._game_rules_pdf)
+        is_legal = self.verdict_cache.get(key)
+        if is_legal is None:
+            query = (
+                f"Does the following action follow the rules of the game? {action}. "
+                f"The game state is: {status}."
+            )
+            verdict = self.verdict_engine.judge(
+                f"A player does the following: {describe_action(action)}",
+                self._game._game_rules_pdf,
+                question=query,
+                kind="legality",
+            )
+            is_legal = verdict.allowed
+            self.verdict_cache.put(key, is_legal)
+        return is_legal
+
+    async def _check_legality_of_action_async(self, action):
+        """
+        Asynchronous variant of _check_legality_of_action.
+
+        Args:
+            action: The action to check.
+
+        Returns:
+            bool: True if legal, False otherwise.
+        """
+        return await asyncio.to_thread(self._check_legality_of_action, action)
 
     def get_game_status(self):
         """
-        Gets the current game status.
+        Gets a compact view of the current game status: the current round, the team roster by name, a digest of
+        each older round and the most recent actions in full, kept within the state token budget.
 
         Returns:
             dict: The game status.
         """
-        status = {
-            "actions": self.actions,
-            "teams": self._game._teams,
-            "resources": self._resource_tracker,
-        }
+        with self._state_lock:
+            self.state_view.set_roster(self._game._teams)
+            status = dict(self.state_view.render())
+            status["resources"] = self._resource_tracker
         return status
 
     def add_resource(self, team_name, player_name, resource, number):
@@ -349,9 +620,11 @@ class Umpire:
         Returns:
             The new resource amount.
         """
-        self._resource_tracker.setdefault(team_name, {}).setdefault(player_name, {}).setdefault(resource, 0)
-        self._resource_tracker[team_name][player_name][resource] += number
-        return self._resource_tracker[team_name][player_name][resource]
+        with self._state_lock:
+            self._resource_tracker.setdefault(team_name, {}).setdefault(player_name, {}).setdefault(resource, 0)
+            self._resource_tracker[team_name][player_name][resource] += number
+            self.state_view.record_resource_change(team_name, resource, number)
+            return self._resource_tracker[team_name][player_name][resource]
 
     def subtract_resource(self, team_name, player_name, resource, number):
         """
@@ -366,24 +639,24 @@ class Umpire:
         Returns:
             The new resource amount.
         """
-        self._resource_tracker.setdefault(team_name, {}).setdefault(player_name, {}).setdefault(resource, 0)
-        self._resource_tracker[team_name][player_name][resource] -= number
-        return self._resource_tracker[team_name][player_name][resource]
+        with self._state_lock:
+            self._resource_tracker.setdefault(team_name, {}).setdefault(player_name, {}).setdefault(resource, 0)
+            self._resource_tracker[team_name][player_name][resource] -= number
+            self.state_view.record_resource_change(team_name, resource, -number)
+            return self._resource_tracker[team_name][player_name][resource]
 
     def produce_summary(self):
-        actions = self.actions
+        status = self.get_game_status()
         rules = self._game._game_rules_text
-        players = self._game._teams
-        prompt = self.llm.generate_json_prompt(json_schemas.DefaultModel, f"Based on the below game actions and the following game rules and players, summarise the gameplay that took effect. \n\n Actions: \n {actions}. \n \n Rules: {rules} \n \n Players: \n {players}")
+        prompt = self.llm.generate_json_prompt(json_schemas.DefaultModel, f"Based on the below game state, with its teams, round digests and latest actions, and the following game rules, summarise the gameplay that took effect. \n\n Game state: \n {status}. \n \n Rules: {rules}")
         response = self.llm.ask_question(prompt)["RESPONSE"]
 
         return response
     
     def deduce_winner(self):
-        actions = self.actions
+        status = self.get_game_status()
         rules = self._game._game_rules_text
-        players = self._game._teams
-        prompt = self.llm.generate_json_prompt(json_schemas.WinModel, f"Based on the below game actions and the following game rules and players, Deduce the winner of the gameplay that took effect. \n\n Actions: \n {actions}. \n \n Rules: {rules} \n \n Players: \n {players}")
+        prompt = self.llm.generate_json_prompt(json_schemas.WinModel, f"Based on the below game state, with its teams, round digests and latest actions, and the following game rules, Deduce the winner of the gameplay that took effect. \n\n Game state: \n {status}. \n \n Rules: {rules}")
         response = self.llm.ask_question(prompt)
 
         return response
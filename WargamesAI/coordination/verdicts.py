@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def _canonical(value: Any) -> Any:
+    """
+    Normalizes an action for hashing: strings are case-folded with whitespace collapsed, and dictionary keys are
+    normalized the same way, so trivially different renderings of one action hash equally.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {_canonical(str(key)): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def action_digest(action: Any) -> str:
+    """
+    Returns a canonical hash of an action.
+
+    Args:
+        action: The action, usually an ActionResponse dictionary or a human player's text.
+
+    Returns:
+        str: The sha256 hex digest.
+    """
+    canonical = json.dumps(_canonical(action), sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def state_digest(state: Any) -> str:
+    """
+    Returns a hash of the game state an action is judged against.
+
+    Args:
+        state: The game state, e.g. the output of Umpire.get_game_status().
+
+    Returns:
+        str: The sha256 hex digest.
+    """
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    A bounded LRU cache of verdicts on actions, e.g. whether an action is legal, keyed by the action and the game
+    state it was judged in. An identical or re-submitted action in an unchanged state is not judged again.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        """
+        Initializes the VerdictCache.
+
+        Args:
+            max_entries (int): Maximum number of verdicts kept, least recently used are evicted first.
+        """
+        self.max_entries = max_entries
+        self._verdicts: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(action: Any, state: Any, *context: Any) -> str:
+        """
+        Builds the key a verdict is cached under.
+
+        Args:
+            action: The action being judged.
+            state: The game state it is judged in.
+            *context: Anything else the verdict depends on, e.g. the rules document.
+
+        Returns:
+            str: The cache key.
+        """
+        return f"{action_digest(action)}:{state_digest([state, *context])}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns a cached verdict.
+
+        Args:
+            key (str): The key from key().
+
+        Returns:
+            The verdict, or None if it is not cached.
+        """
+        with self._lock:
+            if key in self._verdicts:
+                self._verdicts.move_to_end(key)
+                self.hits += 1
+                return self._verdicts[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, verdict: Any) -> None:
+        """
+        Caches a verdict.
+
+        Args:
+            key (str): The key from key().
+            verdict: The verdict.
+        """
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Removes every cached verdict.
+        """
+        with self._lock:
+            self._verdicts.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the verdicts served from the cache.
+
+        Returns:
+            dict: Hits, misses, hit rate and number of cached verdicts.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._verdicts),
+            }
@@ -1,4 +1,10 @@
 from .easyLLM import EasyLLM
 from .easyRAG import EasyRAG
+from .model_pool import ModelPool, get_model_pool
+from .dialogue_memory import DialogueMemory
+from .response_cache import ResponseCache, get_response_cache
+from .verdict_engine import Verdict, VerdictEngine
+from .replay import GameRecorder, ReplayLog, recording, replaying
+from .llm_backends import LLMBackend, OpenAIHTTPBackend, set_default_backend, set_generation_seed
 from . import json_schemas
 from . import pdf_utils
\ No newline at end of file
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+
+from WargamesAI.utils.rag_index import normalize_rows, top_k_indices
+
+
+class IVFIndex:
+    """
+    A pure-NumPy inverted file (IVF) approximate nearest neighbour index for cosine similarity.
+
+    Vectors are clustered with spherical k-means; a query is only scored against the vectors in its nprobe closest
+    clusters. Higher nprobe trades latency for recall, nprobe == nlist is an exact search.
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, iterations: int = 20, seed: int = 0) -> None:
+        """
+        Initializes the IVFIndex.
+
+        Args:
+            nlist (int): Number of clusters. If None, roughly the square root of the number of vectors is used.
+            nprobe (int): Number of clusters searched per query.
+            iterations (int): Number of k-means iterations used when building.
+            seed (int): Seed for the k-means initialisation.
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.ids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return 0 if self.ids is None else len(self.ids)
+
+    def _kmeans(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """
+        Clusters unit vectors with spherical k-means.
+
+        Args:
+            vectors (np.ndarray): Normalized vectors to cluster.
+            nlist (int): Number of clusters.
+
+        Returns:
+            np.ndarray: Normalized cluster centroids.
+        """
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample for large corpora, the assignment step below covers every vector anyway
+        sample_size = min(len(vectors), nlist * 256)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+
+            # Re-seed empty clusters with random sample points
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            centroids = normalize_rows(sums)
+
+        return centroids
+
+    def build(self, embeddings: np.ndarray) -> "IVFIndex":
+        """
+        Builds the index from a matrix of embeddings.
+
+        Args:
+            embeddings (np.ndarray): One embedding row per document. Rows are normalized internally.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        vectors = normalize_rows(embeddings)
+        if len(vectors) == 0:
+            raise ValueError("Cannot build an IVF index without any vectors.")
+
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        self.nlist = nlist
+        self.centroids = self._kmeans(vectors, nlist)
+
+        # Store vectors grouped by cluster so each probed list is a contiguous slice
+        assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        self.ids = order.astype(np.int64)
+        self.vectors = vectors[order]
+        counts = np.bincount(assignments, minlength=nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return self
+
+    def search(self, queries: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the approximate top-k most similar documents for each query.
+
+        Args:
+            queries (np.ndarray): One query embedding per row. Rows are normalized internally.
+            top_k (int): Number of results per query.
+            nprobe (int): Number of clusters to search. Defaults to the index's nprobe.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (queries, top_k) document indices and their similarities. Rows with
+            fewer candidates than top_k are padded with -1 and -inf.
+        """
+        if self.centroids is None:
+            raise RuntimeError("The IVF index has not been built or loaded.")
+
+        queries = normalize_rows(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = top_k_indices(queries @ self.centroids.T, nprobe)
+
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for row, (query, clusters) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate(
+                [np.arange(self.offsets[c], self.offsets[c + 1]) for c in clusters]
+            )
+            if len(candidates) == 0:
+                continue
+            candidate_scores = self.vectors[candidates] @ query
+            best = top_k_indices(candidate_scores.reshape(1, -1), top_k)[0]
+            indices[row, :len(best)] = self.ids[candidates[best]]
+            scores[row, :len(best)] = candidate_scores[best]
+
+        return indices, scores
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index to a .npz file.
+
+        Args:
+            path (str): Destination path.
+        """
+        if self.centroids is None:
+            raise RuntimeError("The IVF index has not been built.")
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        metadata = json.dumps({"nlist": self.nlist, "nprobe": self.nprobe, "iterations": self.iterations, "seed": self.seed})
+        with tempfile.NamedTemporaryFile(dir=folder, suffix=".npz", delete=False) as file:
+            np.savez(
+                file,
+                centroids=self.centroids,
+                vectors=self.vectors,
+                ids=self.ids,
+                offsets=self.offsets,
+                metadata=np.array(metadata),
+            )
+        os.replace(file.name, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """
+        Loads an index saved with save().
+
+        Args:
+            path (str): Path to the .npz file.
+
+        Returns:
+            IVFIndex: The loaded index.
+        """
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            index = cls(
+                nlist=metadata["nlist"],
+                nprobe=metadata["nprobe"],
+                iterations=metadata["iterations"],
+                seed=metadata["seed"],
+            )
+            index.centroids = data["centroids"]
+            index.vectors = data["vectors"]
+            index.ids = data["ids"]
+            index.offsets = data["offsets"]
+        return index
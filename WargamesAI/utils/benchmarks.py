@@ -0,0 +1,268 @@
+"""
+Micro-benchmarks for the performance-sensitive parts of WargamesAI.
+
+Run with ``python -m WargamesAI.utils.benchmarks``.
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Dependencies that must not be imported just by importing the package
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "langchain",
+    "langchain_core",
+    "sentence_transformers",
+    "sklearn",
+    "fitz",
+    "fpdf",
+    "pydantic",
+)
+
+def benchmark_ivf(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    top_k: int = 5,
+    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+    nlist: Optional[int] = None,
+) -> List[Dict[str, float]]:
+    """
+    Measures recall and latency of the IVF index against exact brute-force search.
+
+    Args:
+        embeddings (np.ndarray): The corpus embeddings.
+        queries (np.ndarray): The query embeddings.
+        top_k (int): Number of results per query.
+        nprobes (Sequence[int]): The nprobe values to measure.
+        nlist (int): Number of IVF clusters. If None, the index default is used.
+
+    Returns:
+        List[Dict[str, float]]: One row per nprobe with recall@k and mean per-query latencies in milliseconds.
+    """
+    from WargamesAI.utils.ann_index import IVFIndex
+    from WargamesAI.utils.rag_index import normalize_rows, top_k_indices
+
+    corpus = normalize_rows(embeddings)
+    queries = normalize_rows(queries)
+
+    start = time.perf_counter()
+    exact = top_k_indices(queries @ corpus.T, top_k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    index = IVFIndex(nlist=nlist).build(corpus)
+    build_s = time.perf_counter() - start
+
+    results = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        approximate, _ = index.search(queries, top_k=top_k, nprobe=nprobe)
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        hits = sum(len(set(a) & set(e)) for a, e in zip(approximate.tolist(), exact.tolist()))
+        results.append({
+            "nprobe": min(nprobe, index.nlist),
+            "nlist": index.nlist,
+            "recall": hits / exact.size,
+            "ivf_ms": ivf_ms,
+            "exact_ms": exact_ms,
+            "build_s": build_s,
+        })
+    return results
+
+
+def measure_import_time(module: str = "WargamesAI.coordination", runs: int = 5) -> Dict[str, Any]:
+    """
+    Measures the cold import time of a module, each run in a fresh interpreter.
+
+    Args:
+        module (str): The module to import.
+        runs (int): Number of fresh interpreters to time.
+
+    Returns:
+        Dict[str, Any]: The median and per-run import times in seconds, and any heavy dependencies it imported.
+    """
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules)\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy}))\n"
+    )
+    timings = []
+    heavy = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        heavy.update(result["heavy"])
+    return {"module": module, "median_s": statistics.median(timings), "runs_s": timings, "heavy": sorted(heavy)}
+
+
+# Malformed answers seen from chat models, with the JSON each should be read as
+MALFORMED_JSON_CORPUS = [
+    ('{"RESPONSE": "Yes"}', {"RESPONSE": "Yes"}),
+    ('```json\n{"RESPONSE": "Yes"}\n```', {"RESPONSE": "Yes"}),
+    ('Sure! Here is the JSON:\n```json\n{"ACTION": "Advance", "RATIONALE": "Hold the bridge", "TARGETS": ["Red"]}\n```\n'
+     'Let me know if you need anything else.',
+     {"ACTION": "Advance", "RATIONALE": "Hold the bridge", "TARGETS": ["Red"]}),
+    ('Answer: {"RESPONSE": "The json file is valid"}', {"RESPONSE": "The json file is valid"}),
+    ('{"RESPONSE": "Use {braces} and [brackets] freely"}', {"RESPONSE": "Use {braces} and [brackets] freely"}),
+    ('{"ACTION": "Move", "TARGETS": ["Blue", "Umpire",],}', {"ACTION": "Move", "TARGETS": ["Blue", "Umpire"]}),
+    ("{'RESPONSE': 'It is raining'}", {"RESPONSE": "It is raining"}),
+    ("{'RESPONSE': 'The enemy's flank is open'}", {"RESPONSE": "The enemy's flank is open"}),
+    ('{RESPONSE: "bare key"}', {"RESPONSE": "bare key"}),
+    ('{"WINNING_TEAN": "Blue", "WINNING_PLAYER": None, "DRAW": False}',
+     {"WINNING_TEAN": "Blue", "WINNING_PLAYER": None, "DRAW": False}),
+    ('{"RATIONALE": "The commander said "hold" and we held"}', {"RATIONALE": "The commander said \"hold\" and we held"}),
+    ('{"RESPONSE": "line one\nline two"}', {"RESPONSE": "line one\nline two"}),
+    ('{\n  // the answer\n  "RESPONSE": "Yes"\n}', {"RESPONSE": "Yes"}),
+    ('[{"ITEM": "DICE", "ACTION": "2d6"}, {"ITEM": "CARD", "ACTION": "1"}]',
+     [{"ITEM": "DICE", "ACTION": "2d6"}, {"ITEM": "CARD", "ACTION": "1"}]),
+    ('The turns are:\n[{"TEAM": "Blue", "PLAYER": "1", "ACTIVITY": "Scout"}]',
+     [{"TEAM": "Blue", "PLAYER": "1", "ACTIVITY": "Scout"}]),
+    ('{"ACTION": "Retreat", "RATIONALE": "Outnumbered, the unit falls back to', {"ACTION": "Retreat", "RATIONALE": "Outnumbered, the unit falls back to"}),
+    ('{"TARGETS": ["Red", "Blue"', {"TARGETS": ["Red", "Blue"]}),
+    ('{"RESPONSE": "Yes"} {"RESPONSE": "No"}', {"RESPONSE": "Yes"}),
+    ('<think>Should I use {x}?</think>{"RESPONSE": "No"}', {"RESPONSE": "No"}),
+    ('{"PATH": "C:\\maps\\dover"}', {"PATH": "C:\\maps\\dover"}),
+]
+
+
+def _legacy_parse_json(result: str) -> Any:
+    """
+    The replace-and-retry parsing EasyLLM used before extract_json(), kept as the benchmark baseline.
+    """
+    import re
+
+    result = result.replace("json", "")
+    result = result.replace("\n", " ").replace("   ", "  ").replace("  ", " ")
+    try:
+        return json.loads(result)
+    except Exception:
+        try:
+            match = re.search(r'```.*?({.*?}).*?```', result.replace("\\", ""), re.DOTALL)
+            return json.loads(match.group(1).strip())
+        except Exception:
+            preamble, *resp = result.split(":")
+            return json.loads("".join(resp))
+
+
+def benchmark_json_extraction(repeats: int = 200) -> Dict[str, Any]:
+    """
+    Compares extract_json() with the old replace-and-retry parsing on MALFORMED_JSON_CORPUS.
+
+    Args:
+        repeats (int): Number of passes over the corpus for the timings.
+
+    Returns:
+        Dict[str, Any]: For each parser, the number of answers read correctly and the mean microseconds per answer.
+    """
+    from WargamesAI.utils.json_extract import extract_json
+
+    results = {}
+    for name, parse in (("extract_json", extract_json), ("legacy", _legacy_parse_json)):
+        correct = 0
+        for text, expected in MALFORMED_JSON_CORPUS:
+            try:
+                correct += parse(text) == expected
+            except Exception:
+                pass
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for text, _ in MALFORMED_JSON_CORPUS:
+                try:
+                    parse(text)
+                except Exception:
+                    pass
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "correct": correct,
+            "total": len(MALFORMED_JSON_CORPUS),
+            "us_per_answer": elapsed * 1e6 / (repeats * len(MALFORMED_JSON_CORPUS)),
+        }
+    return results
+
+
+def _unclustered_vectors(count: int, dimensions: int, seed: int) -> np.ndarray:
+    """
+    Generates synthetic embeddings from a single Gaussian whose variance decays across dimensions like the spectrum
+    of real sentence embeddings. There are no clusters for the IVF index to exploit, so this is a pessimistic
+    stand-in for real text.
+    """
+    rng = np.random.default_rng(seed)
+    scales = 1.0 / np.sqrt(np.arange(1, dimensions + 1))
+    rotation, _ = np.linalg.qr(rng.normal(size=(dimensions, dimensions)))
+    return (rng.normal(size=(count, dimensions)) * scales) @ rotation
+
+
+def corpus_embeddings(path: str, query_fraction: float = 0.05, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Embeds a PDF or folder of PDFs, e.g. game rules or doctrine manuals, with EasyRAG's embedding model and holds
+    out some chunks as queries.
+
+    Args:
+        path (str): The PDF or folder.
+        query_fraction (float): Fraction of the chunks used as queries rather than indexed.
+        seed (int): Seed for choosing the query chunks.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The corpus and query embeddings.
+    """
+    from WargamesAI.utils.easyRAG import EasyRAG
+
+    embeddings = np.asarray(EasyRAG().get_index(path).embeddings, dtype=np.float32)
+    held_out = np.random.default_rng(seed).random(len(embeddings)) < query_fraction
+    return embeddings[~held_out], embeddings[held_out]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Runs every benchmark and prints the results. IVF retrieval is measured on real embeddings of the corpus given
+    with --corpus, or on unclustered synthetic embeddings without one.
+
+    Args:
+        argv (List[str]): Command line arguments. Defaults to sys.argv.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="WargamesAI micro-benchmarks")
+    parser.add_argument("--corpus", help="PDF or folder of PDFs whose real embeddings the IVF index is measured on")
+    args = parser.parse_args(argv)
+
+    for module in ("WargamesAI", "WargamesAI.coordination", "WargamesAI.agents.agent"):
+        result = measure_import_time(module)
+        heavy = f", imported {', '.join(result['heavy'])}" if result["heavy"] else ""
+        print(f"Import {module}: {result['median_s'] * 1000:.1f}ms{heavy}")
+
+    print("JSON extraction (malformed answer corpus)")
+    for name, row in benchmark_json_extraction().items():
+        print(f"  {name:<12}  correct={row['correct']}/{row['total']}  {row['us_per_answer']:.1f}us/answer")
+
+    if args.corpus:
+        corpus, queries = corpus_embeddings(args.corpus)
+        source = f"{args.corpus}: {len(corpus)} chunks x {corpus.shape[1]}, {len(queries)} held-out queries"
+    else:
+        vectors = _unclustered_vectors(50200, 384, seed=0)
+        corpus, queries = vectors[:50000], vectors[50000:]
+        source = "unclustered synthetic, 50k x 384"
+    print(f"IVF recall vs latency ({source}, top-5)")
+    rows = benchmark_ivf(corpus, queries)
+    print(f"  index built in {rows[0]['build_s']:.1f}s")
+    for row in rows:
+        print(
+            f"  nprobe={row['nprobe']:>3}/{row['nlist']}  recall={row['recall']:.3f}  "
+            f"ivf={row['ivf_ms']:.2f}ms  exact={row['exact_ms']:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Approximate template overhead per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+SUMMARY_ACKNOWLEDGEMENT = "Understood."
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Estimates the number of tokens in a text at roughly four characters per token.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return len(text) // 4 + 1
+
+
+class DialogueMemory:
+    """
+    The message history of an EasyLLM dialogue with a running token count.
+
+    Each message's token count is computed once, when it is appended. Messages are grouped into exchanges (a question
+    and its reply) so that compaction never leaves a question without its answer. Pinned exchanges, such as the rules
+    and bio primer, are never removed. When the history exceeds its budget the oldest unpinned exchanges are evicted,
+    or folded into a summary exchange when a summarizer is configured.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        summarizer: Optional[Callable[[List[dict]], str]] = None,
+    ) -> None:
+        """
+        Initializes the DialogueMemory.
+
+        Args:
+            count_tokens (Callable): Function returning the token count of a text. Defaults to an estimate.
+            summarizer (Callable): Optional function turning evicted messages into a short summary text.
+        """
+        self.count_tokens = count_tokens or approximate_token_count
+        self.summarizer = summarizer
+        self._messages: List[dict] = []
+        self._tokens: List[int] = []
+        self._pinned: List[bool] = []
+        # Id of the exchange each message belongs to; summary exchanges use -1
+        self._exchanges: List[int] = []
+        self._next_exchange = 0
+        self.total_tokens = 0
+        self.evicted_messages = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def __repr__(self) -> str:
+        return repr(self._messages)
+
+    def copy(self) -> List[dict]:
+        """
+        Returns the messages as a new list.
+        """
+        return list(self._messages)
+
+    def _message_tokens(self, message: dict) -> int:
+        return self.count_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+    def append(self, message: dict, pinned: bool = False, reply: bool = False) -> None:
+        """
+        Appends a message and counts its tokens.
+
+        Args:
+            message (dict): The message, with "content" and optionally "role".
+            pinned (bool): Whether the message must never be compacted away.
+            reply (bool): Whether the message answers the previous one, rather than starting a new exchange.
+        """
+        if not reply or not self._exchanges:
+            self._next_exchange += 1
+        tokens = self._message_tokens(message)
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self._pinned.append(pinned)
+        self._exchanges.append(self._next_exchange)
+        self.total_tokens += tokens
+
+    def pinned_messages(self) -> List[dict]:
+        """
+        Returns the pinned messages, e.g. the rules and bio primer, in order.
+        """
+        return [message for message, pinned in zip(self._messages, self._pinned) if pinned]
+
+    def pin_last_exchange(self) -> None:
+        """
+        Pins the most recent exchange so it is never compacted away.
+        """
+        if not self._exchanges:
+            return
+        last = self._exchanges[-1]
+        for i in range(len(self._exchanges) - 1, -1, -1):
+            if self._exchanges[i] != last:
+                break
+            self._pinned[i] = True
+
+    def clear(self) -> None:
+        """
+        Removes every message, including pinned ones.
+        """
+        self._messages.clear()
+        self._tokens.clear()
+        self._pinned.clear()
+        self._exchanges.clear()
+        self.total_tokens = 0
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Returns the history as plain data for a checkpoint. Token counts are not stored, they are recounted on load.
+
+        Returns:
+            dict: The messages with their pinned flags and exchange ids.
+        """
+        return {
+            "messages": list(self._messages),
+            "pinned": list(self._pinned),
+            "exchanges": list(self._exchanges),
+            "next_exchange": self._next_exchange,
+            "evicted_messages": self.evicted_messages,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Replaces the history with one saved by to_state().
+
+        Args:
+            state (dict): The saved history.
+        """
+        self.clear()
+        self._messages = [dict(message) for message in state["messages"]]
+        self._tokens = [self._message_tokens(message) for message in self._messages]
+        self._pinned = list(state["pinned"])
+        self._exchanges = list(state["exchanges"])
+        self._next_exchange = state["next_exchange"]
+        self.total_tokens = sum(self._tokens)
+        self.evicted_messages = state.get("evicted_messages", 0)
+
+    def _remove(self, indices: List[int]) -> List[dict]:
+        """
+        Removes messages by index and returns them in order.
+        """
+        removed = [self._messages[i] for i in indices]
+        dropped = set(indices)
+        keep = [i for i in range(len(self._messages)) if i not in dropped]
+        self.total_tokens -= sum(self._tokens[i] for i in indices)
+        self._messages = [self._messages[i] for i in keep]
+        self._tokens = [self._tokens[i] for i in keep]
+        self._pinned = [self._pinned[i] for i in keep]
+        self._exchanges = [self._exchanges[i] for i in keep]
+        self.evicted_messages += len(removed)
+        return removed
+
+    def compact(self, max_tokens: int) -> int:
+        """
+        Removes the oldest unpinned exchanges until the history fits the token budget. The most recent exchange,
+        usually the question about to be answered, is always kept.
+
+        Args:
+            max_tokens (int): The token budget for the whole history.
+
+        Returns:
+            int: Number of messages removed.
+        """
+        if self.total_tokens <= max_tokens or not self._messages:
+            return 0
+
+        current = self._exchanges[-1]
+        evicted: List[dict] = []
+        while self.total_tokens > max_tokens:
+            candidates = [
+                exchange
+                for exchange, pinned in zip(self._exchanges, self._pinned)
+                if not pinned and exchange != current
+            ]
+            if not candidates:
+                break
+            oldest = candidates[0]
+            indices = [i for i, exchange in enumerate(self._exchanges) if exchange == oldest]
+            evicted.extend(self._remove(indices))
+
+        if evicted and self.summarizer is not None:
+            self._insert_summary(evicted, max_tokens)
+
+        return len(evicted)
+
+    def _insert_summary(self, evicted: List[dict], max_tokens: int) -> None:
+        """
+        Folds evicted messages into a summary exchange placed after the pinned messages. An existing summary is
+        replaced by a new one that also covers it.
+
+        Args:
+            evicted (List[dict]): The messages that were removed, oldest first.
+            max_tokens (int): The token budget, which the summary is not allowed to push the history over.
+        """
+        summary_indices = [i for i, exchange in enumerate(self._exchanges) if exchange == -1]
+        previous = [self._messages[i] for i in summary_indices]
+        if summary_indices:
+            self._remove(summary_indices)
+            self.evicted_messages -= len(summary_indices)
+
+        summary = self.summarizer(previous + evicted)
+        if not summary:
+            return
+
+        question_role = evicted[0].get("role")
+        answer_role = next((m.get("role") for m in evicted if m.get("role") != question_role), None)
+        question = {"content": f"{SUMMARY_PREFIX} {summary}"}
+        answer = {"content": SUMMARY_ACKNOWLEDGEMENT}
+        if question_role:
+            question["role"] = question_role
+        if answer_role:
+            answer["role"] = answer_role
+
+        tokens = [self._message_tokens(question), self._message_tokens(answer)]
+        if self.total_tokens + sum(tokens) > max_tokens:
+            return
+
+        # Place the summary after the leading pinned messages so the pinned prefix stays unchanged
+        position = 0
+        while position < len(self._messages) and self._pinned[position]:
+            position += 1
+        for offset, (message, count) in enumerate(zip((question, answer), tokens)):
+            self._messages.insert(position + offset, message)
+            self._tokens.insert(position + offset, count)
+            self._pinned.insert(position + offset, False)
+            self._exchanges.insert(position + offset, -1)
+        self.total_tokens += sum(tokens)
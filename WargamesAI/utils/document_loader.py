@@ -0,0 +1,164 @@
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Preferred split points, best first, used when a chunk has to be cut
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def iter_pages(pdf_path: str) -> Iterator[str]:
+    """
+    Streams the text of a PDF one page at a time.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Yields:
+        str: The text of each page that contains any.
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text = page.get_text()
+            if text.strip():
+                yield text
+
+
+def read_pdf_text(pdf_path: str) -> str:
+    """
+    Reads the text of every page of a PDF.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Returns:
+        str: The text of all pages joined by newlines.
+    """
+    return "\n".join(iter_pages(pdf_path))
+
+
+def _find_cut(text: str, chunk_size: int) -> int:
+    """
+    Finds where to end a chunk, preferring paragraph, line, sentence and word boundaries in that order.
+
+    Args:
+        text (str): The buffered text, longer than chunk_size.
+        chunk_size (int): The maximum chunk size in characters.
+
+    Returns:
+        int: The index to cut the text at.
+    """
+    window = text[:chunk_size]
+    for separator in SEPARATORS:
+        position = window.rfind(separator)
+        # Do not accept a boundary that would produce a tiny chunk
+        if position >= chunk_size // 2:
+            return position + len(separator)
+    return chunk_size
+
+
+def _overlap_start(text: str, cut: int, chunk_overlap: int) -> int:
+    """
+    Finds where the next chunk should start so it overlaps the previous one, starting on a word boundary.
+
+    Args:
+        text (str): The buffered text.
+        cut (int): Where the previous chunk ended.
+        chunk_overlap (int): The number of characters to overlap.
+
+    Returns:
+        int: The index the next chunk starts at.
+    """
+    # The next chunk must start after the previous one did, otherwise the buffer would never shrink
+    if chunk_overlap <= 0 or cut - chunk_overlap <= 0:
+        return cut
+    start = cut - chunk_overlap
+    space = text.find(" ", start, cut)
+    return space + 1 if space != -1 and space + 1 < cut else start
+
+
+def iter_chunks(pages: Iterable[str], chunk_size: int = 1000, chunk_overlap: int = 100) -> Iterator[str]:
+    """
+    Splits a stream of page texts into overlapping chunks. Chunks may span page boundaries and at most about one
+    page plus one chunk of text is held in memory at a time.
+
+    Args:
+        pages (Iterable[str]): The page texts.
+        chunk_size (int): The maximum size of each chunk in characters.
+        chunk_overlap (int): The number of characters to overlap between chunks.
+
+    Yields:
+        str: The text chunks.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size.")
+
+    buffer = ""
+    for page in pages:
+        buffer = f"{buffer}\n{page}" if buffer else page
+        while len(buffer) > chunk_size:
+            cut = _find_cut(buffer, chunk_size)
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            buffer = buffer[_overlap_start(buffer, cut, chunk_overlap):]
+
+    chunk = buffer.strip()
+    if chunk:
+        yield chunk
+
+
+def iter_pdf_chunks(pdf_path: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> Iterator[str]:
+    """
+    Streams the text chunks of a PDF without loading the whole document.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        chunk_size (int): The maximum size of each chunk in characters.
+        chunk_overlap (int): The number of characters to overlap between chunks.
+
+    Yields:
+        str: The text chunks.
+    """
+    return iter_chunks(iter_pages(pdf_path), chunk_size, chunk_overlap)
+
+
+def iter_batches(items: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """
+    Groups a stream of items into lists of at most batch_size.
+
+    Args:
+        items (Iterable[str]): The items to group.
+        batch_size (int): The maximum batch size.
+
+    Yields:
+        List[str]: The batches.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_embedding_batches(
+    chunks: Iterable[str], encode: Callable[[List[str]], "np.ndarray"], batch_size: int = 64
+) -> Iterator[Tuple[List[str], "np.ndarray"]]:
+    """
+    Embeds a stream of chunks in mini-batches.
+
+    Args:
+        chunks (Iterable[str]): The text chunks.
+        encode (Callable): Function turning a list of texts into an embedding matrix.
+        batch_size (int): Number of chunks embedded per call.
+
+    Yields:
+        Tuple[List[str], np.ndarray]: Each batch of chunks with its embeddings.
+    """
+    for batch in iter_batches(chunks, batch_size):
+        yield batch, encode(batch)
@@ -1,27 +1,53 @@
+import asyncio
 import re
-from typing import Any, Dict, List, Tuple, Type, Union
-
-import torch
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    BitsAndBytesConfig,
-    logging as hf_logging,
-)
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
-from pydantic import BaseModel, Field, RootModel, create_model
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
 import json
 import os
 import random
 
-# Suppress unnecessary warnings
-hf_logging.set_verbosity_error()
+from WargamesAI.utils.dialogue_memory import DialogueMemory, approximate_token_count
+from WargamesAI.utils.generation_budget import JsonStoppingCriteria, get_schema_budgets, is_balanced_json
+from WargamesAI.utils.json_extract import JsonExtractionError, JsonValidationError, extract_json
+from WargamesAI.utils.json_constraint import JsonSchemaLogitsProcessor, get_vocabulary, grammar_for_model
+from WargamesAI.utils.kv_cache import PrefixKVCache
+from WargamesAI.utils.llm_backends import LLMBackend, get_default_backend, get_generation_seed
+from WargamesAI.utils.model_pool import ModelPool, PoolKey, get_model_pool
+from WargamesAI.utils.replay import dialogue_digest, get_recorder
+from WargamesAI.utils.prompt_assembly import JsonPrompt, PromptAssembler, build_json_prompt, get_format_instructions
+
+# torch, transformers, langchain and pydantic are imported on first use to keep package imports fast
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    from WargamesAI.utils.response_cache import ResponseCache
 
 UNSLOTH_MODELS = ["unsloth/Llama-3.1-Storm-8B-bnb-4bit",
                   "unsloth/mistral-7b-instruct-v0.3",
                   "unsloth/gemma-2-9b-it-bnb-4bit"]
 
+_DEFAULT_MODEL_NAME: Optional[str] = None
+_DEFAULT_MODEL_LOCK = threading.Lock()
+
+
+def get_default_model_name() -> str:
+    """
+    Returns the model used by every EasyLLM created without a model name. It is picked from UNSLOTH_MODELS once per
+    process, so the agents and umpire of a game share one resident model rather than each loading their own.
+
+    Returns:
+        str: The model name.
+    """
+    global _DEFAULT_MODEL_NAME
+    with _DEFAULT_MODEL_LOCK:
+        if _DEFAULT_MODEL_NAME is None:
+            _DEFAULT_MODEL_NAME = random.choice(UNSLOTH_MODELS)
+            print(f"No model chosen, model {_DEFAULT_MODEL_NAME} selected.")
+        return _DEFAULT_MODEL_NAME
+
+
 class EasyLLM:
     """
     A simple class for interacting with a pretrained language model to generate dialogue responses.
@@ -31,6 +57,16 @@ class EasyLLM:
         self,
         max_new_tokens: int = 200,
         model_name: str = None,
+        model_pool: ModelPool = None,
+        use_prefix_cache: bool = True,
+        backend: LLMBackend = None,
+        max_context_tokens: int = None,
+        summarize_dialogue: bool = False,
+        constrained_decoding: bool = False,
+        adaptive_budgets: bool = True,
+        response_cache: "ResponseCache" = None,
+        seed: int = None,
+        validation_retries: int = 2,
     ) -> None:
         """
         Initializes the EasyLLM class with a specified model and token generation limit.
@@ -38,89 +74,184 @@ class EasyLLM:
         Args:
             max_new_tokens (int): Maximum number of new tokens to generate in a response.
             model_name (str): Name of the pretrained language model to use.
+            model_pool (ModelPool): Pool the model is shared through. Defaults to the process-wide pool.
+            use_prefix_cache (bool): Whether to reuse cached past_key_values for stable prompt prefixes.
+            backend (LLMBackend): Inference backend to generate with, e.g. an OpenAIHTTPBackend. Defaults to the
+                backend set with set_default_backend(), or the in-process HuggingFace model if there is none.
+            max_context_tokens (int): Context window of the model. Defaults to the loaded model's maximum position
+                embeddings; with a backend and no value the dialogue is never compacted.
+            summarize_dialogue (bool): Whether compacted dialogue turns are summarised by the model rather than
+                simply evicted.
+            constrained_decoding (bool): Whether answers to prompts from generate_json_prompt are constrained to
+                valid JSON for the prompt's schema while they are generated.
+            adaptive_budgets (bool): Whether answers to JSON prompts stop as soon as the JSON is complete and are
+                capped at a token budget learned per schema, falling back to max_new_tokens if they run out.
+            response_cache (ResponseCache): Cache answering repeated and near-identical questions without
+                generating, e.g. get_response_cache(). Disabled if None.
+            seed (int): Seed making sampling reproducible: each answer is sampled with a seed derived from it and the
+                dialogue. Defaults to the seed set with set_generation_seed() in this thread, if any.
+            validation_retries (int): How many times an answer to a JSON prompt that cannot be read or does not match
+                the prompt's schema is regenerated before it is used as parsed.
         """
         self.max_new_tokens = max_new_tokens
-        
+        self.backend = backend if backend is not None else get_default_backend()
+
+        if model_name is None and self.backend is not None and self.backend.model_name:
+            model_name = self.backend.model_name
+
         if model_name is None:
-            model_name = random.choice(UNSLOTH_MODELS)
-            print(f"No model chosen, model {model_name} selected.")
+            model_name = get_default_model_name()
         
         self.model_name = model_name
-        self.dialogue: List[dict] = []
+        self.max_context_tokens = max_context_tokens
+        self.dialogue = DialogueMemory(
+            count_tokens=self._count_tokens,
+            summarizer=self._summarize_messages if summarize_dialogue else None,
+        )
+        # Guards the dialogue so concurrent callers (threads or asyncio tasks) never interleave a question/answer
+        self._dialogue_lock = threading.RLock()
 
         self._device: str = "cuda"
+        self._model_pool = model_pool or get_model_pool()
+        self._pool_entry = None
+        self.use_prefix_cache = use_prefix_cache
+        self.constrained_decoding = constrained_decoding
+        self.adaptive_budgets = adaptive_budgets
+        self._schema_budgets = get_schema_budgets()
+        self.response_cache = response_cache
+        self.seed = seed if seed is not None else get_generation_seed()
+        self.validation_retries = validation_retries
+        # Number of the regeneration in progress, so seeded retries are not sampled like the rejected answer
+        self._validation_attempt = 0
         self.model = None
         self.tokenizer = None
+        # Kept after the model handle is released so message token counts stay consistent
+        self._counting_tokenizer = None
+        self._model_context_tokens = None
+
+    @property
+    def quantization(self) -> str:
+        """Returns the quantization implied by the model name ('4bit', '8bit' or 'bf16')."""
+        name = self.model_name.lower()
+        if '4bit' in name:
+            return '4bit'
+        if '8bit' in name:
+            return '8bit'
+        return 'bf16'
+
+    @property
+    def pool_key(self) -> PoolKey:
+        """Returns the key this instance's model is shared under in the model pool."""
+        return (self.model_name, self.quantization, self._device)
+
+    def _load_model(self) -> Tuple["AutoModelForCausalLM", "AutoTokenizer"]:
+        """
+        Acquires the shared language model and tokenizer from the model pool, loading them only when they are
+        not already resident.
 
-    def _load_model(self) -> Tuple[AutoModelForCausalLM, AutoTokenizer]:
+        Returns:
+            Tuple[AutoModelForCausalLM, AutoTokenizer]: Loaded language model and tokenizer.
         """
-        Loads the pretrained language model and tokenizer only when needed.
+        # Remote backends hold their own weights
+        if self.backend is None and self._pool_entry is None:
+            self._pool_entry = self._model_pool.acquire(self.pool_key, self._load_model_weights)
+            self.model = self._pool_entry.model
+            self.tokenizer = self._pool_entry.tokenizer
+            self._counting_tokenizer = self.tokenizer
+            config = getattr(self.model, "config", None)
+            self._model_context_tokens = getattr(config, "max_position_embeddings", None)
+
+        return self.model, self.tokenizer
+
+    @property
+    def prefix_cache(self) -> PrefixKVCache:
+        """Returns the prefix KV-cache shared by every instance using the currently acquired model."""
+        if self._pool_entry is None:
+            raise RuntimeError("The model must be loaded before its prefix cache can be used.")
+        return self._pool_entry.extras.setdefault("prefix_cache", PrefixKVCache())
+
+    @property
+    def prompt_assembler(self) -> PromptAssembler:
+        """Returns the segment token cache shared by every instance using the currently acquired tokenizer."""
+        if self._pool_entry is None:
+            raise RuntimeError("The model must be loaded before its prompt assembler can be used.")
+        extras = self._pool_entry.extras
+        if "prompt_assembler" not in extras:
+            extras["prompt_assembler"] = PromptAssembler(self.tokenizer)
+        return extras["prompt_assembler"]
+
+    def _load_model_weights(self) -> Tuple["AutoModelForCausalLM", "AutoTokenizer"]:
+        """
+        Loads the pretrained language model and tokenizer from disk.
 
         Returns:
             Tuple[AutoModelForCausalLM, AutoTokenizer]: Loaded language model and tokenizer.
         """
-        if self.model is None or self.tokenizer is None:
-            is_4bit = '4bit' in self.model_name.lower()
-            is_8bit = '8bit' in self.model_name.lower()
-
-            if is_4bit or is_8bit:
-                # Use BitsAndBytesConfig for quantized models
-                if is_4bit:
-                    quantization_config = BitsAndBytesConfig(
-                        load_in_4bit=True,
-                        bnb_4bit_compute_dtype=torch.bfloat16,
-                        bnb_4bit_use_double_quant=True,
-                        bnb_4bit_quant_type='nf4',
-                    )
-                else:
-                    quantization_config = BitsAndBytesConfig(
-                        load_in_8bit=True,
-                        bnb_8bit_compute_dtype=torch.bfloat16,
-                    )
-
-                max_memory = {
-                    0: "13GiB",  # Adjust this value based on your GPU's available memory
-                    "cpu": "30GiB"  # Adjust based on your system's RAM
-                }
-
-                # Use device_map with max_memory to control layer placement
-                device_map = "auto"
-
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_name,
-                    quantization_config=quantization_config,
-                    device_map=device_map,
-                    max_memory=max_memory,
-                    offload_folder="offload",  # Folder to offload weights if necessary
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, logging as hf_logging
+
+        # Suppress unnecessary warnings
+        hf_logging.set_verbosity_error()
+
+        is_4bit = self.quantization == '4bit'
+        is_8bit = self.quantization == '8bit'
+
+        if is_4bit or is_8bit:
+            # Use BitsAndBytesConfig for quantized models
+            if is_4bit:
+                quantization_config = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_compute_dtype=torch.bfloat16,
+                    bnb_4bit_use_double_quant=True,
+                    bnb_4bit_quant_type='nf4',
                 )
             else:
-                # For non-quantized models
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_name,
-                    torch_dtype=torch.bfloat16,
-                    device_map='auto',
+                quantization_config = BitsAndBytesConfig(
+                    load_in_8bit=True,
+                    bnb_8bit_compute_dtype=torch.bfloat16,
                 )
 
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, padding_side="left")
+            max_memory = {
+                0: "13GiB",  # Adjust this value based on your GPU's available memory
+                "cpu": "30GiB"  # Adjust based on your system's RAM
+            }
 
-            # Ensure pad_token_id is set
-            if self.tokenizer.pad_token_id is None:
-                self.tokenizer.pad_token_id = self.tokenizer.eos_token_id or 0
+            # Use device_map with max_memory to control layer placement
+            device_map = "auto"
 
-        return self.model, self.tokenizer
+            model = AutoModelForCausalLM.from_pretrained(
+                self.model_name,
+                quantization_config=quantization_config,
+                device_map=device_map,
+                max_memory=max_memory,
+                offload_folder="offload",  # Folder to offload weights if necessary
+            )
+        else:
+            # For non-quantized models
+            model = AutoModelForCausalLM.from_pretrained(
+                self.model_name,
+                torch_dtype=torch.bfloat16,
+                device_map='auto',
+            )
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name, padding_side="left")
+
+        # Ensure pad_token_id is set
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token_id = tokenizer.eos_token_id or 0
+
+        return model, tokenizer
 
     def _unload_model(self) -> None:
         """
-        Unloads the model from GPU memory by deleting the model and tokenizer.
+        Releases this instance's handle on the shared model. The weights stay resident in the model pool and are
+        only evicted when the pool's memory budget is exceeded.
         """
-        if self.model is not None:
-            del self.model
+        if self._pool_entry is not None:
+            self._pool_entry = None
             self.model = None
-            torch.cuda.empty_cache()
-
-        if self.tokenizer is not None:
-            del self.tokenizer
             self.tokenizer = None
+            self._model_pool.release(self.pool_key)
 
     def _generate_dialogue_response(self, messages: List[dict]) -> str:
         """
@@ -132,114 +263,745 @@ class EasyLLM:
         Returns:
             str: Generated response from the language model.
         """
-        # Load model and tokenizer if not already loaded
+        if self.backend is not None:
+            budget = self._token_budget(messages)
+            return self._check_backend_budgets([messages], [self._backend_generate(messages, budget)], budget)[0]
+
+        # Acquire the shared model and tokenizer from the pool
         self._load_model()
-        
+        try:
+            return self._generate_with_loaded_model(messages)
+        finally:
+            # Release the handle; the weights stay resident in the pool
+            self._unload_model()
+
+    def _generate_with_loaded_model(self, messages: List[dict]) -> str:
+        """
+        Generates a response with the model that has already been acquired from the pool.
+
+        Args:
+            messages (List[dict]): List of input messages.
+
+        Returns:
+            str: Generated response from the language model.
+        """
+        return self._generate_batch_with_loaded_model([messages])[0]
+
+    def _backend_generate(self, messages: List[dict], max_new_tokens: int) -> str:
+        """
+        Generates with the inference backend, passing the answer's schema when constrained decoding is enabled.
+
+        Args:
+            messages (List[dict]): List of input messages.
+            max_new_tokens (int): Maximum number of new tokens to generate.
+
+        Returns:
+            str: Generated response from the backend.
+        """
+        kwargs = {}
+        if self.seed is not None and self.backend.supports_seed:
+            kwargs["seed"] = self._sampling_seed([messages])
+        schema = self._response_schema(messages)
+        if schema is not None:
+            return self.backend.generate(messages, max_new_tokens, json_schema=schema.model_json_schema(), **kwargs)
+        return self.backend.generate(messages, max_new_tokens, **kwargs)
+
+    def _sampling_seed(self, dialogues: List[List[dict]]) -> int:
+        """
+        Derives the sampling seed for answering dialogues from the instance's seed, so the same question in the same
+        dialogue is answered the same way whatever order questions are asked in.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues answered together.
+
+        Returns:
+            int: The seed.
+        """
+        seeds = [{"content": self.seed}]
+        if self._validation_attempt:
+            seeds.append({"content": f"retry {self._validation_attempt}"})
+        digest = dialogue_digest(seeds + [message for messages in dialogues for message in messages])
+        return int(digest[:15], 16)
+
+    def _prompt_schema(self, messages: List[dict]) -> Optional[Type["BaseModel"]]:
+        """
+        Returns the schema of the last message if it was built by generate_json_prompt.
+
+        Args:
+            messages (List[dict]): The dialogue.
+
+        Returns:
+            Optional[Type[BaseModel]]: The schema, or None.
+        """
+        if not messages:
+            return None
+        return getattr(messages[-1].get("content"), "schema", None)
+
+    def _budget_key(self, schema: Type["BaseModel"]) -> Tuple[str, str]:
+        """Returns the key answers to a schema from this model are budgeted under."""
+        return (self.model_name, schema.__name__)
+
+    def _token_budget(self, messages: List[dict]) -> int:
+        """
+        Returns the maximum number of new tokens for the answer to a dialogue: the budget learned for its schema,
+        or max_new_tokens.
+
+        Args:
+            messages (List[dict]): The dialogue.
+
+        Returns:
+            int: The token budget.
+        """
+        schema = self._prompt_schema(messages)
+        if schema is None or not self.adaptive_budgets:
+            return self.max_new_tokens
+        return self._schema_budgets.budget(self._budget_key(schema), self.max_new_tokens)
+
+    def _response_schema(self, messages: List[dict]) -> Optional[Type["BaseModel"]]:
+        """
+        Returns the schema the answer to a dialogue is constrained to, if constrained decoding is enabled and the
+        last message was built by generate_json_prompt.
+
+        Args:
+            messages (List[dict]): The dialogue.
+
+        Returns:
+            Optional[Type[BaseModel]]: The schema, or None.
+        """
+        if not self.constrained_decoding:
+            return None
+        return self._prompt_schema(messages)
+
+    def _encode_messages(self, messages: List[dict]) -> List[int]:
+        """
+        Converts a dialogue into prompt token ids, using the chat template when the tokenizer has one.
+
+        Args:
+            messages (List[dict]): List of input messages.
+
+        Returns:
+            List[int]: The prompt token ids.
+        """
         chat_template = getattr(self.tokenizer, 'chat_template', None)
         if (chat_template):
-            # Use the chat template to prepare input
-            input_data = self.tokenizer.apply_chat_template(
-                messages, tokenize=True, add_generation_prompt=True, return_tensors="pt"
+            # Render with the chat template, then tokenize only the segments that have not been seen before
+            rendered = self.tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
             )
-            # Check if input_data is a dictionary or tensor
-            if isinstance(input_data, dict):
-                input_ids = input_data["input_ids"].to(self._device)
-                attention_mask = input_data.get("attention_mask", torch.ones_like(input_ids)).to(self._device)
-            elif isinstance(input_data, torch.Tensor):
-                # input_data is a tensor
-                input_ids = input_data.to(self._device)
-                attention_mask = torch.ones_like(input_ids).to(self._device)
-            else:
-                raise TypeError(f"Unexpected type for input_data: {type(input_data)}")
-        else:
-            # Manually format the prompt without assuming roles
-            prompt = self.format_messages(messages)
-            input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(self._device)
-            attention_mask = torch.ones_like(input_ids).to(self._device)
-
-        generated_ids = self.model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            max_new_tokens=self.max_new_tokens,
-            do_sample=True,
-            pad_token_id=self.tokenizer.pad_token_id,
-        )
+            return self.prompt_assembler.encode(rendered)
+
+        # Manually format the prompt without assuming roles
+        prompt = self.format_messages(messages)
+        return self.tokenizer.encode(prompt)
+
+    def _generate_batch_with_loaded_model(
+        self, dialogues: List[List[dict]], max_new_tokens: Optional[int] = None
+    ) -> List[str]:
+        """
+        Generates responses for several independent dialogues in a single left-padded generate call.
+
+        Answers to JSON prompts stop as soon as their JSON is balanced, and the call is capped at the largest learned
+        budget of its dialogues. Answers that run out of budget are generated again with max_new_tokens.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues to answer.
+            max_new_tokens (int): Maximum number of new tokens, overriding the learned budgets.
+
+        Returns:
+            List[str]: Generated response for each dialogue, in the same order.
+        """
+        import torch
+
+        encoded = [self._encode_messages(messages) for messages in dialogues]
+        longest = max(len(ids) for ids in encoded)
+        pad_token_id = self.tokenizer.pad_token_id
+
+        # The tokenizer pads on the left so every prompt ends at the same position
+        input_ids = torch.tensor(
+            [[pad_token_id] * (longest - len(ids)) + ids for ids in encoded], dtype=torch.long
+        ).to(self._device)
+        attention_mask = torch.tensor(
+            [[0] * (longest - len(ids)) + [1] * len(ids) for ids in encoded], dtype=torch.long
+        ).to(self._device)
+
+        generate_kwargs = {}
+        schemas = [self._response_schema(messages) for messages in dialogues]
+        if any(schema is not None for schema in schemas):
+            from transformers import LogitsProcessorList
+
+            # Only tokens that keep each answer valid JSON for its schema can be generated
+            grammars = [grammar_for_model(schema) if schema is not None else None for schema in schemas]
+            processor = JsonSchemaLogitsProcessor(
+                get_vocabulary(self._pool_entry.extras, self.tokenizer),
+                grammars,
+                prompt_length=input_ids.shape[-1],
+                eos_token_id=self.tokenizer.eos_token_id,
+            )
+            generate_kwargs["logits_processor"] = LogitsProcessorList([processor])
+
+        budget = max_new_tokens or max(self._token_budget(messages) for messages in dialogues)
+        prompt_schemas = [self._prompt_schema(messages) if self.adaptive_budgets else None for messages in dialogues]
+        stopping = None
+        if any(schema is not None for schema in prompt_schemas):
+            from transformers import StoppingCriteriaList
+
+            # End each answer as soon as its JSON is balanced rather than at the token cap
+            stopping = JsonStoppingCriteria(
+                get_vocabulary(self._pool_entry.extras, self.tokenizer), input_ids.shape[-1], len(dialogues)
+            )
+            generate_kwargs["stopping_criteria"] = StoppingCriteriaList([stopping])
+
+        with self._pool_entry.lock:
+            past_key_values = None
+            if self.use_prefix_cache and len(encoded) == 1:
+                # Only the suffix after the longest cached prefix needs to be prefilled. The cache is lent out
+                # under the model's lock and cropped back to its prefix afterwards rather than copied.
+                cached_length, past_key_values = self.prefix_cache.lookup(encoded[0])
+                if past_key_values is not None:
+                    generate_kwargs["past_key_values"] = past_key_values
+
+            if self.seed is not None:
+                import torch
+
+                # Seeded under the model's lock, so concurrent games cannot reseed between this and generate()
+                torch.manual_seed(self._sampling_seed(dialogues))
+            try:
+                generated_ids = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    max_new_tokens=budget,
+                    do_sample=True,
+                    pad_token_id=pad_token_id,
+                    **generate_kwargs,
+                )
+            finally:
+                if past_key_values is not None:
+                    self.prefix_cache.restore(past_key_values, cached_length)
+
+        if "logits_processor" in generate_kwargs and processor.dead_ends:
+            print(f"Constrained decoding ended {processor.dead_ends} answer(s) early: no token could continue the JSON.")
 
         # Extract only the newly generated tokens
         generated_tokens = generated_ids[:, input_ids.shape[-1]:]
-        decoded = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+        decoded = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+        results = [text.strip() for text in decoded]
+
+        if stopping is not None:
+            retry = []
+            for row, schema in enumerate(prompt_schemas):
+                if schema is None:
+                    continue
+                completed_at = stopping.completed_at[row]
+                row_ids = generated_tokens[row].tolist()
+                ran_out = completed_at is None and len(row_ids) >= budget and row_ids[-1] not in (
+                    self.tokenizer.eos_token_id, pad_token_id
+                )
+                self._schema_budgets.record(
+                    self._budget_key(schema), completed_at or len(row_ids), truncated=ran_out
+                )
+                if ran_out and budget < self.max_new_tokens:
+                    retry.append(row)
 
-        # Unload model after generation to free up GPU memory
-        self._unload_model()
+            if retry:
+                # The learned budget was too small for these answers, so retry them with the full cap
+                retried = self._generate_batch_with_loaded_model(
+                    [dialogues[row] for row in retry], max_new_tokens=self.max_new_tokens
+                )
+                for row, result in zip(retry, retried):
+                    results[row] = result
+
+        return results
+
+    def _prefix_token_ids(self, messages: List[dict], text_end: str = None) -> List[int]:
+        """
+        Works out the token ids that every later prompt built on these messages will start with.
 
-        return decoded.strip()
+        Args:
+            messages (List[dict]): The messages forming the prefix.
+            text_end (str): Optional text inside the messages at which the prefix should end.
+
+        Returns:
+            List[int]: The stable prefix token ids.
+        """
+        chat_template = getattr(self.tokenizer, 'chat_template', None)
+        if chat_template:
+            rendered = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=False)
+        else:
+            rendered = self.format_messages(messages)
+
+        if text_end is not None and text_end in rendered:
+            rendered = rendered[:rendered.index(text_end) + len(text_end)]
+
+        if chat_template:
+            prefix_ids = self.tokenizer(rendered, add_special_tokens=False)["input_ids"]
+        else:
+            prefix_ids = self.tokenizer.encode(rendered)
+
+        # Token merges at the cut can differ from the full prompt, so only keep what a follow-on prompt shares
+        follow_on = messages + [{"role": self._message_roles()['user'], "content": "."}]
+        full_ids = self._encode_messages(follow_on)
+        shared = 0
+        for prefix_id, full_id in zip(prefix_ids, full_ids):
+            if prefix_id != full_id:
+                break
+            shared += 1
+        return full_ids[:shared]
+
+    def cache_prefix(self, question: str = None, text_end: str = None) -> int:
+        """
+        Caches past_key_values for the current dialogue, optionally followed by a question, so later prompts that
+        start the same way only prefill their new suffix. Prefixes are shared between instances using the same
+        model and build on any shorter prefix that is already cached.
+
+        Args:
+            question (str): Optional question to append to the dialogue before caching.
+            text_end (str): Optional text at which the cached prefix should end, e.g. the end of the game rules.
+
+        Returns:
+            int: Number of tokens that had to be prefilled.
+        """
+        if not self.use_prefix_cache or self.backend is not None:
+            return 0
+
+        # Model handles are per instance, so model use on one instance is serialised with its dialogue
+        with self._dialogue_lock:
+            self._load_model()
+            try:
+                messages = list(self.dialogue)
+                if question is not None:
+                    messages.append({"role": self._message_roles()['user'], "content": question})
+                if not messages:
+                    return 0
+
+                prefix_ids = self._prefix_token_ids(messages, text_end)
+                with self._pool_entry.lock:
+                    return self.prefix_cache.build(self.model, prefix_ids, self._device)
+            finally:
+                self._unload_model()
+
+    def _message_roles(self) -> Dict[str, str]:
+        """
+        Determines the user and assistant roles from the loaded tokenizer's chat template.
+
+        Returns:
+            Dict[str, str]: A dictionary with keys 'user' and 'assistant' mapping to the appropriate roles.
+        """
+        chat_template = getattr(self.tokenizer, 'chat_template', None)
+        roles = self.extract_roles_from_template(chat_template) if chat_template else []
+        return self.get_message_roles(roles)
 
     def reset_dialogue(self) -> None:
         """
         Resets the dialogue history, clearing all previous messages.
         """
-        self.dialogue = []
+        self.dialogue.clear()
 
-    def ask_question(self, question: str, reset_dialogue: bool = False) -> str:
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Returns the instance's dialogue and settings as plain data for a checkpoint.
+
+        Returns:
+            dict: The model name, token limit and dialogue history.
+        """
+        with self._dialogue_lock:
+            return {
+                "model_name": self.model_name,
+                "max_new_tokens": self.max_new_tokens,
+                "dialogue": self.dialogue.to_state(),
+            }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restores a dialogue saved by to_state(), so the conversation continues without asking its questions again.
+
+        Args:
+            state (dict): The saved state.
+        """
+        if state["model_name"] != self.model_name:
+            print(f"Restoring a dialogue held with '{state['model_name']}' into '{self.model_name}'.")
+        with self._dialogue_lock:
+            self.dialogue.load_state(state["dialogue"])
+
+    def _count_tokens(self, text: str) -> int:
+        """
+        Counts the tokens in a text with the model's tokenizer, or estimates them when it has not been loaded.
+
+        Args:
+            text (str): The text to count.
+
+        Returns:
+            int: The number of tokens.
+        """
+        if self._counting_tokenizer is not None:
+            return len(self._counting_tokenizer.encode(text, add_special_tokens=False))
+        return approximate_token_count(text)
+
+    @property
+    def dialogue_token_budget(self) -> int:
+        """Returns the number of tokens the dialogue may use, leaving room for the response, or None if unlimited."""
+        context_tokens = self.max_context_tokens or self._model_context_tokens
+        if not context_tokens:
+            return None
+        return max(context_tokens - self.max_new_tokens, 0)
+
+    def _summarize_messages(self, messages: List[dict]) -> str:
+        """
+        Asks the model for a short summary of dialogue messages that are being compacted.
+
+        Args:
+            messages (List[dict]): The messages to summarise.
+
+        Returns:
+            str: The summary.
+        """
+        prompt = (
+            "Summarise the key facts, decisions and actions in the following conversation in a few sentences:\n\n"
+            f"{self.format_messages(messages)}"
+        )
+        messages = [{"role": self._message_roles()['user'], "content": prompt}]
+        return self._generate_cached([messages], lambda dialogues: [self._generate_dialogue_response(dialogues[0])])[0]
+
+    def _compact_dialogue(self) -> None:
+        """
+        Compacts the dialogue to the token budget before generating, evicting or summarising the oldest unpinned
+        turns.
+        """
+        budget = self.dialogue_token_budget
+        if budget is not None:
+            self.dialogue.compact(budget)
+
+    def ask_question(
+        self, question: str, reset_dialogue: bool = False, pin: bool = False, cache_context: Any = None
+    ) -> str:
         """
         Generates a response for the given question using the loaded model.
 
         Args:
             question (str): The question or prompt provided by the user.
             reset_dialogue (bool): Whether to reset the dialogue history after generating a response.
+            pin (bool): Whether the question and its answer must stay in the dialogue when it is compacted, e.g. for
+                a rules or bio primer.
+            cache_context: What the answer depends on besides the question and the pinned primer, e.g. a digest of
+                the game state. Answers are only reused from the response cache when it matches.
 
         Returns:
             str: Generated response to the question.
         """
-        if reset_dialogue:
-            self.reset_dialogue()
+        with self._dialogue_lock:
+            if reset_dialogue:
+                self.reset_dialogue()
 
-        # Load model and tokenizer if not already loaded
-        self._load_model()
+            # Load model and tokenizer if not already loaded
+            self._load_model()
+            try:
+                # Determine the roles for the messages from the chat template
+                message_roles = self._message_roles()
 
-        # Extract roles from the chat template
-        chat_template = getattr(self.tokenizer, 'chat_template', None)
-        roles = self.extract_roles_from_template(chat_template) if chat_template else []
+                # Cached answers are keyed on the stable primer rather than the ever-growing transcript
+                context = [self.dialogue.pinned_messages(), cache_context]
 
-        # Determine the roles for the messages
-        message_roles = self.get_message_roles(roles)
+                # Add the user's question with the appropriate role
+                if message_roles['user']:
+                    self.dialogue.append({"role": message_roles['user'], "content": question}, pinned=pin)
+                else:
+                    self.dialogue.append({"content": question}, pinned=pin)
 
-        # Add the user's question with the appropriate role
-        if message_roles['user']:
-            self.dialogue.append({"role": message_roles['user'], "content": question})
-        else:
-            self.dialogue.append({"content": question})
+                # Keep the prompt within the context window before generating
+                self._compact_dialogue()
+
+                # Prepare the messages for the model
+                messages_for_model = self.dialogue.copy()
+
+                # Generate the response, or reuse a cached answer to the same question
+                result = self._generate_cached(
+                    [messages_for_model],
+                    lambda dialogues: [self._generate_dialogue_response(dialogues[0])],
+                    contexts=[context],
+                )[0]
+
+                # Add the model's response to the dialogue history
+                if message_roles['assistant']:
+                    self.dialogue.append({"role": message_roles['assistant'], "content": result}, pinned=pin, reply=True)
+                else:
+                    self.dialogue.append({"content": result}, pinned=pin, reply=True)
 
-        # Prepare the messages for the model
-        messages_for_model = self.dialogue.copy()
+                # Optionally reset the dialogue
+                if reset_dialogue:
+                    self.reset_dialogue()
+            finally:
+                # Answers served from the response cache never reach generation, which releases the handle
+                self._unload_model()
 
-        # Generate the response
-        result = self._generate_dialogue_response(messages_for_model)
+        return self._parse_response(result, messages_for_model)
+
+    async def ask_question_async(
+        self, question: str, reset_dialogue: bool = False, pin: bool = False, cache_context: Any = None
+    ) -> Any:
+        """
+        Asynchronous variant of ask_question. Generation runs in a worker thread so other tasks, e.g. requests to an
+        HTTP backend for other players, can overlap with it.
+
+        Args:
+            question (str): The question or prompt provided by the user.
+            reset_dialogue (bool): Whether to reset the dialogue history after generating a response.
+            pin (bool): Whether the question and its answer must stay in the dialogue when it is compacted.
+            cache_context: What the answer depends on besides the question and the pinned primer.
+
+        Returns:
+            Any: The parsed JSON response to the question.
+        """
+        return await asyncio.to_thread(self.ask_question, question, reset_dialogue, pin, cache_context)
+
+    def ask_questions_batch(self, dialogues: List[Union[str, List[dict]]]) -> List[Any]:
+        """
+        Generates responses for many independent dialogues with a single batched generate call.
+
+        Each item is either a question string, which is answered without any history, or a full list of messages.
+        The instance's own dialogue history is neither used nor modified.
+
+        Args:
+            dialogues (List[Union[str, List[dict]]]): The questions or dialogues to answer.
+
+        Returns:
+            List[Any]: The parsed JSON response for each item, in the same order.
+        """
+        if not dialogues:
+            return []
+
+        with self._dialogue_lock:
+            self._load_model()
+            try:
+                message_roles = self._message_roles()
+
+                prepared = []
+                for dialogue in dialogues:
+                    if isinstance(dialogue, str):
+                        dialogue = [{"role": message_roles['user'], "content": dialogue}]
+                    prepared.append(list(dialogue))
+
+                results = self._generate_cached(prepared, self._generate_batch)
+            finally:
+                self._unload_model()
+
+        return [self._parse_response(result, messages) for result, messages in zip(results, prepared)]
+
+    def _generate_batch(self, dialogues: List[List[dict]]) -> List[str]:
+        """
+        Generates responses for several independent dialogues with the backend or the loaded model.
 
-        # Add the model's response to the dialogue history
-        if message_roles['assistant']:
-            self.dialogue.append({"role": message_roles['assistant'], "content": result})
+        Args:
+            dialogues (List[List[dict]]): The dialogues to answer.
+
+        Returns:
+            List[str]: The raw responses, in the same order.
+        """
+        if self.backend is None:
+            return self._generate_batch_with_loaded_model(dialogues)
+
+        budget = max(self._token_budget(messages) for messages in dialogues)
+        schemas = [self._response_schema(messages) for messages in dialogues]
+        kwargs = {}
+        if self.seed is not None and self.backend.supports_seed:
+            kwargs["seeds"] = [self._sampling_seed([messages]) for messages in dialogues]
+        if any(schema is not None for schema in schemas):
+            results = self.backend.generate_batch(
+                dialogues,
+                budget,
+                json_schemas=[schema.model_json_schema() if schema else None for schema in schemas],
+                **kwargs,
+            )
         else:
-            self.dialogue.append({"content": result})
+            results = self.backend.generate_batch(dialogues, budget, **kwargs)
+        return self._check_backend_budgets(dialogues, results, budget)
 
-        # Optionally reset the dialogue
-        if reset_dialogue:
-            self.reset_dialogue()
+    def _cache_key(self, messages: List[dict], context: Any = None) -> Tuple[str, str, Optional[str]]:
+        """
+        Returns the response cache partition, question and schema name of a dialogue.
+
+        The partition covers the model, the schema of the last message, the sampling parameters and seed, and the
+        context the answer depends on, by default every earlier message; the question is the last message, without
+        its format instructions for JSON prompts.
+
+        Args:
+            messages (List[dict]): The dialogue.
+            context: What the answer depends on besides the question, e.g. the pinned primer and a state digest.
 
+        Returns:
+            Tuple[str, str, Optional[str]]: The partition key, the question and the name of the answer's schema.
+        """
+        last = messages[-1].get("content")
+        schema = self._prompt_schema(messages)
+        sampling = {
+            "do_sample": True,
+            "max_new_tokens": self.max_new_tokens,
+            "constrained_decoding": self.constrained_decoding,
+            # Seeded runs, e.g. GameFarm replicates, must not be served answers sampled under another seed
+            "seed": self.seed,
+        }
+        partition = self.response_cache.partition_key(
+            self.model_name,
+            get_format_instructions(schema) if schema is not None else None,
+            sampling,
+            [dict(message) for message in messages[:-1]] if context is None else context,
+        )
+        return partition, getattr(last, "query", None) or str(last), schema.__name__ if schema is not None else None
+
+    def _generate_cached(
+        self,
+        dialogues: List[List[dict]],
+        generate: Callable[[List[List[dict]]], List[str]],
+        contexts: Optional[List[Any]] = None,
+    ) -> List[str]:
+        """
+        Answers dialogues from the response cache where possible, generating and caching the rest.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues to answer.
+            generate (Callable): Function generating the raw responses of a list of dialogues.
+            contexts (List): The cache context of each dialogue, see _cache_key(). Defaults to the earlier messages.
 
-        result = result.replace("json","")
-        result = result.replace("\n"," ").replace("   ","  ").replace("  "," ")
+        Returns:
+            List[str]: The raw responses, in the same order.
+        """
+        if self.response_cache is None:
+            results = self._regenerate_invalid(dialogues, generate(dialogues), generate)
+            return self._record_generations(dialogues, results)
+
+        contexts = contexts or [None] * len(dialogues)
+        keys = [self._cache_key(messages, context) for messages, context in zip(dialogues, contexts)]
+        results: List[Optional[str]] = []
+        misses = []
+        embeddings = {}
+        for row, (partition, query, schema) in enumerate(keys):
+            cached, embedding = self.response_cache.get(partition, query, schema)
+            results.append(cached)
+            if cached is None:
+                misses.append(row)
+                embeddings[row] = embedding
+
+        if misses:
+            missed = [dialogues[row] for row in misses]
+            generated = self._regenerate_invalid(missed, generate(missed), generate)
+            for row, result in zip(misses, generated):
+                results[row] = result
+                partition, query, schema = keys[row]
+                self.response_cache.put(partition, query, result, embeddings[row], schema)
+        return self._record_generations(dialogues, results)
+
+    def _regenerate_invalid(
+        self, dialogues: List[List[dict]], results: List[str], generate: Callable[[List[List[dict]]], List[str]]
+    ) -> List[str]:
+        """
+        Regenerates, up to validation_retries times, the answers to JSON prompts that cannot be read or do not match
+        the prompt's schema. Answers that still fail are kept and used as parsed.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues that were answered.
+            results (List[str]): The raw responses.
+            generate (Callable): Function generating the raw responses of a list of dialogues.
+
+        Returns:
+            List[str]: The responses, with invalid ones regenerated.
+        """
+        results = list(results)
+        for attempt in range(1, self.validation_retries + 1):
+            invalid = [
+                row for row, (messages, result) in enumerate(zip(dialogues, results))
+                if not self._matches_schema(result, messages)
+            ]
+            if not invalid:
+                break
+            print(f"Regenerating {len(invalid)} answer(s) not matching their schema, attempt {attempt}.")
+            self._validation_attempt = attempt
+            try:
+                regenerated = generate([dialogues[row] for row in invalid])
+            finally:
+                self._validation_attempt = 0
+            for row, result in zip(invalid, regenerated):
+                results[row] = result
+        return results
+
+    def _matches_schema(self, result: str, messages: List[dict]) -> bool:
+        """
+        Checks whether a raw response holds JSON matching the schema of the prompt it answers.
+
+        Args:
+            result (str): The raw response.
+            messages (List[dict]): The dialogue the response answers.
+
+        Returns:
+            bool: True if it does, or if the prompt has no schema.
+        """
+        schema = self._prompt_schema(messages)
+        if schema is None:
+            return True
+        try:
+            extract_json(result, schema)
+        except JsonExtractionError:
+            return False
+        return True
+
+    def _record_generations(self, dialogues: List[List[dict]], results: List[str]) -> List[str]:
+        """
+        Passes the answers to dialogues to the active GameRecorder, if any.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues answered.
+            results (List[str]): The raw responses.
+
+        Returns:
+            List[str]: The responses, unchanged.
+        """
+        recorder = get_recorder()
+        if recorder is not None:
+            for messages, result in zip(dialogues, results):
+                recorder.record_llm(self.model_name, messages, result)
+        return results
+
+    def _check_backend_budgets(self, dialogues: List[List[dict]], results: List[str], budget: int) -> List[str]:
+        """
+        Records the lengths of backend answers to JSON prompts and regenerates, with max_new_tokens, those that ran
+        out of budget before their JSON was complete.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues that were answered.
+            results (List[str]): The backend's answers.
+            budget (int): The max_new_tokens the answers were generated with.
+
+        Returns:
+            List[str]: The answers, with truncated ones regenerated.
+        """
+        results = list(results)
+        if not self.adaptive_budgets:
+            return results
+        for row, messages in enumerate(dialogues):
+            schema = self._prompt_schema(messages)
+            if schema is None:
+                continue
+            truncated = budget < self.max_new_tokens and not is_balanced_json(results[row])
+            self._schema_budgets.record(self._budget_key(schema), self._count_tokens(results[row]), truncated=truncated)
+            if truncated:
+                results[row] = self._backend_generate(messages, self.max_new_tokens)
+        return results
+
+    def _parse_response(self, result: str, messages: Optional[List[dict]] = None) -> Any:
+        """
+        Parses the JSON answer out of a raw model response, validating it against the prompt's schema if it has one.
+
+        Args:
+            result (str): The raw response from the language model.
+            messages (List[dict]): The dialogue the response answers.
+
+        Returns:
+            Any: The parsed JSON data.
+        """
         print(result)
         try:
-            return json.loads(result)
-        except:
-            try:
-                return self.parse_llm_json(result)
-            except:
-                preamble, *resp = result.split(":")
-                resp = "".join(resp)
-                return json.loads(resp)
-            
+            return extract_json(result, self._prompt_schema(messages))
+        except JsonValidationError as e:
+            print(f"Response does not match the {e.schema_name} schema, it is used as parsed.")
+            return e.value
+
     def extract_roles_from_template(self, chat_template: str) -> List[str]:
         """
         Extracts roles used in the chat template.
@@ -330,50 +1092,27 @@ class EasyLLM:
         Returns:
             dict: The parsed JSON data.
         """
-        # Remove backslashes if they are escape characters
-        llm_response = llm_response.replace("\\", "")
-
-        # Extract content between triple backticks
-        match = re.search(r'```.*?({.*?}).*?```', llm_response, re.DOTALL)
-        if match:
-            json_str = match.group(1).strip()
-            try:
-                data = json.loads(json_str)
-                return data
-            except json.JSONDecodeError as e:
-                raise Exception(f"Failed to decode JSON: {e}")
-        else:
-            raise Exception(f"Failed to parse JSON from: '{llm_response}'")
+        return extract_json(llm_response)
 
-    def generate_json_prompt(self, schema: Type[BaseModel], query: str) -> str:
+    def generate_json_prompt(self, schema: Type["BaseModel"], query: str) -> JsonPrompt:
         """
-        Generates a JSON prompt based on a given schema and query.
+        Generates a JSON prompt based on a given schema and query. The schema's format instructions are rendered
+        once and reused.
 
         Args:
             schema (Type[BaseModel]): The Pydantic schema to structure the output.
             query (str): The query for which the JSON response is to be generated.
 
         Returns:
-            str: The JSON-formatted prompt.
+            JsonPrompt: The JSON-formatted prompt, which also records its schema.
         """
+        from pydantic import BaseModel
+
         # Ensure schema is a class (Type[BaseModel])
         if not isinstance(schema, type) or not issubclass(schema, BaseModel):
             raise TypeError("The schema argument must be a Pydantic model class.")
 
-        # Initialize the JSON output parser with your schema
-        parser = JsonOutputParser(pydantic_object=schema)
-
-        # Create a prompt template with the format instructions injected
-        prompt = PromptTemplate(
-            template="Answer the following query in JSON format according to the provided schema:\n{format_instructions}\n\n{query}\n",
-            input_variables=["query"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-
-        # Generate the response using the model and parser
-        response = prompt.format(query=query)
-
-        return response
+        return build_json_prompt(schema, query)
 
     @staticmethod
     def parse_field(field_name: str, field_value: Any) -> tuple:
@@ -387,6 +1126,8 @@ class EasyLLM:
         Returns:
             tuple: A tuple containing the type and Field settings for the Pydantic model.
         """
+        from pydantic import Field
+
         if isinstance(field_value, str):
             return (str, Field(description=field_value))
         elif isinstance(field_value, int):
@@ -405,7 +1146,7 @@ class EasyLLM:
     @staticmethod
     def generate_pydantic_model_from_json_schema(
         schema_name: str, json_schema: Union[str, Dict[str, Any], List[Any]]
-    ) -> Type[BaseModel]:
+    ) -> Type["BaseModel"]:
         """
         Generates a Pydantic model from a JSON schema.
 
@@ -416,6 +1157,8 @@ class EasyLLM:
         Returns:
             Type[BaseModel]: The generated Pydantic model class.
         """
+        from pydantic import RootModel, create_model
+
         if isinstance(json_schema, str):
             json_schema = json.loads(json_schema)
 
@@ -1,14 +1,65 @@
 # Import necessary libraries
-from typing import List, Optional
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
-from sentence_transformers import SentenceTransformer
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import fitz  # PyMuPDF
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document as LangchainDocument
-import torch
 import os
+import threading
+import hashlib
+from collections import OrderedDict
+
+from WargamesAI.utils import document_loader
+from WargamesAI.utils.ann_index import IVFIndex
+from WargamesAI.utils.rag_index import ChunkIndex, get_index_store, normalize_rows, top_k_indices
+from WargamesAI.utils.replay import get_recorder, get_replay
+
+# torch, transformers and sentence_transformers are imported on first use to keep package imports fast
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Process-wide registry of loaded retrieval/generation models, keyed by (kind, model name, device)
+_MODEL_REGISTRY: Dict[Tuple[str, str, str], Any] = {}
+_MODEL_REGISTRY_LOCK = threading.Lock()
+_MODEL_USE_LOCKS: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+# Number of in-memory corpora whose chunk index each EasyRAG keeps for _retrieve_documents
+MAX_CORPUS_INDEXES = 8
+
+
+def get_shared_model(kind: str, model_name: str, device: str, loader: Callable[[], Any]) -> Any:
+    """
+    Returns a model from the process-wide registry, loading it on first use.
+
+    Args:
+        kind (str): The kind of model, e.g. "embedding" or "generation".
+        model_name (str): Name of the pretrained model.
+        device (str): Device the model runs on.
+        loader (Callable): Function that loads the model if it is not yet registered.
+
+    Returns:
+        Any: The shared model.
+    """
+    key = (kind, model_name, device)
+    with _MODEL_REGISTRY_LOCK:
+        if key not in _MODEL_REGISTRY:
+            _MODEL_REGISTRY[key] = loader()
+        return _MODEL_REGISTRY[key]
+
+
+def get_shared_model_lock(kind: str, model_name: str, device: str) -> threading.Lock:
+    """
+    Returns the lock that serialises calls into a shared model when EasyRAG is used from several threads.
+
+    Args:
+        kind (str): The kind of model, e.g. "embedding" or "generation".
+        model_name (str): Name of the pretrained model.
+        device (str): Device the model runs on.
+
+    Returns:
+        threading.Lock: The lock for that model.
+    """
+    key = (kind, model_name, device)
+    with _MODEL_REGISTRY_LOCK:
+        return _MODEL_USE_LOCKS.setdefault(key, threading.Lock())
+
 
 class EasyRAG:
     """
@@ -20,7 +71,14 @@ class EasyRAG:
         self, 
         embedding_model_name: str = "all-MiniLM-L6-v2",
         gen_model_name: str = "t5-base",
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        index_folder: Optional[str] = None,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 100,
+        retrieval_backend: str = "exact",
+        nprobe: int = 8,
+        ivf_min_chunks: int = 1000,
+        embedding_batch_size: int = 64,
     ):
         """
         Initializes the EasyRAG class with specified models for embeddings and generation.
@@ -29,15 +87,75 @@ class EasyRAG:
             embedding_model_name (str): Name of the model to use for creating embeddings.
             gen_model_name (str): Name of the model to use for generating text.
             device (str): Device to run the model on, e.g., "cuda". If None, it will auto-detect.
+            index_folder (str): Folder for persisted chunk/embedding indexes. If None, one is kept next to each PDF.
+            chunk_size (int): The maximum size of each chunk in characters.
+            chunk_overlap (int): The number of characters to overlap between chunks.
+            retrieval_backend (str): "exact" for brute-force search or "ivf" for the approximate IVF index.
+            nprobe (int): Number of IVF clusters searched per query when using the "ivf" backend.
+            ivf_min_chunks (int): Indexes smaller than this are always searched exactly.
+            embedding_batch_size (int): Number of chunks embedded at a time while ingesting a PDF.
+        """
+        if retrieval_backend not in ("exact", "ivf"):
+            raise ValueError(f"Unknown retrieval backend: {retrieval_backend}")
+        self.embedding_model_name = embedding_model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.index_store = get_index_store(index_folder)
+        self.retrieval_backend = retrieval_backend
+        self.nprobe = nprobe
+        self.ivf_min_chunks = ivf_min_chunks
+        self.embedding_batch_size = embedding_batch_size
+        self._device = device
+        self.gen_model_name = gen_model_name
+        # Chunk indexes of the in-memory corpora passed to _retrieve_documents, keyed by the identity of their
+        # embeddings and chunks, so their IVF index is built only once
+        self._corpus_indexes: "OrderedDict[Tuple[int, int], ChunkIndex]" = OrderedDict()
+        self._corpus_indexes_lock = threading.Lock()
+
+    @property
+    def device(self) -> str:
+        """Returns the device models run on, auto-detecting it on first use."""
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        return self._device
+
+    @property
+    def embedding_model(self) -> "SentenceTransformer":
+        """Returns the shared embedding model, loading it on first use."""
+        return get_shared_model("embedding", self.embedding_model_name, self.device, self._load_embedding_model)
+
+    def _load_embedding_model(self) -> "SentenceTransformer":
+        """
+        Loads the sentence embedding model.
+
+        Returns:
+            SentenceTransformer: The embedding model.
         """
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.embedding_model = SentenceTransformer(embedding_model_name).to(self.device)
-        self.tokenizer = AutoTokenizer.from_pretrained(gen_model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(gen_model_name).to(self.device)
-        self.generation_pipeline = pipeline(
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.embedding_model_name).to(self.device)
+
+    @property
+    def generation_pipeline(self) -> Any:
+        """Returns the shared text generation pipeline, loading it on first use."""
+        return get_shared_model("generation", self.gen_model_name, self.device, self._load_generation_pipeline)
+
+    def _load_generation_pipeline(self) -> Any:
+        """
+        Loads the generation model and tokenizer and wraps them in a text2text-generation pipeline.
+
+        Returns:
+            Any: The generation pipeline.
+        """
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+
+        tokenizer = AutoTokenizer.from_pretrained(self.gen_model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.gen_model_name).to(self.device)
+        return pipeline(
             "text2text-generation", 
-            model=self.model, 
-            tokenizer=self.tokenizer, 
+            model=model, 
+            tokenizer=tokenizer, 
             device=0 if self.device == "cuda" else -1
         )
 
@@ -51,16 +169,7 @@ class EasyRAG:
         Returns:
             List[str]: List of text chunks extracted from the PDF.
         """
-        doc = fitz.open(pdf_path)
-        text_chunks = []
-        for page_num, page in enumerate(doc):
-            text = page.get_text()
-            if not text.strip():
-                pass
-                #print(f"No text found on page {page_num}.")
-            else:
-                chunks = self._split_text_into_chunks(text)
-                text_chunks.extend(chunks)
+        text_chunks = list(document_loader.iter_pdf_chunks(pdf_path, self.chunk_size, self.chunk_overlap))
         if not text_chunks:
             raise Exception("No text extracted from the PDF.")
         return text_chunks
@@ -77,14 +186,7 @@ class EasyRAG:
         Returns:
             List[str]: List of text chunks.
         """
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            add_start_index=True,
-            strip_whitespace=True,
-        )
-        langchain_docs = [LangchainDocument(page_content=text)]
-        return [chunk.page_content for chunk in text_splitter.split_documents(langchain_docs)]
+        return list(document_loader.iter_chunks([text], chunk_size, chunk_overlap))
 
     def _create_embeddings(self, texts: List[str]) -> np.ndarray:
         """
@@ -98,7 +200,9 @@ class EasyRAG:
         """
         if not texts:
             return np.array([])
-        embeddings = self.embedding_model.encode(texts, convert_to_tensor=True)
+        embedding_model = self.embedding_model
+        with get_shared_model_lock("embedding", self.embedding_model_name, self.device):
+            embeddings = embedding_model.encode(texts, convert_to_tensor=True)
         return embeddings.cpu().numpy()
 
     def _retrieve_documents(self, query: str, embeddings: np.ndarray, docs_processed: List[str], top_k: int = 5) -> List[str]:
@@ -117,11 +221,191 @@ class EasyRAG:
         if embeddings.size == 0:
             raise Exception("No embeddings available to perform retrieval.")
 
-        query_embedding = self.embedding_model.encode([query], convert_to_tensor=True).cpu().numpy()
-        similarities = cosine_similarity(query_embedding, embeddings)
-        top_k = min(top_k, len(docs_processed))
-        top_k_indices = similarities.argsort()[0][-top_k:][::-1]
-        return [docs_processed[i] for i in top_k_indices]
+        return self.retrieve_documents_batch([query], self._get_corpus_index(embeddings, docs_processed), top_k=top_k)[0]
+
+    def _get_corpus_index(self, embeddings: np.ndarray, docs_processed: List[str]) -> ChunkIndex:
+        """
+        Returns the chunk index for an in-memory corpus, reusing the one built for the same chunks and embeddings
+        objects so its normalized embeddings and IVF index are computed once per corpus rather than once per query.
+        The most recently used MAX_CORPUS_INDEXES corpora are kept.
+
+        Args:
+            embeddings (np.ndarray): The embeddings of the documents.
+            docs_processed (List[str]): The list of document chunks.
+
+        Returns:
+            ChunkIndex: The chunk index.
+        """
+        key = (id(embeddings), id(docs_processed))
+        with self._corpus_indexes_lock:
+            index = self._corpus_indexes.get(key)
+            # The index holds both objects, so their ids cannot be reused while it is cached; a corpus whose list
+            # or matrix changed size in place is indexed again
+            if (
+                index is None
+                or index.embeddings is not embeddings
+                or index.chunks is not docs_processed
+                or len(index.chunks) != index.embeddings.shape[0]
+            ):
+                index = ChunkIndex(docs_processed, embeddings)
+                self._corpus_indexes[key] = index
+            self._corpus_indexes.move_to_end(key)
+            while len(self._corpus_indexes) > MAX_CORPUS_INDEXES:
+                self._corpus_indexes.popitem(last=False)
+            return index
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeds a batch of queries in one call and L2-normalizes them.
+
+        Args:
+            queries (List[str]): The queries to embed.
+
+        Returns:
+            np.ndarray: One normalized embedding row per query.
+        """
+        embedding_model = self.embedding_model
+        with get_shared_model_lock("embedding", self.embedding_model_name, self.device):
+            query_embeddings = embedding_model.encode(queries, convert_to_tensor=True).cpu().numpy()
+        return normalize_rows(query_embeddings)
+
+    def retrieve_documents_batch(self, queries: List[str], index: ChunkIndex, top_k: int = 5) -> List[List[str]]:
+        """
+        Retrieves the top-k most relevant chunks for many queries at once, using one embedding call, one matrix
+        product against the pre-normalized corpus and argpartition to select the top-k.
+
+        Args:
+            queries (List[str]): The queries to search for.
+            index (ChunkIndex): The chunks and embeddings to search.
+            top_k (int): Number of top documents to retrieve per query.
+
+        Returns:
+            List[List[str]]: The retrieved chunks for each query, most relevant first.
+        """
+        if not queries:
+            return []
+        if len(index) == 0 or index.embeddings.size == 0:
+            raise Exception("No embeddings available to perform retrieval.")
+
+        query_embeddings = self._encode_queries(queries)
+        if self.retrieval_backend == "ivf" and len(index) >= self.ivf_min_chunks:
+            indices, _ = self._get_ivf_index(index).search(query_embeddings, top_k=top_k, nprobe=self.nprobe)
+        else:
+            similarities = query_embeddings @ index.normalized_embeddings.T
+            indices = top_k_indices(similarities, top_k)
+        return [[index.chunks[i] for i in row if i >= 0] for row in indices]
+
+    def _get_ivf_index(self, index: ChunkIndex) -> IVFIndex:
+        """
+        Returns the IVF index for a chunk index, loading it from disk or building and persisting it on first use.
+
+        Args:
+            index (ChunkIndex): The chunks and embeddings to index.
+
+        Returns:
+            IVFIndex: The approximate nearest neighbour index.
+        """
+        if "ivf" not in index.ann_indexes:
+            ivf_path = os.path.join(index.path, "ivf.npz") if index.path else None
+            if ivf_path and os.path.exists(ivf_path):
+                ivf_index = IVFIndex.load(ivf_path)
+            else:
+                ivf_index = IVFIndex(nprobe=self.nprobe).build(index.embeddings)
+                if ivf_path:
+                    ivf_index.save(ivf_path)
+            index.ann_indexes["ivf"] = ivf_index
+        return index.ann_indexes["ivf"]
+
+    def retrieve_from_pdf_batch(self, queries: List[str], pdf_path: str, top_k: int = 5) -> List[List[str]]:
+        """
+        Retrieves the top-k most relevant chunks of a PDF for many queries at once.
+
+        Args:
+            queries (List[str]): The queries to search for.
+            pdf_path (str): Path to the PDF file.
+            top_k (int): Number of top documents to retrieve per query.
+
+        Returns:
+            List[List[str]]: The retrieved chunks for each query, most relevant first.
+        """
+        return self.retrieve_documents_batch(queries, self.get_index(pdf_path), top_k=top_k)
+
+    def get_index(self, pdf_path: str) -> ChunkIndex:
+        """
+        Returns the chunk/embedding index for a PDF, building and persisting it if this exact PDF content has not
+        been indexed with the current embedding model and chunking parameters before. A folder is indexed as one
+        corpus made of every PDF inside it.
+
+        Args:
+            pdf_path (str): Path to the PDF file, or to a folder of PDF files.
+
+        Returns:
+            ChunkIndex: The chunks of the PDF and their embeddings.
+        """
+        if os.path.isdir(pdf_path):
+            return self.get_corpus_index(pdf_path)
+
+        key = self.index_store.index_key(pdf_path, self.embedding_model_name, self.chunk_size, self.chunk_overlap)
+        index = self.index_store.load(pdf_path, key)
+        if index is None:
+            index = self._build_index(pdf_path, key)
+        return index
+
+    def _build_index(self, pdf_path: str, key: str) -> ChunkIndex:
+        """
+        Streams a PDF page by page into chunks and embeds them in mini-batches, so the whole document is never held
+        in memory, then persists the result.
+
+        Args:
+            pdf_path (str): Path to the PDF file.
+            key (str): The index key.
+
+        Returns:
+            ChunkIndex: The chunks of the PDF and their embeddings.
+        """
+        chunks: List[str] = []
+        embedding_batches: List[np.ndarray] = []
+        for batch, embeddings in document_loader.iter_embedding_batches(
+            document_loader.iter_pdf_chunks(pdf_path, self.chunk_size, self.chunk_overlap),
+            self._create_embeddings,
+            self.embedding_batch_size,
+        ):
+            chunks.extend(batch)
+            embedding_batches.append(embeddings)
+
+        if not chunks:
+            raise Exception("No text extracted from the PDF.")
+        return self.index_store.save(pdf_path, key, chunks, np.concatenate(embedding_batches))
+
+    def get_corpus_index(self, folder: str) -> ChunkIndex:
+        """
+        Returns a single chunk/embedding index over every PDF in a folder, e.g. a set of doctrine manuals.
+        Each document is indexed (and cached) on its own, then the results are combined.
+
+        Args:
+            folder (str): Folder containing the PDF files.
+
+        Returns:
+            ChunkIndex: The chunks of every PDF and their embeddings.
+        """
+        pdf_paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(".pdf")
+        )
+        if not pdf_paths:
+            raise Exception(f"No PDF files found in '{folder}'.")
+
+        document_keys = [
+            self.index_store.index_key(path, self.embedding_model_name, self.chunk_size, self.chunk_overlap)
+            for path in pdf_paths
+        ]
+        key = hashlib.sha256("".join(document_keys).encode("utf-8")).hexdigest()
+        index = self.index_store.load(folder, key)
+        if index is None:
+            documents = [self.get_index(path) for path in pdf_paths]
+            chunks = [chunk for document in documents for chunk in document.chunks]
+            embeddings = np.concatenate([np.asarray(document.embeddings) for document in documents])
+            index = self.index_store.save(folder, key, chunks, embeddings)
+        return index
 
     def ask_question_with_pdf(self, question: str, pdf_path: str, top_k: int = 5) -> str:
         """
@@ -129,27 +413,47 @@ class EasyRAG:
 
         Args:
             question (str): The question or prompt provided by the user.
-            pdf_path (str): Path to the PDF file containing relevant information.
+            pdf_path (str): Path to the PDF file, or folder of PDF files, containing relevant information.
             top_k (int): Number of top documents to retrieve and use for generating the answer.
 
         Returns:
             str: Generated response to the question, augmented with information retrieved from the PDF.
         """
+        replay = get_replay()
+        if replay is not None:
+            return replay.rag_response(question, pdf_path, top_k)
+
+        answer = self._answer_with_pdf(question, pdf_path, top_k)
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.record_rag(question, pdf_path, top_k, answer)
+        return answer
+
+    def _answer_with_pdf(self, question: str, pdf_path: str, top_k: int) -> str:
+        """
+        Answers a question from a PDF with retrieval and the generation model.
+
+        Args:
+            question (str): The question.
+            pdf_path (str): Path to the PDF file, or folder of PDF files.
+            top_k (int): Number of top documents to retrieve.
+
+        Returns:
+            str: The generated answer, or a message explaining why there is none.
+        """
         if not os.path.exists(pdf_path):
             return "PDF file not found."
 
-        # Extract and chunk text from the PDF
-        pdf_chunks = self._extract_text_from_pdf(pdf_path)
-        if not pdf_chunks:
+        # Load the persisted chunks and embeddings, only building them the first time this PDF is seen
+        index = self.get_index(pdf_path)
+        if len(index) == 0:
             return "No text could be extracted from the PDF to answer the question."
 
-        # Create embeddings for the chunks
-        embeddings = self._create_embeddings(pdf_chunks)
-        if embeddings.size == 0:
+        if index.embeddings.size == 0:
             return "Failed to create embeddings for the PDF content."
 
         # Retrieve relevant chunks based on the question
-        retrieved_docs = self._retrieve_documents(question, embeddings, pdf_chunks, top_k=top_k)
+        retrieved_docs = self.retrieve_documents_batch([question], index, top_k=top_k)[0]
         if not retrieved_docs:
             return "No relevant information found in the PDF to answer the question."
 
@@ -159,7 +463,9 @@ class EasyRAG:
 
         # Generate the answer
         try:
-            answer = self.generation_pipeline(prompt)
+            generation_pipeline = self.generation_pipeline
+            with get_shared_model_lock("generation", self.gen_model_name, self.device):
+                answer = generation_pipeline(prompt)
             return answer[0]["generated_text"]
         except Exception as e:
             raise Exception(f"An error occurred during text generation: {e}")
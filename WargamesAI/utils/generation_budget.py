@@ -0,0 +1,209 @@
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JsonBalanceTracker:
+    """
+    Follows generated text as it arrives and reports when the first top-level JSON object or array is closed.
+
+    Text before the first "{" or "[" (e.g. "Sure, here it is:" or a code fence) is skipped, and brackets inside
+    strings are ignored.
+    """
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> bool:
+        """
+        Consumes a piece of text.
+
+        Args:
+            text (str): The text generated since the last call.
+
+        Returns:
+            bool: True once the top-level JSON value is complete.
+        """
+        if self.complete:
+            return True
+        for ch in text:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self.started:
+                    self._in_string = True
+            elif ch in "{[":
+                self.started = True
+                self.depth += 1
+            elif ch in "}]" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
+
+
+def is_balanced_json(text: str) -> bool:
+    """
+    Returns whether a text contains a complete top-level JSON object or array.
+
+    Args:
+        text (str): The generated text.
+
+    Returns:
+        bool: True if the first JSON object or array in the text is closed.
+    """
+    return JsonBalanceTracker().feed(text)
+
+
+class JsonStoppingCriteria:
+    """
+    A transformers stopping criterion that ends each row of a batch as soon as its JSON answer is balanced.
+    """
+
+    def __init__(self, vocabulary: Any, prompt_length: int, batch_size: int) -> None:
+        """
+        Initializes the JsonStoppingCriteria.
+
+        Args:
+            vocabulary (TokenVocabulary): The decoded vocabulary of the tokenizer.
+            prompt_length (int): Length of the (padded) prompt, after which generated tokens start.
+            batch_size (int): Number of rows being generated.
+        """
+        self.vocabulary = vocabulary
+        self.prompt_length = prompt_length
+        self.trackers = [JsonBalanceTracker() for _ in range(batch_size)]
+        # Number of generated tokens at which each row's JSON was complete
+        self.completed_at: List[Optional[int]] = [None] * batch_size
+        self._consumed = 0
+
+    def __call__(self, input_ids: Any, scores: Any, **kwargs: Any) -> Any:
+        import torch
+
+        generated = input_ids[:, self.prompt_length + self._consumed:].tolist()
+        for row, token_ids in enumerate(generated):
+            tracker = self.trackers[row]
+            for offset, token_id in enumerate(token_ids):
+                if tracker.complete:
+                    break
+                if tracker.feed(self.vocabulary.text(token_id) or ""):
+                    self.completed_at[row] = self._consumed + offset + 1
+        self._consumed = input_ids.shape[1] - self.prompt_length
+
+        return torch.tensor([tracker.complete for tracker in self.trackers], dtype=torch.bool, device=input_ids.device)
+
+
+class SchemaBudgets:
+    """
+    Learns how many tokens answers to each JSON schema need, so generation for a schema can be capped close to
+    what it actually uses rather than at the worst-case max_new_tokens.
+
+    The budget for a key is a high quantile of recently observed answer lengths times a safety margin. Until enough
+    answers have been seen the full cap is used. Answers that run out of budget count as needing more, so a budget
+    that proves too small grows again.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.99,
+        margin: float = 1.5,
+        min_tokens: int = 32,
+        min_samples: int = 5,
+        window: int = 200,
+    ) -> None:
+        """
+        Initializes the SchemaBudgets.
+
+        Args:
+            quantile (float): Quantile of observed lengths the budget is based on.
+            margin (float): Multiplier applied to the quantile.
+            min_tokens (int): Smallest budget ever given.
+            min_samples (int): Number of observed answers needed before the budget is reduced below the cap.
+            window (int): Number of most recent answer lengths kept per key.
+        """
+        self.quantile = quantile
+        self.margin = margin
+        self.min_tokens = min_tokens
+        self.min_samples = min_samples
+        self.window = window
+        self._lengths: Dict[Tuple[str, str], "deque[int]"] = {}
+        self._truncations: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, key: Tuple[str, str], cap: int) -> int:
+        """
+        Returns the token budget for answers under a key.
+
+        Args:
+            key (Tuple[str, str]): The (model name, schema name) key.
+            cap (int): The largest allowed budget, usually max_new_tokens.
+
+        Returns:
+            int: The budget.
+        """
+        with self._lock:
+            lengths = self._lengths.get(key)
+            if not lengths or len(lengths) < self.min_samples:
+                return cap
+            ordered = sorted(lengths)
+            observed = ordered[min(len(ordered) - 1, math.ceil(self.quantile * len(ordered)) - 1)]
+        return max(self.min_tokens, min(cap, math.ceil(observed * self.margin)))
+
+    def record(self, key: Tuple[str, str], tokens: int, truncated: bool = False) -> None:
+        """
+        Records the length of an answer.
+
+        Args:
+            key (Tuple[str, str]): The (model name, schema name) key.
+            tokens (int): Number of tokens the answer used.
+            truncated (bool): Whether the answer ran out of budget before it was complete.
+        """
+        with self._lock:
+            lengths = self._lengths.setdefault(key, deque(maxlen=self.window))
+            # A truncated answer needed more than it got; recording double its length grows the budget
+            lengths.append(tokens * 2 if truncated else tokens)
+            if truncated:
+                self._truncations[key] = self._truncations.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the observed answers, truncations and current budget for each key.
+
+        Returns:
+            dict: Statistics keyed by "model/schema".
+        """
+        with self._lock:
+            keys = list(self._lengths)
+        stats = {}
+        for key in keys:
+            with self._lock:
+                lengths = list(self._lengths[key])
+                truncations = self._truncations.get(key, 0)
+            stats[f"{key[0]}/{key[1]}"] = {
+                "answers": len(lengths),
+                "mean_tokens": sum(lengths) / len(lengths) if lengths else 0.0,
+                "max_tokens": max(lengths, default=0),
+                "truncations": truncations,
+                "budget": self.budget(key, 1 << 30),
+            }
+        return stats
+
+
+_DEFAULT_BUDGETS = SchemaBudgets()
+
+
+def get_schema_budgets() -> SchemaBudgets:
+    """
+    Returns the process-wide per-schema token budgets shared by all EasyLLM instances.
+    """
+    return _DEFAULT_BUDGETS
@@ -0,0 +1,137 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from WargamesAI.utils import document_loader
+from WargamesAI.utils.easyRAG import EasyRAG
+
+
+class IngestionReport:
+    """
+    Throughput statistics for a corpus ingestion run.
+    """
+
+    def __init__(self) -> None:
+        self.documents = 0
+        self.skipped_documents = 0
+        self.pages = 0
+        self.chunks = 0
+        self.extract_seconds = 0.0
+        self.embed_seconds = 0.0
+        self.total_seconds = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        """Returns the number of pages extracted per second of extraction time."""
+        return self.pages / self.extract_seconds if self.extract_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        """Returns the number of chunks embedded per second of embedding time."""
+        return self.chunks / self.embed_seconds if self.embed_seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Ingested {self.documents} documents ({self.skipped_documents} already indexed): "
+            f"{self.pages} pages at {self.pages_per_second:.1f} pages/sec, "
+            f"{self.chunks} chunks at {self.chunks_per_second:.1f} chunks/sec, "
+            f"{self.total_seconds:.2f}s total."
+        )
+
+
+def _count_pages(pages: Iterable[str], counter: List[int]) -> Iterable[str]:
+    """
+    Passes pages through while counting them.
+    """
+    for page in pages:
+        counter[0] += 1
+        yield page
+
+
+def _extract_and_chunk(job: Tuple[str, int, int]) -> Tuple[str, int, List[str]]:
+    """
+    Extracts and chunks one PDF. Runs in a worker process.
+
+    Args:
+        job (Tuple[str, int, int]): The PDF path, chunk size and chunk overlap.
+
+    Returns:
+        Tuple[str, int, List[str]]: The PDF path, its page count and its chunks.
+    """
+    pdf_path, chunk_size, chunk_overlap = job
+    counter = [0]
+    pages = _count_pages(document_loader.iter_pages(pdf_path), counter)
+    chunks = list(document_loader.iter_chunks(pages, chunk_size, chunk_overlap))
+    return pdf_path, counter[0], chunks
+
+
+def ingest_pdfs(
+    pdf_paths: Iterable[str],
+    rag: Optional[EasyRAG] = None,
+    max_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> IngestionReport:
+    """
+    Builds the persisted EasyRAG indexes for a set of PDFs. Text extraction and chunking run across a process pool,
+    then all chunks are sorted by length and embedded in batches by the shared embedding model, which keeps padding
+    inside each batch to a minimum. PDFs that are already indexed are skipped.
+
+    Args:
+        pdf_paths (Iterable[str]): The PDFs to ingest, e.g. the rules and every agent bio.
+        rag (EasyRAG): The EasyRAG whose embedding model, chunking parameters and index store are used.
+        max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+        batch_size (int): Number of chunks embedded per call. Defaults to the EasyRAG embedding batch size.
+
+    Returns:
+        IngestionReport: Pages/sec, chunks/sec and totals for the run.
+    """
+    rag = rag or EasyRAG()
+    batch_size = batch_size or rag.embedding_batch_size
+    report = IngestionReport()
+    start = time.perf_counter()
+
+    # Only ingest documents that are not already indexed
+    pending = {}
+    for pdf_path in dict.fromkeys(pdf_paths):
+        key = rag.index_store.index_key(pdf_path, rag.embedding_model_name, rag.chunk_size, rag.chunk_overlap)
+        if rag.index_store.load(pdf_path, key) is None:
+            pending[pdf_path] = key
+        else:
+            report.skipped_documents += 1
+
+    if pending:
+        jobs = [(pdf_path, rag.chunk_size, rag.chunk_overlap) for pdf_path in pending]
+        workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            extracted = list(executor.map(_extract_and_chunk, jobs))
+        report.extract_seconds = time.perf_counter() - start
+
+        documents = {}
+        for pdf_path, page_count, chunks in extracted:
+            if not chunks:
+                raise Exception(f"No text extracted from the PDF '{pdf_path}'.")
+            documents[pdf_path] = chunks
+            report.pages += page_count
+            report.chunks += len(chunks)
+
+        # Embed every chunk of every document together, in length-sorted batches
+        embed_start = time.perf_counter()
+        locations = [(pdf_path, i) for pdf_path, chunks in documents.items() for i in range(len(chunks))]
+        locations.sort(key=lambda location: len(documents[location[0]][location[1]]))
+        embeddings = {pdf_path: [None] * len(chunks) for pdf_path, chunks in documents.items()}
+        for offset in range(0, len(locations), batch_size):
+            batch = locations[offset:offset + batch_size]
+            batch_embeddings = rag._create_embeddings([documents[pdf_path][i] for pdf_path, i in batch])
+            for (pdf_path, i), embedding in zip(batch, batch_embeddings):
+                embeddings[pdf_path][i] = embedding
+        report.embed_seconds = time.perf_counter() - embed_start
+
+        for pdf_path, chunks in documents.items():
+            rag.index_store.save(pdf_path, pending[pdf_path], chunks, np.stack(embeddings[pdf_path]))
+            report.documents += 1
+
+    report.total_seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,526 @@
+import json
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Type
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+# Grammar nodes are hashable tuples so parser states can be memoised:
+#   ("object", ((key, node), ...)), ("any_object",), ("array", node), ("string",), ("integer",), ("number",),
+#   ("boolean",), ("null",), ("any",), ("choice", (node, ...)), ("enum", (json_literal, ...))
+Node = Tuple
+
+ANY: Node = ("any",)
+WHITESPACE = " \t\n\r"
+# Consecutive whitespace characters allowed between tokens, enough for pretty-printed output
+MAX_WHITESPACE_RUN = 24
+MAX_NUMBER_LENGTH = 24
+
+_INTEGER_PREFIX = re.compile(r"-?(?:0|[1-9]\d*)?")
+_INTEGER = re.compile(r"-?(?:0|[1-9]\d*)")
+_NUMBER_PREFIX = re.compile(r"-?(?:(?:0|[1-9]\d*)(?:\.\d*)?(?:(?<=\d)[eE][+-]?\d*)?)?")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+
+
+def schema_to_node(schema: Dict[str, Any], definitions: Optional[Dict[str, Any]] = None) -> Node:
+    """
+    Converts a JSON schema, as produced by Pydantic's model_json_schema(), into a grammar node.
+
+    Objects must contain all their properties, in schema order.
+
+    Args:
+        schema (dict): The JSON schema.
+        definitions (dict): The "$defs" used to resolve references.
+
+    Returns:
+        Node: The grammar node.
+    """
+    definitions = definitions if definitions is not None else schema.get("$defs", {})
+
+    if "$ref" in schema:
+        return schema_to_node(definitions[schema["$ref"].split("/")[-1]], definitions)
+    if "enum" in schema:
+        return ("enum", tuple(json.dumps(value) for value in schema["enum"]))
+    if "const" in schema:
+        return ("enum", (json.dumps(schema["const"]),))
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            return ("choice", tuple(schema_to_node(option, definitions) for option in schema[key]))
+    if "allOf" in schema and len(schema["allOf"]) == 1:
+        return schema_to_node(schema["allOf"][0], definitions)
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        return ("choice", tuple(schema_to_node({**schema, "type": option}, definitions) for option in schema_type))
+    if schema_type == "object" or "properties" in schema:
+        properties = schema.get("properties")
+        if not properties:
+            return ("any_object",)
+        return ("object", tuple((key, schema_to_node(value, definitions)) for key, value in properties.items()))
+    if schema_type == "array":
+        return ("array", schema_to_node(schema.get("items", {}), definitions))
+    if schema_type in ("string", "integer", "number", "boolean", "null"):
+        return (schema_type,)
+    return ANY
+
+
+_GRAMMARS: Dict[type, "JsonGrammar"] = {}
+
+
+def grammar_for_model(model: Type["BaseModel"]) -> "JsonGrammar":
+    """
+    Returns the grammar for a Pydantic model, building it only the first time.
+
+    Args:
+        model (Type[BaseModel]): The Pydantic model, e.g. json_schemas.ActionResponseModel.
+
+    Returns:
+        JsonGrammar: The grammar accepting JSON documents that match the model.
+    """
+    grammar = _GRAMMARS.get(model)
+    if grammar is None:
+        grammar = _GRAMMARS[model] = JsonGrammar(schema_to_node(model.model_json_schema()))
+    return grammar
+
+
+# Parser states are immutable: a stack is a linked list of (frame, rest) pairs, so states share their tails and
+# can be used as dictionary keys. A state is (stack, whitespace_run).
+def _push(stack: Optional[tuple], frame: tuple) -> tuple:
+    return (frame, stack)
+
+
+def _starts(node: Node, ch: str) -> bool:
+    """
+    Returns whether a value of the node can start with the character.
+    """
+    kind = node[0]
+    if kind == "string":
+        return ch == '"'
+    if kind == "integer":
+        return ch == "-" or ch.isdigit()
+    if kind == "number":
+        return ch == "-" or ch.isdigit()
+    if kind == "boolean":
+        return ch in "tf"
+    if kind == "null":
+        return ch == "n"
+    if kind in ("object", "any_object"):
+        return ch == "{"
+    if kind == "array":
+        return ch == "["
+    if kind == "enum":
+        return any(literal[0] == ch for literal in node[1])
+    if kind == "choice":
+        return any(_starts(option, ch) for option in node[1])
+    return ch in '{["-tfn' or ch.isdigit()
+
+
+def _start_value(node: Node, ch: str, rest: Optional[tuple]) -> Optional[tuple]:
+    """
+    Starts a value of the node with its first character.
+
+    Returns:
+        The new stack, or None if the character cannot start the value.
+    """
+    kind = node[0]
+    if kind == "choice":
+        for option in node[1]:
+            if _starts(option, ch):
+                return _start_value(option, ch, rest)
+        return None
+    if kind == "any":
+        if ch == "{":
+            node = ("any_object",)
+        elif ch == "[":
+            node = ("array", ANY)
+        elif ch == '"':
+            node = ("string",)
+        elif ch == "-" or ch.isdigit():
+            node = ("number",)
+        elif ch in "tf":
+            node = ("boolean",)
+        elif ch == "n":
+            node = ("null",)
+        else:
+            return None
+        kind = node[0]
+
+    if kind == "string" and ch == '"':
+        return _push(rest, ("S", 0))
+    if kind in ("integer", "number") and (ch == "-" or ch.isdigit()):
+        return _push(rest, ("N", kind, ch))
+    if kind == "boolean" and ch in "tf":
+        return _push(rest, ("L", "rue" if ch == "t" else "alse"))
+    if kind == "null" and ch == "n":
+        return _push(rest, ("L", "ull"))
+    if kind == "enum":
+        remaining = tuple(literal[1:] for literal in node[1] if literal[0] == ch)
+        return _push(rest, ("E", remaining)) if remaining else None
+    if kind == "object" and ch == "{":
+        return _push(rest, ("O", node[1], 0, "key"))
+    if kind == "any_object" and ch == "{":
+        return _push(rest, ("D", "first"))
+    if kind == "array" and ch == "[":
+        return _push(rest, ("A", node[1], "first"))
+    return None
+
+
+def _step_stack(stack: Optional[tuple], ch: str) -> Optional[tuple]:
+    """
+    Advances a parser stack by one character.
+
+    Returns:
+        The new stack, or None if the character is not allowed.
+    """
+    if stack is None:
+        return None
+    frame, rest = stack
+    kind = frame[0]
+
+    if kind == "V":
+        if ch in WHITESPACE:
+            return stack
+        return _start_value(frame[1], ch, rest)
+
+    if kind == "S":
+        mode = frame[1]
+        if mode == 0:
+            if ch == '"':
+                return rest if rest is not None else ()
+            if ch == "\\":
+                return _push(rest, ("S", 1))
+            return stack if ord(ch) >= 0x20 else None
+        if mode == 1:
+            if ch == "u":
+                return _push(rest, ("S", 5))
+            return _push(rest, ("S", 0)) if ch in '"\\/bfnrt' else None
+        # Reading the hex digits of a \u escape
+        if ch in "0123456789abcdefABCDEF":
+            return _push(rest, ("S", 0 if mode == 2 else mode - 1))
+        return None
+
+    if kind == "L":
+        remaining = frame[1]
+        if ch != remaining[0]:
+            return None
+        if len(remaining) == 1:
+            return rest if rest is not None else ()
+        return _push(rest, ("L", remaining[1:]))
+
+    if kind == "E":
+        remaining = tuple(literal[1:] for literal in frame[1] if literal and literal[0] == ch)
+        if not remaining:
+            return None
+        if "" in remaining and len(remaining) == 1:
+            return rest if rest is not None else ()
+        return _push(rest, ("E", remaining))
+
+    if kind == "N":
+        number_kind, text = frame[1], frame[2]
+        candidate = text + ch
+        prefix = _INTEGER_PREFIX if number_kind == "integer" else _NUMBER_PREFIX
+        if len(candidate) <= MAX_NUMBER_LENGTH and prefix.fullmatch(candidate):
+            return _push(rest, ("N", number_kind, candidate))
+        # The number ends here; the character belongs to the enclosing value
+        complete = _INTEGER if number_kind == "integer" else _NUMBER
+        if not complete.fullmatch(text):
+            return None
+        return _step_stack(rest, ch) if rest is not None else None
+
+    if kind == "O":
+        fields, index, phase = frame[1], frame[2], frame[3]
+        if ch in WHITESPACE:
+            return stack
+        if phase == "key":
+            if ch != '"':
+                return None
+            return _push(_push(rest, ("O", fields, index, "colon")), ("L", json.dumps(fields[index][0])[1:]))
+        if phase == "colon":
+            if ch != ":":
+                return None
+            return _push(_push(rest, ("O", fields, index, "after")), ("V", fields[index][1]))
+        # After a value: another key, or the end of the object
+        if index + 1 < len(fields):
+            return _push(rest, ("O", fields, index + 1, "key")) if ch == "," else None
+        if ch == "}":
+            return rest if rest is not None else ()
+        return None
+
+    if kind == "D":
+        phase = frame[1]
+        if ch in WHITESPACE:
+            return stack
+        if phase in ("first", "key") and ch == '"':
+            return _push(_push(rest, ("D", "colon")), ("S", 0))
+        if phase == "first" and ch == "}":
+            return rest if rest is not None else ()
+        if phase == "colon" and ch == ":":
+            return _push(_push(rest, ("D", "after")), ("V", ANY))
+        if phase == "after":
+            if ch == ",":
+                return _push(rest, ("D", "key"))
+            if ch == "}":
+                return rest if rest is not None else ()
+        return None
+
+    if kind == "A":
+        item, phase = frame[1], frame[2]
+        if ch in WHITESPACE:
+            return stack
+        if phase == "first" and ch == "]":
+            return rest if rest is not None else ()
+        if phase in ("first", "item"):
+            return _start_value(item, ch, _push(rest, ("A", item, "after")))
+        if ch == ",":
+            return _push(rest, ("A", item, "item"))
+        if ch == "]":
+            return rest if rest is not None else ()
+        return None
+
+    return None
+
+
+class JsonGrammar:
+    """
+    A character-level pushdown automaton accepting exactly the JSON documents that match a grammar node.
+    """
+
+    def __init__(self, node: Node) -> None:
+        """
+        Initializes the JsonGrammar.
+
+        Args:
+            node (Node): The grammar node, e.g. from schema_to_node().
+        """
+        self.node = node
+        self.initial_state = (_push(None, ("V", node)), 0)
+
+    @staticmethod
+    def step(state: tuple, text: str) -> Optional[tuple]:
+        """
+        Advances a state by a piece of text.
+
+        Args:
+            state (tuple): The parser state.
+            text (str): The text to consume.
+
+        Returns:
+            Optional[tuple]: The new state, or None if the text cannot continue a valid document.
+        """
+        stack, whitespace_run = state
+        for ch in text:
+            if stack == ():
+                # The document is complete; nothing may follow it
+                return None
+            in_string = stack[0][0] == "S"
+            if ch in WHITESPACE and not in_string:
+                whitespace_run += 1
+                if whitespace_run > MAX_WHITESPACE_RUN:
+                    return None
+            else:
+                whitespace_run = 0
+            stack = _step_stack(stack, ch)
+            if stack is None:
+                return None
+        return stack, whitespace_run
+
+    @staticmethod
+    def is_complete(state: tuple) -> bool:
+        """
+        Returns whether the state is a complete document.
+        """
+        stack = state[0]
+        if stack == ():
+            return True
+        # A top-level number has no closing character
+        frame, rest = stack
+        if rest is None and frame[0] == "N":
+            return bool((_INTEGER if frame[1] == "integer" else _NUMBER).fullmatch(frame[2]))
+        return False
+
+    def accepts(self, text: str) -> bool:
+        """
+        Returns whether the text is a complete document of this grammar.
+        """
+        state = self.step(self.initial_state, text)
+        return state is not None and self.is_complete(state)
+
+
+class TokenVocabulary:
+    """
+    The text of each token of a HuggingFace tokenizer, decoded on demand and cached.
+    """
+
+    _BYTE_TOKEN = re.compile(r"<0x([0-9A-Fa-f]{2})>")
+
+    def __init__(self, tokenizer: Any) -> None:
+        self.tokenizer = tokenizer
+        self.special_ids = set(getattr(tokenizer, "all_special_ids", []))
+        vocab = tokenizer.get_vocab()
+        self.size = len(vocab)
+        # Byte-level BPE (GPT-2, Llama 3) spells a leading space as "Ġ"; SentencePiece uses "▁"
+        self._byte_level = "Ġthe" in vocab or "Ġ" in vocab
+        self._byte_decoder = {unicode: byte for byte, unicode in _bytes_to_unicode().items()}
+        self._texts: Dict[int, Optional[str]] = {}
+
+    def text(self, token_id: int) -> Optional[str]:
+        """
+        Returns the text a token adds to the output, or None for special tokens and partial characters.
+        """
+        if token_id in self._texts:
+            return self._texts[token_id]
+
+        text = None
+        if token_id not in self.special_ids:
+            piece = self.tokenizer.convert_ids_to_tokens(token_id)
+            if piece is not None:
+                if self._byte_level:
+                    try:
+                        text = bytes(self._byte_decoder[c] for c in piece).decode("utf-8")
+                    except (KeyError, UnicodeDecodeError):
+                        text = None
+                else:
+                    match = self._BYTE_TOKEN.fullmatch(piece)
+                    if match:
+                        value = int(match.group(1), 16)
+                        text = chr(value) if value < 0x80 else None
+                    else:
+                        text = piece.replace("▁", " ")
+        self._texts[token_id] = text
+        return text
+
+
+def _bytes_to_unicode() -> Dict[int, str]:
+    """
+    Returns the byte to printable character mapping used by byte-level BPE tokenizers.
+    """
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    characters = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            characters.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, map(chr, characters)))
+
+
+class JsonSchemaLogitsProcessor:
+    """
+    A transformers logits processor that only lets generation produce JSON matching a schema, and ends generation
+    as soon as the document is complete.
+
+    Each step only the highest scoring candidate tokens are checked against the grammar, widening the search when
+    none of them fit, so the cost per step stays small.
+    """
+
+    def __init__(
+        self,
+        vocabulary: TokenVocabulary,
+        grammars: Sequence[Optional[JsonGrammar]],
+        prompt_length: int,
+        eos_token_id: int,
+        top_k: int = 32,
+    ) -> None:
+        """
+        Initializes the JsonSchemaLogitsProcessor.
+
+        Args:
+            vocabulary (TokenVocabulary): The decoded vocabulary of the tokenizer.
+            grammars (Sequence[Optional[JsonGrammar]]): The grammar for each row of the batch, None for no constraint.
+            prompt_length (int): Length of the (padded) prompt, after which generated tokens start.
+            eos_token_id (int): The token that ends generation.
+            top_k (int): Number of candidates checked per step before the search is widened.
+        """
+        self.vocabulary = vocabulary
+        self.grammars = list(grammars)
+        self.states = [grammar.initial_state if grammar is not None else None for grammar in self.grammars]
+        self.prompt_length = prompt_length
+        self.eos_token_id = eos_token_id
+        self.top_k = top_k
+        self._consumed = 0
+        # Rows ended because no token could continue their document
+        self.dead_ends = 0
+        self._transitions: Dict[Tuple[tuple, int], Optional[tuple]] = {}
+
+    def _advance(self, state: tuple, token_id: int) -> Optional[tuple]:
+        key = (state, token_id)
+        if key not in self._transitions:
+            text = self.vocabulary.text(token_id)
+            self._transitions[key] = JsonGrammar.step(state, text) if text else None
+        return self._transitions[key]
+
+    def _allowed_tokens(self, state: tuple, row_scores: Any) -> List[int]:
+        """
+        Finds the highest scoring tokens that keep the output valid.
+        """
+        import torch
+
+        if JsonGrammar.is_complete(state):
+            return [self.eos_token_id]
+
+        vocab_size = row_scores.shape[-1]
+        k = min(self.top_k, vocab_size)
+        checked = 0
+        while checked < vocab_size:
+            candidates = torch.topk(row_scores, k).indices.tolist()[checked:]
+            allowed = [
+                token_id for token_id in candidates
+                if token_id < vocab_size and self._advance(state, token_id) is not None
+            ]
+            if allowed:
+                return allowed
+            checked = k
+            k = min(k * 8, vocab_size)
+        return []
+
+    def __call__(self, input_ids: Any, scores: Any) -> Any:
+        # Consume the tokens generated since the last call
+        generated = input_ids[:, self.prompt_length + self._consumed:].tolist()
+        for row, token_ids in enumerate(generated):
+            for token_id in token_ids:
+                if self.states[row] is not None:
+                    if token_id == self.eos_token_id:
+                        self.states[row] = None
+                    else:
+                        self.states[row] = self._advance(self.states[row], token_id)
+        self._consumed = input_ids.shape[1] - self.prompt_length
+
+        # Bound the transition memo for long generations
+        if len(self._transitions) > 200000:
+            self._transitions.clear()
+
+        for row, state in enumerate(self.states):
+            if state is None:
+                continue
+            allowed = self._allowed_tokens(state, scores[row])
+            if not allowed:
+                # No token in the vocabulary continues the document, so the row is ended rather than left
+                # unconstrained; the truncated JSON is repaired when the answer is parsed
+                self.dead_ends += 1
+                allowed = [self.eos_token_id]
+            mask = scores.new_full(scores[row].shape, float("-inf"))
+            mask[allowed] = 0
+            scores[row] = scores[row] + mask
+        return scores
+
+
+_VOCABULARY_LOCK = threading.Lock()
+
+
+def get_vocabulary(extras: Dict[str, Any], tokenizer: Any) -> TokenVocabulary:
+    """
+    Returns the decoded vocabulary stored with a pooled model, creating it on first use.
+
+    Args:
+        extras (dict): The model pool entry's per-model storage.
+        tokenizer: The model's tokenizer.
+
+    Returns:
+        TokenVocabulary: The shared vocabulary.
+    """
+    with _VOCABULARY_LOCK:
+        if "token_vocabulary" not in extras:
+            extras["token_vocabulary"] = TokenVocabulary(tokenizer)
+        return extras["token_vocabulary"]
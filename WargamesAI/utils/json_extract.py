@@ -0,0 +1,223 @@
+import json
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, Tuple, Type
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+_DECODER = json.JSONDecoder(strict=False)
+_CLOSERS = {"{": "}", "[": "]"}
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_JSON_LITERALS = ("true", "false", "null")
+# Characters that may follow the closing quote of a string; any other quote is treated as part of the string
+_AFTER_STRING = ",:}]"
+_ESCAPES = set('"\\/bfnrtu')
+
+
+class JsonExtractionError(ValueError):
+    """
+    Raised when no JSON value can be found in a model response.
+    """
+
+
+class JsonValidationError(JsonExtractionError):
+    """
+    Raised when a model response contains JSON, but no value in it matches the expected schema.
+
+    Attributes:
+        value: The first JSON value found in the response, for callers that use it as parsed.
+        schema_name (str): Name of the schema the values were checked against.
+    """
+
+    def __init__(self, message: str, value: Any, schema_name: str) -> None:
+        super().__init__(message)
+        self.value = value
+        self.schema_name = schema_name
+
+
+def _next_significant(text: str, index: int) -> str:
+    """Returns the first non-whitespace character at or after index, or "" at the end of the text."""
+    length = len(text)
+    while index < length and text[index].isspace():
+        index += 1
+    return text[index] if index < length else ""
+
+
+def repair_json(text: str, start: int = 0) -> Tuple[str, int]:
+    """
+    Scans a JSON object or array starting at text[start] in a single pass, returning it with the usual mistakes of
+    language models repaired.
+
+    The scanner keeps a stack of open brackets and knows when it is inside a string, so brackets in strings do not
+    count. Along the way it converts single-quoted strings, quotes bare keys, maps Python's True/False/None to JSON,
+    escapes stray quotes inside strings, drops trailing commas and comments, and closes whatever is still open if the
+    text ends early.
+
+    Args:
+        text (str): The model response.
+        start (int): Index of the opening "{" or "[".
+
+    Returns:
+        Tuple[str, int]: The repaired JSON text and the index just past the end of the value in the response.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    quote = ""
+    index = start
+    length = len(text)
+
+    while index < length:
+        ch = text[index]
+
+        if quote:
+            if ch == "\\" and index + 1 < length:
+                escaped = text[index + 1]
+                if escaped == "'":
+                    out.append("'")
+                elif escaped in _ESCAPES:
+                    out.append(text[index:index + 2])
+                else:
+                    # A lone backslash, e.g. in a Windows path
+                    out.append("\\\\" + escaped)
+                index += 2
+                continue
+            if ch == quote:
+                if _next_significant(text, index + 1) in _AFTER_STRING:
+                    out.append('"')
+                    quote = ""
+                else:
+                    out.append('\\"' if ch == '"' else ch)
+            elif ch == '"':
+                # A double quote inside a single-quoted string
+                out.append('\\"')
+            else:
+                out.append(ch)
+            index += 1
+            continue
+
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            # Drop a trailing comma before the closing bracket
+            while out and (out[-1].isspace() or out[-1] == ","):
+                if out.pop() == ",":
+                    break
+            out.append(stack.pop())
+            if not stack:
+                return "".join(out), index + 1
+        elif ch == "/" and text.startswith(("//", "/*"), index):
+            end = text.find("\n" if text[index + 1] == "/" else "*/", index + 2)
+            index = length if end < 0 else end + (1 if text[index + 1] == "/" else 2)
+            continue
+        elif ch.isalpha() or ch == "_":
+            end = index
+            while end < length and (text[end].isalnum() or text[end] in "_-"):
+                end += 1
+            word = text[index:end]
+            if word in _JSON_LITERALS:
+                out.append(word)
+            elif word in _PYTHON_LITERALS:
+                out.append(_PYTHON_LITERALS[word])
+            elif _next_significant(text, end) == ":":
+                out.append(json.dumps(word))
+            else:
+                # Not valid JSON; keep it so the parse fails and the next candidate is tried
+                out.append(word)
+            index = end
+            continue
+        else:
+            out.append(ch)
+        index += 1
+
+    # The text ended early: close the open string and brackets
+    if quote:
+        out.append('"')
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out), index
+
+
+def iter_json_values(text: str) -> Iterator[Tuple[Any, int, int]]:
+    """
+    Yields every top-level JSON object or array found in a model response, in order.
+
+    Each candidate is first decoded as it is; only if that fails is it repaired with repair_json(). Scanning resumes
+    after the end of every candidate, decoded or not, so each character is scanned a bounded number of times.
+
+    Args:
+        text (str): The model response.
+
+    Yields:
+        Tuple[Any, int, int]: The decoded value and its start and end indices in the text.
+    """
+    index = 0
+    length = len(text)
+    while index < length:
+        brace = text.find("{", index)
+        bracket = text.find("[", index)
+        start = min(position for position in (brace, bracket, length) if position >= 0)
+        if start >= length:
+            return
+
+        try:
+            value, end = _DECODER.raw_decode(text, start)
+        except ValueError:
+            repaired, end = repair_json(text, start)
+            try:
+                value = _DECODER.decode(repaired)
+            except ValueError:
+                # Brackets inside a candidate that cannot be read, e.g. a "{x}" placeholder in prose, are not
+                # tried again on their own
+                index = max(end, start + 1)
+                continue
+
+        yield value, start, end
+        index = end
+
+
+def extract_json(text: str, schema: Optional[Type["BaseModel"]] = None) -> Any:
+    """
+    Finds the JSON answer in a model response.
+
+    Prose, code fences and example values around the answer are skipped. If a schema is given, the first value that
+    validates against it is returned.
+
+    Args:
+        text (str): The model response.
+        schema (Type[BaseModel]): The Pydantic schema the answer should follow.
+
+    Returns:
+        Any: The decoded JSON value.
+
+    Raises:
+        JsonValidationError: If a schema is given and no value in the response validates against it.
+        JsonExtractionError: If the response contains no JSON object or array.
+    """
+    first = None
+    error = None
+    for value, _, _ in iter_json_values(text):
+        if schema is None:
+            return value
+        try:
+            schema.model_validate(value)
+            return value
+        except ValueError as e:
+            if error is None:
+                first, error = value, e
+
+    if error is not None:
+        raise JsonValidationError(
+            f"No JSON value in the response matches the {schema.__name__} schema: {error}", first, schema.__name__
+        )
+    try:
+        # The answer may be a bare string or number
+        return _DECODER.decode(text.strip())
+    except ValueError:
+        pass
+    raise JsonExtractionError(f"Failed to parse JSON from: '{text}'")
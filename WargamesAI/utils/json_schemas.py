@@ -1,5 +1,5 @@
 import json 
-from pydantic import BaseModel, Field, create_model
+import threading
 from typing import Any, Dict, List, Union, Type
 from WargamesAI.utils.easyLLM import EasyLLM
 
@@ -68,14 +68,66 @@ LIST_OF_AGENTS_SCHEMA = json.dumps([{
 
 WIN_SCHEMA = json.dumps({"WINNING_TEAN":"The name of the winning team","WINNING_PLAYER":"None if a Team won, though, player name if a specific player in that team won."})
 
+# Used when a rules or in-character check is escalated to the LLM
+VERDICT_SCHEMA = json.dumps({
+    "VERDICT": "True if the answer to the question is yes, otherwise False",
+    "REASON": "A one sentence reason for the verdict"
+})
+
+
+# Pydantic models created from the JSON schemas using EasyLLM. They are built on first access
+# (e.g. json_schemas.DefaultModel) rather than at import time, then cached.
+_MODEL_SCHEMAS = {
+    "DefaultModel": ("Default", DEFAULT_RESPONSE),
+    "ResourceChangeModel": ("ResourceChange", RESOURCE_CHANGE_SCHEMA),
+    "ActionResponseModel": ("ActionResponse", ACTION_RESPONSE_JSON_SCHEMA),
+    "TurnModel": ("Turn", TURN_JSON_SCHEMA),
+    "RoundModel": ("Round", ROUND_JSON_SCHEMA),
+    "SystemUseModel": ("SystemUse", REQUIRES_SYSTEM_USE),
+    "AgentReqsModel": ("AgentRequirements", AGENT_REQUIREMENT_SCHEMA),
+    "MultipleAgentsModel": ("MultipleAgentRequirements", LIST_OF_AGENTS_SCHEMA),
+    "WinModel": ("Winning", WIN_SCHEMA),
+    "VerdictModel": ("Verdict", VERDICT_SCHEMA),
+}
+# Fields whose answers may take more than one form, e.g. a single target or a list of targets. The field types
+# inferred from the example schemas above are replaced with these.
+_FIELD_TYPES = {
+    "ActionResponseModel": {"TARGETS": Union[str, List[str]]},
+}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_model(name: str) -> Type[Any]:
+    """
+    Returns one of the schema models, building and caching it on first use.
+
+    Args:
+        name (str): The model name, e.g. "DefaultModel".
+
+    Returns:
+        Type[BaseModel]: The Pydantic model class.
+    """
+    with _MODELS_LOCK:
+        if name not in globals():
+            schema_name, json_schema = _MODEL_SCHEMAS[name]
+            model = EasyLLM.generate_pydantic_model_from_json_schema(schema_name, json_schema)
+            if name in _FIELD_TYPES:
+                from pydantic import Field, create_model
+
+                overrides = {
+                    field: (field_type, Field(description=model.model_fields[field].description))
+                    for field, field_type in _FIELD_TYPES[name].items()
+                }
+                model = create_model(schema_name, __base__=model, **overrides)
+            globals()[name] = model
+        return globals()[name]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _MODEL_SCHEMAS:
+        return get_model(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-# Create Pydantic models from JSON schemas using EasyLLM
-DefaultModel = EasyLLM.generate_pydantic_model_from_json_schema("Default", DEFAULT_RESPONSE)
-ResourceChangeModel = EasyLLM.generate_pydantic_model_from_json_schema("ResourceChange", RESOURCE_CHANGE_SCHEMA)
-ActionResponseModel = EasyLLM.generate_pydantic_model_from_json_schema("ActionResponse", ACTION_RESPONSE_JSON_SCHEMA)
-TurnModel = EasyLLM.generate_pydantic_model_from_json_schema("Turn", TURN_JSON_SCHEMA)
-RoundModel = EasyLLM.generate_pydantic_model_from_json_schema("Round", ROUND_JSON_SCHEMA)
-SystemUseModel = EasyLLM.generate_pydantic_model_from_json_schema("SystemUse", REQUIRES_SYSTEM_USE)
-AgentReqsModel = EasyLLM.generate_pydantic_model_from_json_schema("AgentRequirements", AGENT_REQUIREMENT_SCHEMA)
-MultipleAgentsModel = EasyLLM.generate_pydantic_model_from_json_schema("MultipleAgentRequirements", LIST_OF_AGENTS_SCHEMA)
-WinModel = EasyLLM.generate_pydantic_model_from_json_schema("Winning", WIN_SCHEMA)
\ No newline at end of file
+def __dir__() -> List[str]:
+    return sorted(list(globals().keys()) + list(_MODEL_SCHEMAS.keys()))
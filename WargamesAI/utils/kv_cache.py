@@ -0,0 +1,207 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Default memory budget for the cached prefixes of one model
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def cache_size_bytes(past_key_values: Any) -> int:
+    """
+    Returns the memory held by past_key_values, either a legacy tuple of (key, value) tensors per layer or a
+    transformers Cache object.
+
+    Args:
+        past_key_values: The cache.
+
+    Returns:
+        int: Size of its key and value tensors in bytes.
+    """
+    if past_key_values is None:
+        return 0
+    if hasattr(past_key_values, "element_size") and hasattr(past_key_values, "numel"):
+        return past_key_values.numel() * past_key_values.element_size()
+    if isinstance(past_key_values, (tuple, list)):
+        return sum(cache_size_bytes(item) for item in past_key_values)
+    for names in (("layers",), ("key_cache", "value_cache"), ("keys", "values")):
+        if all(hasattr(past_key_values, name) for name in names):
+            return sum(cache_size_bytes(getattr(past_key_values, name)) for name in names)
+    return 0
+
+
+class PrefixKVCache:
+    """
+    Stores past_key_values for stable prompt prefixes (e.g. the game rules, or the rules plus a player bio) so that
+    only the new suffix of a prompt has to be prefilled.
+
+    Caches are keyed by the exact token ids of the prefix and are tied to the weights of one model, so a single
+    PrefixKVCache is kept per model in the model pool and shared by every EasyLLM instance using that model. Its
+    size counts towards that model's share of the pool's memory budget.
+
+    Cached prefixes are lent to generate() rather than copied: the caller holds the model's lock from lookup() until
+    restore(), which crops the cache back to the prefix generate() extended it from.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: Optional[int] = DEFAULT_MAX_BYTES) -> None:
+        """
+        Initializes the PrefixKVCache.
+
+        Args:
+            max_entries (int): Maximum number of cached prefixes, least recently used are evicted first.
+            max_bytes (int): Maximum memory held by cached prefixes, least recently used are evicted first. None
+                means no limit besides the model pool's budget.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, ...], Any]" = OrderedDict()
+        self._sizes: Dict[Tuple[int, ...], int] = {}
+        self.size_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _longest_prefix(self, input_ids: List[int]) -> Optional[Tuple[int, ...]]:
+        """
+        Finds the longest cached prefix that is strictly shorter than the given ids.
+
+        Args:
+            input_ids (List[int]): The prompt token ids.
+
+        Returns:
+            Optional[Tuple[int, ...]]: The matching cache key, or None.
+        """
+        best = None
+        for key in self._entries:
+            length = len(key)
+            if length >= len(input_ids) or (best is not None and length <= len(best)):
+                continue
+            if tuple(input_ids[:length]) == key:
+                best = key
+        return best
+
+    def lookup(self, input_ids: List[int]) -> Tuple[int, Any]:
+        """
+        Lends out the cache for the longest stored prefix of the prompt. The caller must hold the model's lock until
+        it passes the cache to restore().
+
+        Args:
+            input_ids (List[int]): The prompt token ids.
+
+        Returns:
+            Tuple[int, Any]: Number of cached tokens and their past_key_values, or (0, None).
+        """
+        with self._lock:
+            key = self._longest_prefix(input_ids)
+            if key is None:
+                self.misses += 1
+                return 0, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.reused_tokens += len(key)
+            past_key_values = self._entries[key]
+            if not hasattr(past_key_values, "crop") and not isinstance(past_key_values, tuple):
+                # A cache that generate() extends in place but that cannot be cropped back has to be copied
+                past_key_values = copy.deepcopy(past_key_values)
+            return len(key), past_key_values
+
+    @staticmethod
+    def restore(past_key_values: Any, length: int) -> None:
+        """
+        Crops a cache lent out by lookup() back to its prefix after generate() has extended it in place. Legacy
+        tuple caches are never extended in place and are left as they are.
+
+        Args:
+            past_key_values: The cache returned by lookup().
+            length (int): The number of cached tokens returned by lookup().
+        """
+        crop = getattr(past_key_values, "crop", None)
+        if callable(crop):
+            crop(length)
+
+    def trim(self, max_bytes: int) -> int:
+        """
+        Evicts least recently used prefixes until the cache holds at most max_bytes.
+
+        Args:
+            max_bytes (int): The memory to fit in.
+
+        Returns:
+            int: Number of bytes freed.
+        """
+        with self._lock:
+            freed = 0
+            while self._entries and self.size_bytes > max_bytes:
+                freed += self._evict_oldest()
+            return freed
+
+    def _evict_oldest(self) -> int:
+        key, _ = self._entries.popitem(last=False)
+        size = self._sizes.pop(key, 0)
+        self.size_bytes -= size
+        return size
+
+    def build(self, model: Any, prefix_ids: List[int], device: str) -> int:
+        """
+        Computes and stores past_key_values for a prefix, only prefilling the part not already cached.
+
+        Args:
+            model: The causal language model the prefix belongs to.
+            prefix_ids (List[int]): Token ids of the prefix.
+            device (str): Device to run the prefill on.
+
+        Returns:
+            int: Number of tokens that had to be prefilled.
+        """
+        import torch
+
+        key = tuple(prefix_ids)
+        if not key:
+            return 0
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return 0
+            cached_length, past_key_values = self.lookup(prefix_ids)
+            # The shorter prefix stays cached on its own, so the new entry is built on a copy of it
+            if hasattr(past_key_values, "crop"):
+                past_key_values = copy.deepcopy(past_key_values)
+
+        suffix = torch.tensor([prefix_ids[cached_length:]], dtype=torch.long).to(device)
+        attention_mask = torch.ones((1, len(prefix_ids)), dtype=torch.long).to(device)
+        with torch.no_grad():
+            outputs = model(
+                input_ids=suffix,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                use_cache=True,
+            )
+
+        size = cache_size_bytes(outputs.past_key_values)
+        with self._lock:
+            if self.max_bytes is not None and size > self.max_bytes:
+                return len(prefix_ids) - cached_length
+            self._entries[key] = outputs.past_key_values
+            self._sizes[key] = size
+            self.size_bytes += size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.size_bytes > self.max_bytes
+            ):
+                self._evict_oldest()
+
+        return len(prefix_ids) - cached_length
+
+    def clear(self) -> None:
+        """
+        Removes every cached prefix.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.size_bytes = 0
@@ -0,0 +1,349 @@
+import http.client
+import json
+import queue
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+class LLMBackend:
+    """
+    Interface for the inference engines EasyLLM can generate with. EasyLLM uses its in-process HuggingFace model
+    when no backend is given.
+    """
+
+    model_name: Optional[str] = None
+    # Whether generate() and generate_batch() take sampling seeds (seed= and seeds=)
+    supports_seed: bool = False
+
+    def generate(self, messages: List[dict], max_new_tokens: int, json_schema: Optional[dict] = None) -> str:
+        """
+        Generates the next assistant message for a dialogue.
+
+        Args:
+            messages (List[dict]): The dialogue as role/content messages.
+            max_new_tokens (int): Maximum number of new tokens to generate.
+            json_schema (dict): Optional JSON schema the answer must be valid JSON for. Backends that cannot
+                constrain generation may ignore it.
+
+        Returns:
+            str: The generated text.
+        """
+        raise NotImplementedError
+
+    def generate_batch(
+        self, dialogues: List[List[dict]], max_new_tokens: int, json_schemas: Optional[List[Optional[dict]]] = None
+    ) -> List[str]:
+        """
+        Generates the next assistant message for several independent dialogues.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues.
+            max_new_tokens (int): Maximum number of new tokens to generate.
+            json_schemas (List[Optional[dict]]): Optional JSON schema for each dialogue's answer.
+
+        Returns:
+            List[str]: The generated text for each dialogue, in the same order.
+        """
+        if json_schemas is None:
+            return [self.generate(messages, max_new_tokens) for messages in dialogues]
+        results = []
+        for messages, schema in zip(dialogues, json_schemas):
+            if schema:
+                results.append(self.generate(messages, max_new_tokens, json_schema=schema))
+            else:
+                results.append(self.generate(messages, max_new_tokens))
+        return results
+
+    def close(self) -> None:
+        """
+        Releases any resources held by the backend.
+        """
+
+
+class BackendError(Exception):
+    """
+    Raised when an inference backend fails after all retries.
+    """
+
+
+class _ConnectionPool:
+    """
+    A small pool of keep-alive HTTP connections to one host.
+    """
+
+    def __init__(self, base_url: str, max_connections: int, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def request(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> tuple:
+        """
+        Sends a request over an idle connection, opening one only if none is free.
+
+        Returns:
+            tuple: The response status, headers and body.
+        """
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connection_class(self._host, self._port, timeout=self._timeout)
+
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except Exception:
+                connection.close()
+                raise
+
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return response.status, dict(response.getheaders()), data
+
+    def close(self) -> None:
+        """
+        Closes every idle connection.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class OpenAIHTTPBackend(LLMBackend):
+    """
+    Generates with a shared inference server that speaks the OpenAI-compatible chat completions API
+    (e.g. vLLM, TGI or llama.cpp server). Connections are kept alive and pooled, batches are sent as concurrent
+    in-flight requests, and failed requests are retried with exponential backoff.
+    """
+
+    supports_seed = True
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000/v1",
+        model_name: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: float = 300.0,
+        max_connections: int = 8,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+        temperature: Optional[float] = None,
+        extra_body: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Initializes the OpenAIHTTPBackend.
+
+        Args:
+            base_url (str): Base URL of the API, including the version prefix, e.g. "http://host:8000/v1".
+            model_name (str): Model name sent with each request.
+            api_key (str): Optional bearer token.
+            timeout (float): Socket timeout per request in seconds.
+            max_connections (int): Maximum number of concurrent connections, and so of in-flight requests.
+            max_retries (int): Number of retries for connection errors and retryable status codes.
+            backoff_factor (float): Base delay in seconds, doubled on each retry.
+            max_backoff (float): Maximum delay between retries in seconds.
+            temperature (float): Sampling temperature. None leaves it to the server.
+            extra_body (dict): Extra fields merged into every request body.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.temperature = temperature
+        self.extra_body = extra_body or {}
+        self._path_prefix = urlsplit(self.base_url).path
+        self._pool = _ConnectionPool(self.base_url, max_connections, timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """
+        Works out how long to wait before the next attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 0.
+            retry_after (str): The server's Retry-After header, if any.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+        # Jitter keeps many clients from retrying in lock-step
+        return delay * random.uniform(0.5, 1.0)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Posts a JSON payload, retrying transient failures.
+
+        Args:
+            path (str): The API path, e.g. "/chat/completions".
+            payload (dict): The request body.
+
+        Returns:
+            dict: The decoded JSON response.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                status, headers, data = self._pool.request("POST", self._path_prefix + path, body, self._headers())
+                if status < 300:
+                    return json.loads(data)
+                last_error = BackendError(f"HTTP {status}: {data[:500].decode('utf-8', 'replace')}")
+                if status not in RETRY_STATUS_CODES:
+                    raise last_error
+                retry_after = headers.get("Retry-After")
+            except (ConnectionError, socket.timeout, http.client.HTTPException, OSError) as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, retry_after))
+
+        raise BackendError(f"Request to {self.base_url}{path} failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def generate(
+        self, messages: List[dict], max_new_tokens: int, json_schema: Optional[dict] = None, seed: Optional[int] = None
+    ) -> str:
+        """
+        Generates the next assistant message for a dialogue with the chat completions API.
+
+        Args:
+            messages (List[dict]): The dialogue as role/content messages.
+            max_new_tokens (int): Maximum number of new tokens to generate.
+            json_schema (dict): Optional JSON schema, sent as a structured-output response_format so servers that
+                support guided decoding only generate matching JSON.
+            seed (int): Optional sampling seed, for servers that support reproducible sampling.
+
+        Returns:
+            str: The generated text.
+        """
+        payload = {
+            "messages": [{"role": m.get("role", "user"), "content": m["content"]} for m in messages],
+            "max_tokens": max_new_tokens,
+            **self.extra_body,
+        }
+        if self.model_name:
+            payload["model"] = self.model_name
+        if self.temperature is not None:
+            payload["temperature"] = self.temperature
+        if seed is not None:
+            payload["seed"] = seed
+        if json_schema is not None:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": json_schema.get("title", "response"), "schema": json_schema},
+            }
+
+        response = self._post("/chat/completions", payload)
+        try:
+            return (response["choices"][0]["message"]["content"] or "").strip()
+        except (KeyError, IndexError, TypeError):
+            raise BackendError(f"Unexpected chat completions response: {response}")
+
+    def generate_batch(
+        self,
+        dialogues: List[List[dict]],
+        max_new_tokens: int,
+        json_schemas: Optional[List[Optional[dict]]] = None,
+        seeds: Optional[List[Optional[int]]] = None,
+    ) -> List[str]:
+        """
+        Generates for several dialogues at once as concurrent in-flight requests over the connection pool.
+
+        Args:
+            dialogues (List[List[dict]]): The dialogues.
+            max_new_tokens (int): Maximum number of new tokens to generate.
+            json_schemas (List[Optional[dict]]): Optional JSON schema for each dialogue's answer.
+            seeds (List[Optional[int]]): Optional sampling seed for each dialogue.
+
+        Returns:
+            List[str]: The generated text for each dialogue, in the same order.
+        """
+        schemas = json_schemas or [None] * len(dialogues)
+        seeds = seeds or [None] * len(dialogues)
+        return list(self._executor.map(
+            lambda job: self.generate(job[0], max_new_tokens, json_schema=job[1], seed=job[2]),
+            zip(dialogues, schemas, seeds),
+        ))
+
+    def close(self) -> None:
+        """
+        Stops the request threads and closes pooled connections.
+        """
+        self._executor.shutdown(wait=True)
+        self._pool.close()
+
+
+_DEFAULT_BACKEND: Optional[LLMBackend] = None
+
+
+def set_default_backend(backend: Optional[LLMBackend]) -> None:
+    """
+    Sets the backend used by every EasyLLM created without an explicit backend. None restores in-process models.
+
+    Args:
+        backend (LLMBackend): The backend to use by default.
+    """
+    global _DEFAULT_BACKEND
+    _DEFAULT_BACKEND = backend
+
+
+def get_default_backend() -> Optional[LLMBackend]:
+    """
+    Returns the backend used by EasyLLM instances created without an explicit backend, if any.
+    """
+    return _DEFAULT_BACKEND
+
+
+# Per thread, so games built concurrently in different threads get their own seeds
+_GENERATION_SEED = threading.local()
+
+
+def set_generation_seed(seed: Optional[int]) -> None:
+    """
+    Sets the sampling seed of every EasyLLM created afterwards in this thread without an explicit seed. None
+    restores unseeded sampling.
+
+    Args:
+        seed (int): The seed.
+    """
+    _GENERATION_SEED.value = seed
+
+
+def get_generation_seed() -> Optional[int]:
+    """
+    Returns the sampling seed EasyLLM instances created in this thread default to, if any.
+    """
+    return getattr(_GENERATION_SEED, "value", None)
@@ -0,0 +1,248 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Key used to identify a loaded model: (model_name, quantization, device)
+PoolKey = Tuple[str, str, str]
+
+# Budget value that is derived from the memory of the device the first model is loaded on
+AUTO_BUDGET = "auto"
+# Share of the device's memory the pool may use for models and their caches, leaving room for activations
+DEVICE_MEMORY_FRACTION = 0.85
+
+
+def default_memory_budget(device: str) -> Optional[int]:
+    """
+    Derives a memory budget from the device models are loaded on: a share of the total memory of the GPUs for a
+    CUDA device, or of the system RAM otherwise.
+
+    Args:
+        device (str): The device, e.g. "cuda", "cuda:1" or "cpu".
+
+    Returns:
+        Optional[int]: The budget in bytes, or None if the device's memory cannot be determined.
+    """
+    import torch
+
+    if str(device).startswith("cuda") and torch.cuda.is_available():
+        index = torch.device(device).index
+        indices = [index] if index is not None else range(torch.cuda.device_count())
+        total = sum(torch.cuda.get_device_properties(i).total_memory for i in indices)
+    else:
+        try:
+            total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, ValueError, OSError):
+            return None
+    return int(total * DEVICE_MEMORY_FRACTION)
+
+
+class PoolEntry:
+    """
+    A single model/tokenizer pair held by the ModelPool.
+    """
+
+    def __init__(self, key: PoolKey, model: Any, tokenizer: Any, size_bytes: int) -> None:
+        self.key = key
+        self.model = model
+        self.tokenizer = tokenizer
+        self.size_bytes = size_bytes
+        self.references = 0
+        # Serialises generate/forward calls on these weights when EasyLLM is used from several threads
+        self.lock = threading.RLock()
+        # Free-form per-model storage for caches that are tied to these weights
+        self.extras: Dict[str, Any] = {}
+
+    @property
+    def cache_bytes(self) -> int:
+        """Returns the memory held by caches tied to these weights, e.g. the prefix KV-cache."""
+        return sum(getattr(extra, "size_bytes", 0) for extra in list(self.extras.values()))
+
+    @property
+    def total_bytes(self) -> int:
+        """Returns the memory held by the weights and the caches tied to them."""
+        return self.size_bytes + self.cache_bytes
+
+
+class ModelPool:
+    """
+    A process-wide pool of loaded language models.
+
+    Models are shared between every EasyLLM instance that asks for the same (model_name, quantization, device)
+    key and stay resident between generations. Caches tied to a model's weights, such as its prefix KV-cache,
+    count towards the memory budget. When the budget is exceeded the least recently used models that are not
+    currently in use are evicted, then the caches of the remaining models are trimmed.
+    """
+
+    def __init__(self, max_memory_bytes: Union[int, str, None] = AUTO_BUDGET) -> None:
+        """
+        Initializes the ModelPool.
+
+        Args:
+            max_memory_bytes (int): Total RAM/VRAM budget for resident models and their caches. AUTO_BUDGET derives
+                it from the memory of the device the first model is loaded on. None means no limit.
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self._entries: "OrderedDict[PoolKey, PoolEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _estimate_size(model: Any) -> int:
+        """
+        Estimates the memory footprint of a loaded model in bytes.
+
+        Args:
+            model: The loaded model.
+
+        Returns:
+            int: Estimated size in bytes.
+        """
+        footprint = getattr(model, "get_memory_footprint", None)
+        if callable(footprint):
+            try:
+                return int(footprint())
+            except Exception:
+                pass
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+
+    @property
+    def used_bytes(self) -> int:
+        """Returns the estimated memory used by all resident models and their caches."""
+        with self._lock:
+            return sum(entry.total_bytes for entry in self._entries.values())
+
+    def acquire(self, key: PoolKey, loader: Callable[[], Tuple[Any, Any]]) -> PoolEntry:
+        """
+        Returns the pool entry for a key, loading it with the loader if it is not resident.
+
+        Args:
+            key (PoolKey): The (model_name, quantization, device) key.
+            loader (Callable): Function returning a (model, tokenizer) tuple when the model must be loaded.
+
+        Returns:
+            PoolEntry: The shared entry. Call release() when it is no longer needed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                if self.max_memory_bytes == AUTO_BUDGET:
+                    self.max_memory_bytes = default_memory_budget(key[2])
+                model, tokenizer = loader()
+                entry = PoolEntry(key, model, tokenizer, self._estimate_size(model))
+                self._entries[key] = entry
+                self.loads += 1
+            entry.references += 1
+            self._enforce_budget(keep=key)
+            return entry
+
+    def release(self, key: PoolKey) -> None:
+        """
+        Marks one user of a model as finished. The model stays resident until evicted.
+
+        Args:
+            key (PoolKey): The key that was acquired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.references > 0:
+                entry.references -= 1
+            self._enforce_budget()
+
+    def set_budget(self, max_memory_bytes: Union[int, str, None]) -> None:
+        """
+        Changes the memory budget and evicts models if required.
+
+        Args:
+            max_memory_bytes (int): New budget in bytes. AUTO_BUDGET derives it from the device memory on the next
+                load. None means no limit.
+        """
+        with self._lock:
+            self.max_memory_bytes = max_memory_bytes
+            self._enforce_budget()
+
+    def _enforce_budget(self, keep: Optional[PoolKey] = None) -> None:
+        """
+        Evicts least recently used, unreferenced models until the pool fits its budget, then trims the caches of the
+        models that remain, least recently used models first.
+
+        Args:
+            keep (PoolKey): A key that must not be evicted.
+        """
+        if self.max_memory_bytes is None or self.max_memory_bytes == AUTO_BUDGET:
+            return
+        for key in list(self._entries.keys()):
+            if self.used_bytes <= self.max_memory_bytes:
+                break
+            entry = self._entries[key]
+            if key == keep or entry.references > 0:
+                continue
+            self._evict(key)
+
+        for entry in list(self._entries.values()):
+            excess = self.used_bytes - self.max_memory_bytes
+            if excess <= 0:
+                break
+            for extra in list(entry.extras.values()):
+                trim = getattr(extra, "trim", None)
+                if callable(trim) and excess > 0:
+                    excess -= trim(max(extra.size_bytes - excess, 0))
+
+    def _evict(self, key: PoolKey) -> None:
+        """
+        Removes a model from the pool and frees its memory.
+
+        Args:
+            key (PoolKey): The key to evict.
+        """
+        entry = self._entries.pop(key)
+        entry.model = None
+        entry.tokenizer = None
+        entry.extras.clear()
+        self.evictions += 1
+
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def clear(self) -> None:
+        """
+        Evicts every model that is not currently in use.
+        """
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if self._entries[key].references == 0:
+                    self._evict(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns pool statistics.
+
+        Returns:
+            dict: Loads, hits, evictions, resident models and memory use.
+        """
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "resident": [entry.key for entry in self._entries.values()],
+                "used_bytes": self.used_bytes,
+                "cache_bytes": sum(entry.cache_bytes for entry in self._entries.values()),
+                "max_memory_bytes": self.max_memory_bytes,
+            }
+
+
+_DEFAULT_POOL = ModelPool()
+
+
+def get_model_pool() -> ModelPool:
+    """
+    Returns the process-wide model pool shared by all EasyLLM instances.
+    """
+    return _DEFAULT_POOL
@@ -1,8 +1,10 @@
-from fpdf import FPDF
-import PyPDF2
 import hashlib
 
+from WargamesAI.utils import document_loader
+
 def write_pdf(pdf_data_str, pdf_path):
+    from fpdf import FPDF
+
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
@@ -11,19 +13,16 @@ def write_pdf(pdf_data_str, pdf_path):
     return True 
 
 def read_pdf(pdf_path):
-    data = []
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        number_of_pages = len(reader.pages)
-        
-        
-        # Extract text from each page
-        for page_num in range(number_of_pages):
-            page = reader.pages[page_num]
-            text = page.extract_text()
-            data.append(text)
-
-    return " ".join(text)
+    """
+    Reads the text of every page of a PDF.
+
+    Parameters:
+    - pdf_path (str): Path to the PDF file.
+
+    Returns:
+    - str: The text of all pages.
+    """
+    return document_loader.read_pdf_text(pdf_path)
 
 def hash_string(input_string, algorithm='sha256'):
     """
@@ -0,0 +1,184 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+JSON_PROMPT_TEMPLATE = (
+    "Answer the following query in JSON format according to the provided schema:\n{format_instructions}\n\n{query}\n"
+)
+
+_FORMAT_INSTRUCTIONS: Dict[type, str] = {}
+_FORMAT_INSTRUCTIONS_LOCK = threading.Lock()
+
+
+class JsonPrompt(str):
+    """
+    A prompt asking for JSON output, which remembers the schema and query it was built from.
+    """
+
+    schema: Optional[Type["BaseModel"]] = None
+    query: Optional[str] = None
+
+    def __new__(cls, text: str, schema: Optional[Type["BaseModel"]] = None, query: Optional[str] = None) -> "JsonPrompt":
+        prompt = super().__new__(cls, text)
+        prompt.schema = schema
+        prompt.query = query
+        return prompt
+
+    def __reduce__(self):
+        # Schemas are often generated classes that cannot be pickled, so a pickled prompt is plain text
+        return (str, (str(self),))
+
+
+def get_format_instructions(schema: Type["BaseModel"]) -> str:
+    """
+    Returns the JSON format instructions for a Pydantic schema, rendering them only the first time.
+
+    Args:
+        schema (Type[BaseModel]): The Pydantic schema.
+
+    Returns:
+        str: The format instructions.
+    """
+    instructions = _FORMAT_INSTRUCTIONS.get(schema)
+    if instructions is None:
+        from langchain_core.output_parsers import JsonOutputParser
+
+        instructions = JsonOutputParser(pydantic_object=schema).get_format_instructions()
+        with _FORMAT_INSTRUCTIONS_LOCK:
+            _FORMAT_INSTRUCTIONS[schema] = instructions
+    return instructions
+
+
+def build_json_prompt(schema: Type["BaseModel"], query: str) -> JsonPrompt:
+    """
+    Builds a prompt asking for an answer in the JSON format of a schema.
+
+    Args:
+        schema (Type[BaseModel]): The Pydantic schema to structure the output.
+        query (str): The query to answer.
+
+    Returns:
+        JsonPrompt: The prompt.
+    """
+    text = JSON_PROMPT_TEMPLATE.format(format_instructions=get_format_instructions(schema), query=query)
+    return JsonPrompt(text, schema=schema, query=query)
+
+
+class PromptAssembler:
+    """
+    Turns rendered prompts into token ids, re-using the token ids of text segments that have been seen before.
+
+    Tokenizers split their input on special tokens and tokenize the text between them independently, so a prompt can
+    be split the same way and its segments tokenized separately. With a chat template each message is wrapped in
+    special tokens, so the segments of earlier messages come from the cache and only the text of new messages is
+    tokenized. The first few prompts are checked against a full tokenization; if they ever differ, the tokenizer is
+    always used directly.
+    """
+
+    def __init__(self, tokenizer: Any, max_segments: int = 4096) -> None:
+        """
+        Initializes the PromptAssembler.
+
+        Args:
+            tokenizer: The HuggingFace tokenizer.
+            max_segments (int): Maximum number of cached segments, least recently used are evicted first.
+        """
+        self.tokenizer = tokenizer
+        self.max_segments = max_segments
+        self._segments: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Number of prompts still to be checked against a full tokenization
+        self._checks_remaining = 3
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+        self._special_ids: Dict[str, int] = {}
+        self._lstrip = set()
+        self._rstrip = set()
+        decoder = getattr(tokenizer, "added_tokens_decoder", None) or {}
+        for token_id, token in decoder.items():
+            content = getattr(token, "content", str(token))
+            self._special_ids[content] = token_id
+            if getattr(token, "lstrip", False):
+                self._lstrip.add(content)
+            if getattr(token, "rstrip", False):
+                self._rstrip.add(content)
+        if not self._special_ids:
+            for content in getattr(tokenizer, "all_special_tokens", []):
+                self._special_ids[content] = tokenizer.convert_tokens_to_ids(content)
+
+        tokens = sorted(self._special_ids, key=len, reverse=True)
+        self._pattern = re.compile("(" + "|".join(map(re.escape, tokens)) + ")") if tokens else None
+
+    def _tokenize(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def _segment_ids(self, segment: str) -> List[int]:
+        with self._lock:
+            ids = self._segments.get(segment)
+            if ids is not None:
+                self._segments.move_to_end(segment)
+                self.hits += 1
+                return ids
+
+        ids = self._tokenize(segment)
+        with self._lock:
+            self.misses += 1
+            self._segments[segment] = ids
+            while len(self._segments) > self.max_segments:
+                self._segments.popitem(last=False)
+        return ids
+
+    def _split(self, text: str) -> List[str]:
+        """
+        Splits a prompt into alternating text segments and special tokens, applying the tokens' whitespace stripping.
+        """
+        parts = self._pattern.split(text)
+        for i in range(1, len(parts), 2):
+            if parts[i] in self._lstrip:
+                parts[i - 1] = parts[i - 1].rstrip()
+            if parts[i] in self._rstrip and i + 1 < len(parts):
+                parts[i + 1] = parts[i + 1].lstrip()
+        return parts
+
+    def encode(self, text: str) -> List[int]:
+        """
+        Tokenizes a rendered prompt without adding special tokens, tokenizing only segments not seen before.
+
+        Args:
+            text (str): The rendered prompt, e.g. the output of apply_chat_template(tokenize=False).
+
+        Returns:
+            List[int]: The token ids.
+        """
+        if not self.enabled or self._pattern is None:
+            return self._tokenize(text)
+
+        ids: List[int] = []
+        for i, part in enumerate(self._split(text)):
+            if i % 2:
+                ids.append(self._special_ids[part])
+            elif part:
+                ids.extend(self._segment_ids(part))
+
+        if self._checks_remaining > 0:
+            self._checks_remaining -= 1
+            if ids != self._tokenize(text):
+                print("Segment tokenization does not match this tokenizer, prompts will be tokenized in full.")
+                self.enabled = False
+                self.clear()
+                return self._tokenize(text)
+
+        return ids
+
+    def clear(self) -> None:
+        """
+        Removes every cached segment.
+        """
+        with self._lock:
+            self._segments.clear()
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Name of the folder, created next to the indexed PDFs, that holds the persisted indexes
+INDEX_FOLDER_NAME = ".easyrag_index"
+
+# Bump when the chunking or storage format changes so stale indexes are not reused
+INDEX_FORMAT_VERSION = 2
+
+
+class ChunkIndex:
+    """
+    The text chunks of a document and their embedding matrix.
+    """
+
+    def __init__(self, chunks: List[str], embeddings: np.ndarray, path: Optional[str] = None) -> None:
+        """
+        Initializes the ChunkIndex.
+
+        Args:
+            chunks (List[str]): The text chunks.
+            embeddings (np.ndarray): One embedding row per chunk, possibly memory-mapped.
+            path (str): Folder the index is persisted in, if any.
+        """
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.path = path
+        self._normalized_embeddings: Optional[np.ndarray] = None
+        # Approximate nearest neighbour indexes built over this index, keyed by backend settings
+        self.ann_indexes: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def normalized_embeddings(self) -> np.ndarray:
+        """Returns the L2-normalized embedding matrix, computed once per index."""
+        if self._normalized_embeddings is None:
+            self._normalized_embeddings = normalize_rows(self.embeddings)
+        return self._normalized_embeddings
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalizes each row of a matrix so cosine similarity becomes a dot product.
+
+    Args:
+        matrix (np.ndarray): The matrix to normalize.
+
+    Returns:
+        np.ndarray: A float32 copy with unit-length rows. All-zero rows are left as zeros.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Returns the indices of the top-k scores of each row, best first, without fully sorting the rows.
+
+    Args:
+        scores (np.ndarray): A (queries, documents) score matrix.
+        top_k (int): Number of indices to return per row.
+
+    Returns:
+        np.ndarray: A (queries, top_k) index matrix.
+    """
+    top_k = min(top_k, scores.shape[1])
+    if top_k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if top_k < scores.shape[1]:
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class IndexStore:
+    """
+    An on-disk store of chunk/embedding indexes, content-addressed by the PDF bytes, the embedding model and the
+    chunking parameters. Loaded indexes are kept in memory so repeat queries never touch the PDF again.
+    """
+
+    def __init__(self, index_folder: Optional[str] = None) -> None:
+        """
+        Initializes the IndexStore.
+
+        Args:
+            index_folder (str): Folder to store indexes in. If None, a folder is created next to each PDF.
+        """
+        self.index_folder = index_folder
+        self._loaded: Dict[str, ChunkIndex] = {}
+        self._hashes: Dict[Tuple[str, float, int], str] = {}
+        self._lock = threading.RLock()
+
+    def content_hash(self, pdf_path: str) -> str:
+        """
+        Hashes the contents of a file, reusing the previous hash while its size and modification time are unchanged.
+
+        Args:
+            pdf_path (str): Path to the file.
+
+        Returns:
+            str: The sha256 hex digest of the file contents.
+        """
+        stat = os.stat(pdf_path)
+        signature = (os.path.abspath(pdf_path), stat.st_mtime, stat.st_size)
+        with self._lock:
+            if signature in self._hashes:
+                return self._hashes[signature]
+
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+
+        with self._lock:
+            self._hashes[signature] = content_hash
+        return content_hash
+
+    def index_key(self, pdf_path: str, embedding_model_name: str, chunk_size: int, chunk_overlap: int) -> str:
+        """
+        Builds the key an index is stored under.
+
+        Args:
+            pdf_path (str): Path to the PDF.
+            embedding_model_name (str): Name of the embedding model.
+            chunk_size (int): Chunk size in characters.
+            chunk_overlap (int): Chunk overlap in characters.
+
+        Returns:
+            str: The index key.
+        """
+        parameters = json.dumps(
+            [INDEX_FORMAT_VERSION, self.content_hash(pdf_path), embedding_model_name, chunk_size, chunk_overlap]
+        )
+        return hashlib.sha256(parameters.encode("utf-8")).hexdigest()
+
+    def _index_path(self, pdf_path: str, key: str) -> str:
+        """
+        Returns the folder an index is stored in.
+
+        Args:
+            pdf_path (str): Path to the PDF, or to the folder of a multi-document corpus.
+            key (str): The index key.
+
+        Returns:
+            str: The index folder.
+        """
+        source_path = os.path.abspath(pdf_path)
+        source_folder = source_path if os.path.isdir(source_path) else os.path.dirname(source_path)
+        root = self.index_folder or os.path.join(source_folder, INDEX_FOLDER_NAME)
+        return os.path.join(root, key)
+
+    def load(self, pdf_path: str, key: str) -> Optional[ChunkIndex]:
+        """
+        Loads an index from memory or disk. The embedding matrix is memory-mapped.
+
+        Args:
+            pdf_path (str): Path to the PDF.
+            key (str): The index key.
+
+        Returns:
+            Optional[ChunkIndex]: The index, or None if it has not been built.
+        """
+        with self._lock:
+            if key in self._loaded:
+                return self._loaded[key]
+
+        index_path = self._index_path(pdf_path, key)
+        chunks_path = os.path.join(index_path, "chunks.json")
+        embeddings_path = os.path.join(index_path, "embeddings.npy")
+        if not (os.path.exists(chunks_path) and os.path.exists(embeddings_path)):
+            return None
+
+        with open(chunks_path, "r", encoding="utf-8") as file:
+            chunks = json.load(file)
+        embeddings = np.load(embeddings_path, mmap_mode="r")
+
+        index = ChunkIndex(chunks, embeddings, index_path)
+        with self._lock:
+            self._loaded[key] = index
+        return index
+
+    def save(self, pdf_path: str, key: str, chunks: List[str], embeddings: np.ndarray) -> ChunkIndex:
+        """
+        Writes an index to disk and keeps it in memory.
+
+        Args:
+            pdf_path (str): Path to the PDF.
+            key (str): The index key.
+            chunks (List[str]): The text chunks.
+            embeddings (np.ndarray): The chunk embeddings.
+
+        Returns:
+            ChunkIndex: The saved index.
+        """
+        index_path = self._index_path(pdf_path, key)
+        os.makedirs(index_path, exist_ok=True)
+
+        # Write to temporary files first so a crash never leaves a half-written index behind
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with tempfile.NamedTemporaryFile(dir=index_path, suffix=".npy", delete=False) as file:
+            np.save(file, embeddings)
+        os.replace(file.name, os.path.join(index_path, "embeddings.npy"))
+
+        with tempfile.NamedTemporaryFile("w", dir=index_path, suffix=".json", encoding="utf-8", delete=False) as file:
+            json.dump(chunks, file)
+        os.replace(file.name, os.path.join(index_path, "chunks.json"))
+
+        index = ChunkIndex(chunks, embeddings, index_path)
+        with self._lock:
+            self._loaded[key] = index
+        return index
+
+
+_STORES: Dict[Optional[str], IndexStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_index_store(index_folder: Optional[str] = None) -> IndexStore:
+    """
+    Returns the process-wide IndexStore for a folder, so every EasyRAG instance shares loaded indexes.
+
+    Args:
+        index_folder (str): Folder to store indexes in. If None, a folder is created next to each PDF.
+
+    Returns:
+        IndexStore: The shared store.
+    """
+    with _STORES_LOCK:
+        if index_folder not in _STORES:
+            _STORES[index_folder] = IndexStore(index_folder)
+        return _STORES[index_folder]
@@ -0,0 +1,361 @@
+import contextlib
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from WargamesAI.utils.llm_backends import BackendError, LLMBackend, get_default_backend, set_default_backend
+
+# Bump when the log format changes
+REPLAY_FORMAT_VERSION = 1
+
+
+def dialogue_digest(messages: List[dict]) -> str:
+    """
+    Hashes a dialogue, so a replayed generation can be matched to the recorded one.
+
+    Args:
+        messages (List[dict]): The dialogue as role/content messages.
+
+    Returns:
+        str: A short hex digest.
+    """
+    canonical = json.dumps([[message.get("role"), str(message.get("content"))] for message in messages])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def _open_log(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class GameRecorder:
+    """
+    Records everything that makes a game non-deterministic to an append-only JSON lines log: every EasyLLM and
+    EasyRAG answer with the question it answered, VerdictEngine verdicts, the umpire's RNG seed and the card deck. A log ending in ".gz" is
+    compressed.
+
+    The log is replayed with ReplayLog, which re-executes the game without running any model.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the GameRecorder, creating or appending to the log.
+
+        Args:
+            path (str): Path of the log file.
+        """
+        self.path = path
+        self._file = _open_log(path, "a")
+        self._lock = threading.Lock()
+        self.events = 0
+        self._write({"event": "header", "version": REPLAY_FORMAT_VERSION, "created": time.time()})
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.events += 1
+
+    def record_llm(self, model_name: str, messages: List[dict], response: str) -> None:
+        """
+        Records a language model answer.
+
+        Args:
+            model_name (str): Name of the model that answered.
+            messages (List[dict]): The dialogue it answered.
+            response (str): The raw response.
+        """
+        self._write({
+            "event": "llm",
+            "digest": dialogue_digest(messages),
+            "model": model_name,
+            "question": str(messages[-1].get("content")) if messages else "",
+            "response": response,
+        })
+
+    def record_rag(self, question: str, pdf_path: str, top_k: int, response: str) -> None:
+        """
+        Records an EasyRAG answer.
+
+        Args:
+            question (str): The question.
+            pdf_path (str): The PDF or folder it was answered from.
+            top_k (int): Number of retrieved chunks.
+            response (str): The answer.
+        """
+        self._write({"event": "rag", "question": question, "pdf": pdf_path, "top_k": top_k, "response": response})
+
+    def record_seed(self, owner: str, seed: int) -> None:
+        """
+        Records the seed of a random number generator.
+
+        Args:
+            owner (str): What the generator is used by, e.g. "umpire".
+            seed (int): The seed.
+        """
+        self._write({"event": "seed", "owner": owner, "seed": seed})
+
+    def record_verdict(self, kind: str, claim: str, probability: float, escalated: bool) -> None:
+        """
+        Records the verdict of a VerdictEngine check.
+
+        Args:
+            kind (str): What was checked, e.g. "legality".
+            claim (str): The action checked.
+            probability (float): Probability that the action is allowed.
+            escalated (bool): Whether the verdict came from the LLM.
+        """
+        self._write({"event": "verdict", "kind": kind, "claim": claim, "probability": probability, "escalated": escalated})
+
+    def record_deck(self, cards: Optional[List[Any]]) -> None:
+        """
+        Records the card deck at the start of the game.
+
+        Args:
+            cards (list): The cards, or None if the game has none.
+        """
+        self._write({"event": "deck", "cards": cards})
+
+    def close(self) -> None:
+        """
+        Closes the log.
+        """
+        with self._lock:
+            self._file.close()
+
+
+class ReplayLog:
+    """
+    A recorded game, served back in place of the models and random number generators.
+
+    Language model answers are matched to the dialogue they answer, so turns may run in a different order than when
+    they were recorded. If a dialogue was never recorded, e.g. because a prompt changed, the next answer not yet
+    served is used instead and the divergence is counted.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the ReplayLog by reading a log written by GameRecorder.
+
+        Args:
+            path (str): Path of the log file.
+        """
+        self.path = path
+        self._llm: Dict[str, "deque[int]"] = {}
+        self._llm_events: List[Dict[str, Any]] = []
+        self._served = set()
+        self._last_served: Dict[str, int] = {}
+        self._next_unserved = 0
+        self._rag: Dict[Tuple[str, str, int], "deque[str]"] = {}
+        self._verdicts: Dict[Tuple[str, str], "deque[Tuple[float, bool]]"] = {}
+        self.model_name: Optional[str] = None
+        self.seeds: Dict[str, int] = {}
+        self.deck: Optional[List[Any]] = None
+        self.divergences = 0
+        self._lock = threading.Lock()
+
+        with _open_log(path, "r") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                kind = event["event"]
+                if kind == "header" and event["version"] != REPLAY_FORMAT_VERSION:
+                    raise ValueError(f"Unsupported replay log version {event['version']} in '{path}'.")
+                if kind == "llm":
+                    self.model_name = self.model_name or event["model"]
+                    self._llm.setdefault(event["digest"], deque()).append(len(self._llm_events))
+                    self._llm_events.append(event)
+                elif kind == "rag":
+                    key = (event["question"], event["pdf"], event["top_k"])
+                    self._rag.setdefault(key, deque()).append(event["response"])
+                elif kind == "verdict":
+                    key = (event["kind"], event["claim"])
+                    self._verdicts.setdefault(key, deque()).append((event["probability"], event["escalated"]))
+                elif kind == "seed":
+                    self.seeds.setdefault(event["owner"], event["seed"])
+                elif kind == "deck" and self.deck is None:
+                    self.deck = event["cards"]
+
+    def llm_response(self, messages: List[dict]) -> str:
+        """
+        Returns the recorded answer to a dialogue.
+
+        Args:
+            messages (List[dict]): The dialogue.
+
+        Returns:
+            str: The recorded raw response.
+        """
+        digest = dialogue_digest(messages)
+        with self._lock:
+            candidates = self._llm.get(digest)
+            if candidates:
+                index = candidates.popleft()
+            elif digest in self._last_served:
+                # Asked again, e.g. a retry with a larger token budget: the recorded answer is the final one
+                return self._llm_events[self._last_served[digest]]["response"]
+            else:
+                while self._next_unserved < len(self._llm_events) and self._next_unserved in self._served:
+                    self._next_unserved += 1
+                if self._next_unserved >= len(self._llm_events):
+                    raise BackendError(f"Replay log '{self.path}' has no more recorded answers.")
+                index = self._next_unserved
+                event = self._llm_events[index]
+                self._llm[event["digest"]].remove(index)
+                self.divergences += 1
+                print(f"Replay diverged: no answer was recorded for '{str(messages[-1].get('content'))[:80]}'.")
+            self._served.add(index)
+            self._last_served[digest] = index
+            return self._llm_events[index]["response"]
+
+    def rag_response(self, question: str, pdf_path: str, top_k: int) -> str:
+        """
+        Returns the recorded EasyRAG answer to a question.
+
+        Args:
+            question (str): The question.
+            pdf_path (str): The PDF or folder it was answered from.
+            top_k (int): Number of retrieved chunks.
+
+        Returns:
+            str: The recorded answer.
+        """
+        with self._lock:
+            answers = self._rag.get((question, pdf_path, top_k))
+            if not answers:
+                raise BackendError(f"Replay log '{self.path}' has no recorded answer for '{question[:80]}'.")
+            # Repeated questions get the recorded answers in order, the last one is kept for any extra repeats
+            return answers.popleft() if len(answers) > 1 else answers[0]
+
+    def verdict(self, kind: str, claim: str) -> Tuple[float, bool]:
+        """
+        Returns the recorded verdict of a VerdictEngine check.
+
+        Args:
+            kind (str): What was checked, e.g. "legality".
+            claim (str): The action checked.
+
+        Returns:
+            Tuple[float, bool]: The probability that the action is allowed and whether the LLM decided.
+        """
+        with self._lock:
+            verdicts = self._verdicts.get((kind, claim))
+            if not verdicts:
+                raise BackendError(f"Replay log '{self.path}' has no recorded {kind} verdict for '{claim[:80]}'.")
+            return verdicts.popleft() if len(verdicts) > 1 else verdicts[0]
+
+    @property
+    def backend(self) -> "ReplayBackend":
+        """Returns an LLM backend serving this log's answers."""
+        return ReplayBackend(self)
+
+
+class ReplayBackend(LLMBackend):
+    """
+    An inference backend that serves the answers of a recorded game instead of running a model.
+    """
+
+    def __init__(self, log: ReplayLog) -> None:
+        """
+        Initializes the ReplayBackend.
+
+        Args:
+            log (ReplayLog): The recorded game.
+        """
+        self.log = log
+        self.model_name = log.model_name
+
+    def generate(self, messages: List[dict], max_new_tokens: int, json_schema: Optional[dict] = None) -> str:
+        return self.log.llm_response(messages)
+
+
+_RECORDER: Optional[GameRecorder] = None
+_REPLAY: Optional[ReplayLog] = None
+
+
+def set_recorder(recorder: Optional[GameRecorder]) -> None:
+    """
+    Sets the recorder every EasyLLM, EasyRAG and Umpire records to. None stops recording.
+
+    Args:
+        recorder (GameRecorder): The recorder.
+    """
+    global _RECORDER
+    _RECORDER = recorder
+
+
+def get_recorder() -> Optional[GameRecorder]:
+    """
+    Returns the active recorder, if any.
+    """
+    return _RECORDER
+
+
+def set_replay(log: Optional[ReplayLog]) -> None:
+    """
+    Sets the recorded game EasyRAG and Umpire replay from. None stops replaying.
+
+    Args:
+        log (ReplayLog): The recorded game.
+    """
+    global _REPLAY
+    _REPLAY = log
+
+
+def get_replay() -> Optional[ReplayLog]:
+    """
+    Returns the recorded game being replayed, if any.
+    """
+    return _REPLAY
+
+
+@contextlib.contextmanager
+def recording(path: str) -> Iterator[GameRecorder]:
+    """
+    Records every game built and run inside the block to a log.
+
+    Args:
+        path (str): Path of the log file.
+
+    Yields:
+        GameRecorder: The recorder.
+    """
+    recorder = GameRecorder(path)
+    previous = get_recorder()
+    set_recorder(recorder)
+    try:
+        yield recorder
+    finally:
+        set_recorder(previous)
+        recorder.close()
+
+
+@contextlib.contextmanager
+def replaying(path: str) -> Iterator[ReplayLog]:
+    """
+    Replays a recorded game: games built and run inside the block get the recorded model answers, seeds and deck,
+    and no model is loaded.
+
+    Args:
+        path (str): Path of a log written by GameRecorder.
+
+    Yields:
+        ReplayLog: The recorded game.
+    """
+    log = ReplayLog(path)
+    previous_backend = get_default_backend()
+    previous_replay = get_replay()
+    set_default_backend(log.backend)
+    set_replay(log)
+    try:
+        yield log
+    finally:
+        set_default_backend(previous_backend)
+        set_replay(previous_replay)
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from WargamesAI.utils.rag_index import normalize_rows
+
+# Default location of the cache database
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "wargamesai", "responses.sqlite")
+
+# Bump when the key or storage format changes so stale entries are not reused
+CACHE_FORMAT_VERSION = 2
+
+# Near-duplicate thresholds by schema name. Actions, follow-on turns and verdicts depend on the exact wording of
+# the activity or action they answer, so they are only served on exact hits.
+DEFAULT_SCHEMA_THRESHOLDS: Dict[str, Optional[float]] = {
+    "ActionResponse": None,
+    "Turn": None,
+    "Verdict": None,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    partition TEXT NOT NULL,
+    query TEXT NOT NULL,
+    embedding BLOB,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_partition ON responses (partition);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def _digest(value: Any) -> str:
+    """Returns the sha256 hex digest of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    A persistent cache of model responses, stored in a local SQLite database.
+
+    Responses are grouped into partitions by everything that affects the answer apart from the question itself: the
+    model, the schema, the sampling parameters and the answering context, e.g. the rules and bio primer and a digest
+    of the game state. Within a partition a question is first looked up by its exact hash, then, for schemas that
+    allow it, by the cosine similarity of its embedding to the questions already answered, so near-identical
+    questions (e.g. dice rolls for slightly different activities) are answered from the cache.
+    The least recently used responses are evicted when the database grows past its size limit.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        similarity_threshold: Optional[float] = 0.95,
+        max_bytes: int = 64 * 1024 * 1024,
+        embedding_model_name: str = "all-MiniLM-L6-v2",
+        embed: Optional[Callable[[List[str]], np.ndarray]] = None,
+        schema_thresholds: Optional[Dict[str, Optional[float]]] = None,
+    ) -> None:
+        """
+        Initializes the ResponseCache.
+
+        Args:
+            path (str): Path of the SQLite database, or ":memory:". Defaults to DEFAULT_CACHE_PATH.
+            similarity_threshold (float): Minimum cosine similarity for a near-duplicate hit. If None, only exact
+                hits are served and questions are never embedded.
+            max_bytes (int): Size of the stored responses, questions and embeddings above which entries are evicted.
+            embedding_model_name (str): Name of the sentence embedding model used for similarity lookups.
+            embed (Callable): Function embedding a list of texts, overriding the embedding model.
+            schema_thresholds (dict): Near-duplicate thresholds by schema name, overriding similarity_threshold;
+                None disables near-duplicate hits for that schema. Defaults to DEFAULT_SCHEMA_THRESHOLDS.
+        """
+        self.path = path or DEFAULT_CACHE_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.similarity_threshold = similarity_threshold
+        self.schema_thresholds = dict(DEFAULT_SCHEMA_THRESHOLDS if schema_thresholds is None else schema_thresholds)
+        self.max_bytes = max_bytes
+        self.embedding_model_name = embedding_model_name
+        self._embed = embed
+
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # Normalized question embeddings of each partition, loaded on first lookup
+        self._partitions: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def partition_key(model_name: str, schema: Optional[str], sampling: Dict[str, Any], context: List[dict]) -> str:
+        """
+        Builds the partition a question is cached under.
+
+        Args:
+            model_name (str): Name of the model answering.
+            schema (str): The schema the answer follows, if any.
+            sampling (dict): The sampling parameters, e.g. max_new_tokens.
+            context (List[dict]): What the answer depends on besides the question, e.g. the primer messages.
+
+        Returns:
+            str: The partition key.
+        """
+        return _digest([CACHE_FORMAT_VERSION, model_name, schema, sampling, context])
+
+    def threshold_for(self, schema: Optional[str]) -> Optional[float]:
+        """
+        Returns the near-duplicate threshold for answers following a schema.
+
+        Args:
+            schema (str): Name of the schema, e.g. "ActionResponse", or None for free-text answers.
+
+        Returns:
+            Optional[float]: The minimum cosine similarity, or None if only exact hits are served.
+        """
+        return self.schema_thresholds.get(schema, self.similarity_threshold)
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        if self._embed is None:
+            from WargamesAI.utils.easyRAG import EasyRAG
+
+            self._embed = EasyRAG(embedding_model_name=self.embedding_model_name)._encode_queries
+        return normalize_rows(self._embed(texts))
+
+    def _partition_embeddings(self, partition: str) -> Tuple[List[str], np.ndarray]:
+        loaded = self._partitions.get(partition)
+        if loaded is None:
+            rows = self._connection.execute(
+                "SELECT key, embedding FROM responses WHERE partition = ? AND embedding IS NOT NULL", (partition,)
+            ).fetchall()
+            keys = [key for key, _ in rows]
+            embeddings = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]) if rows else None
+            loaded = self._partitions[partition] = (keys, embeddings)
+        return loaded
+
+    def get(self, partition: str, query: str, schema: Optional[str] = None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Looks up the response to a question.
+
+        Args:
+            partition (str): The partition key from partition_key().
+            query (str): The question.
+            schema (str): Name of the schema the answer follows, which sets the near-duplicate threshold.
+
+        Returns:
+            Tuple[Optional[str], Optional[np.ndarray]]: The cached response, or None on a miss, and the question's
+                embedding if one was computed, to be passed on to put().
+        """
+        key = _digest([partition, query])
+        with self._lock:
+            row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                self._touch(key)
+                return row[0], None
+
+        threshold = self.threshold_for(schema)
+        if threshold is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        embedding = self._embed_texts([query])[0]
+        with self._lock:
+            keys, embeddings = self._partition_embeddings(partition)
+            if embeddings is not None:
+                similarities = embeddings @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= threshold:
+                    row = self._connection.execute(
+                        "SELECT response FROM responses WHERE key = ?", (keys[best],)
+                    ).fetchone()
+                    if row is not None:
+                        self.similar_hits += 1
+                        self._touch(keys[best])
+                        return row[0], embedding
+            self.misses += 1
+        return None, embedding
+
+    def _touch(self, key: str) -> None:
+        self._connection.execute(
+            "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+        )
+        self._connection.commit()
+
+    def put(
+        self,
+        partition: str,
+        query: str,
+        response: str,
+        embedding: Optional[np.ndarray] = None,
+        schema: Optional[str] = None,
+    ) -> None:
+        """
+        Stores the response to a question.
+
+        Args:
+            partition (str): The partition key from partition_key().
+            query (str): The question.
+            response (str): The model's raw response.
+            embedding (np.ndarray): The question's embedding returned by get(), if any.
+            schema (str): Name of the schema the answer follows. Questions are only embedded for schemas with a
+                near-duplicate threshold.
+        """
+        if embedding is None and self.threshold_for(schema) is not None:
+            embedding = self._embed_texts([query])[0]
+        blob = None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+        size = len(query.encode("utf-8")) + len(response.encode("utf-8")) + (len(blob) if blob else 0)
+        key = _digest([partition, query])
+        now = time.time()
+
+        with self._lock:
+            previous = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, partition, query, embedding, response, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, partition, query, blob, response, size, now, now),
+            )
+            self._connection.commit()
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._partitions.pop(partition, None)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used entries until the cache is below 90% of its size limit.
+        """
+        target = self.max_bytes * 0.9
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._connection.commit()
+        self._partitions.clear()
+
+    def clear(self) -> None:
+        """
+        Removes every cached response.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self._total_bytes = 0
+            self._partitions.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """Returns the fraction of lookups answered from the cache."""
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the lookups served by this cache and the size of the database.
+
+        Returns:
+            dict: Exact and similar hits, misses, hit rate, number of entries and stored bytes.
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
+    def __str__(self) -> str:
+        stats = self.stats()
+        return (
+            f"Response cache: {stats['hit_rate']:.1%} hit rate ({stats['exact_hits']} exact, {stats['similar_hits']} "
+            f"similar, {stats['misses']} misses), {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB"
+        )
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+
+_CACHES: Dict[Optional[str], ResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_response_cache(path: Optional[str] = None, **kwargs: Any) -> ResponseCache:
+    """
+    Returns the process-wide ResponseCache for a database path, so every EasyLLM instance shares it.
+
+    Args:
+        path (str): Path of the SQLite database. Defaults to DEFAULT_CACHE_PATH.
+        **kwargs: Arguments for the ResponseCache if it is created.
+
+    Returns:
+        ResponseCache: The shared cache.
+    """
+    with _CACHES_LOCK:
+        if path not in _CACHES:
+            _CACHES[path] = ResponseCache(path, **kwargs)
+        return _CACHES[path]
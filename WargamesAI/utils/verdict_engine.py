@@ -0,0 +1,339 @@
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from WargamesAI.utils.llm_backends import BackendError
+from WargamesAI.utils.replay import get_recorder, get_replay
+
+# Natural language inference cross-encoder used to score actions against rule or bio chunks
+DEFAULT_NLI_MODEL = "cross-encoder/nli-deberta-v3-xsmall"
+
+# Rules and bio lines, each with an action they allow and one they forbid, for fitting the Platt scaling when no
+# calibration is given
+_RULE_CASES = [
+    ("Units may move at most one hex per turn.",
+     "move the infantry one hex north", "move the infantry five hexes across the map in one turn"),
+    ("Only the Umpire may authorise the use of nuclear weapons.",
+     "ask the Umpire for permission to raise the alert level", "launch a nuclear strike without consulting the Umpire"),
+    ("Each team may send one diplomatic message to another team per round.",
+     "send a message to the other team proposing talks", "send ten messages to every team this round"),
+    ("Players may not spend resources they do not have.",
+     "spend two of the team's five supply points on fuel", "spend twenty supply points although the team has none"),
+    ("Naval units cannot enter land hexes.",
+     "sail the fleet into the harbour", "sail the fleet inland to capture the capital"),
+    ("Players act only during their own team's turn.",
+     "wait for our turn before deploying the reserve", "deploy the reserve during the enemy team's turn"),
+]
+_BIO_CASES = [
+    ("The minister is cautious and always seeks a diplomatic solution before using force.",
+     "open negotiations with the rival power", "order an immediate surprise invasion without any talks"),
+    ("The general is loyal to the alliance and never betrays its allies.",
+     "reinforce the allied border with troops", "secretly sell the allies' battle plans to the enemy"),
+]
+# Labelled (evidence, claim, allowed) examples, phrased like the claims the umpire and agents check
+CALIBRATION_EXAMPLES: List[Tuple[str, str, bool]] = [
+    (evidence, f"{subject} does the following: {action}", allowed)
+    for subject, cases in (("A player", _RULE_CASES), ("This person", _BIO_CASES))
+    for evidence, legal, illegal in cases
+    for action, allowed in ((legal, True), (illegal, False))
+]
+_DEFAULT_CALIBRATIONS: Dict[str, Tuple[float, float]] = {}
+_CALIBRATION_LOCK = threading.Lock()
+
+
+def describe_action(action: Any, rationale: bool = True, targets: bool = False, max_chars: Optional[int] = None) -> str:
+    """
+    Renders an action as text, e.g. a sentence for scoring or a one-line entry in a round digest.
+
+    Args:
+        action: The action, usually an ActionResponse dictionary or a human player's text.
+        rationale (bool): Whether to add the action's rationale.
+        targets (bool): Whether to add the action's targets.
+        max_chars (int): If given, the text is put on one line and cut to at most this many characters.
+
+    Returns:
+        str: The description.
+    """
+    if isinstance(action, dict):
+        text = str(action.get("ACTION", action.get("RESPONSE", action)))
+        named = action.get("TARGETS")
+        if targets and named:
+            text += f" (targets: {', '.join(map(str, named)) if isinstance(named, list) else named})"
+        if rationale and action.get("RATIONALE"):
+            text += f" because {action['RATIONALE']}"
+    else:
+        text = str(action)
+    if max_chars is None:
+        return text
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+class Verdict:
+    """
+    The outcome of a check: the probability that the action is allowed (legal, or in character), and whether an LLM
+    was asked because the classifier was unsure. Its truth value is whether the action is allowed.
+    """
+
+    def __init__(self, probability: float, escalated: bool = False, evidence: Optional[list] = None) -> None:
+        """
+        Initializes the Verdict.
+
+        Args:
+            probability (float): Probability that the action is allowed.
+            escalated (bool): Whether the verdict came from the LLM.
+            evidence (list): The rule or bio chunks the action was scored against.
+        """
+        self.probability = probability
+        self.escalated = escalated
+        self.evidence = evidence or []
+
+    @property
+    def allowed(self) -> bool:
+        """Returns whether the action is allowed."""
+        return self.probability >= 0.5
+
+    def __bool__(self) -> bool:
+        return self.allowed
+
+    def __repr__(self) -> str:
+        source = "llm" if self.escalated else "classifier"
+        return f"Verdict(allowed={self.allowed}, probability={self.probability:.3f}, source={source})"
+
+
+class VerdictEngine:
+    """
+    Decides whether actions are legal under the game rules, or in character for a player's bio, without generating
+    free text.
+
+    The chunks of the rules or bio most relevant to the action are retrieved with EasyRAG, and each is scored against
+    the action with a natural language inference cross-encoder. The action is allowed unless some chunk contradicts
+    it: the raw probability is one minus the strongest contradiction, mapped through Platt scaling fitted to labelled
+    examples. Unless a calibration is given, it is fitted on CALIBRATION_EXAMPLES the first time it is needed, once
+    per NLI model, and can be refitted on game-specific examples with fit_calibration(). Only when the calibrated
+    probability falls inside the uncertainty band is the LLM asked to decide.
+    """
+
+    def __init__(
+        self,
+        rag: Any,
+        llm: Any = None,
+        top_k: int = 3,
+        uncertainty_band: Tuple[float, float] = (0.3, 0.7),
+        calibration: Optional[Tuple[float, float]] = None,
+        nli_model_name: str = DEFAULT_NLI_MODEL,
+        score_pairs: Optional[Callable[[List[Tuple[str, str]]], np.ndarray]] = None,
+    ) -> None:
+        """
+        Initializes the VerdictEngine.
+
+        Args:
+            rag (EasyRAG): Retrieves the chunks an action is scored against and provides the device.
+            llm (EasyLLM): Model asked when the classifier is unsure. If None, the classifier always decides.
+            top_k (int): Number of chunks an action is scored against.
+            uncertainty_band (Tuple[float, float]): Probabilities strictly between these bounds are escalated.
+            calibration (Tuple[float, float]): Platt scaling slope and intercept applied to the raw log-odds, e.g. from
+                fit_calibration() on another engine. If None, it is fitted on CALIBRATION_EXAMPLES on first use.
+            nli_model_name (str): Name of the cross-encoder NLI model.
+            score_pairs (Callable): Function returning the contradiction probability of (premise, hypothesis) pairs,
+                overriding the cross-encoder.
+        """
+        self.rag = rag
+        self.llm = llm
+        self.top_k = top_k
+        self.uncertainty_band = uncertainty_band
+        self.calibration = calibration
+        self.nli_model_name = nli_model_name
+        self._score_pairs = score_pairs
+        self._lock = threading.Lock()
+        self.judged = 0
+        self.escalated = 0
+
+    def _load_nli_model(self) -> Any:
+        from sentence_transformers import CrossEncoder
+
+        return CrossEncoder(self.nli_model_name, device=self.rag.device)
+
+    def contradiction_probabilities(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """
+        Scores (premise, hypothesis) pairs with the cross-encoder.
+
+        Args:
+            pairs (List[Tuple[str, str]]): The pairs, e.g. (rule chunk, action).
+
+        Returns:
+            np.ndarray: The probability that each premise contradicts its hypothesis.
+        """
+        if self._score_pairs is not None:
+            return np.asarray(self._score_pairs(pairs), dtype=np.float64)
+
+        from WargamesAI.utils.easyRAG import get_shared_model, get_shared_model_lock
+
+        model = get_shared_model("nli", self.nli_model_name, self.rag.device, self._load_nli_model)
+        with get_shared_model_lock("nli", self.nli_model_name, self.rag.device):
+            logits = np.asarray(model.predict(pairs), dtype=np.float64).reshape(len(pairs), -1)
+
+        labels = getattr(getattr(model, "config", None), "id2label", None) or {0: "contradiction"}
+        column = next((int(i) for i, label in labels.items() if "contradiction" in str(label).lower()), 0)
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities[:, column]
+
+    def raw_probability(self, claim: str, evidence: List[str]) -> float:
+        """
+        Returns the uncalibrated probability that no evidence chunk contradicts a claim.
+
+        Args:
+            claim (str): The statement being checked.
+            evidence (List[str]): The rule or bio chunks.
+
+        Returns:
+            float: The probability. With no evidence nothing contradicts the claim, so it is 1.
+        """
+        if not evidence:
+            return 1.0
+        return float(1.0 - self.contradiction_probabilities([(chunk, claim) for chunk in evidence]).max())
+
+    def _default_calibration(self) -> Tuple[float, float]:
+        """
+        Fits the Platt scaling on CALIBRATION_EXAMPLES. The fit for the cross-encoder is shared by every engine
+        using the same NLI model.
+
+        Returns:
+            Tuple[float, float]: The slope and intercept.
+        """
+        with _CALIBRATION_LOCK:
+            if self._score_pairs is None and self.nli_model_name in _DEFAULT_CALIBRATIONS:
+                return _DEFAULT_CALIBRATIONS[self.nli_model_name]
+            raw = [self.raw_probability(claim, [evidence]) for evidence, claim, _ in CALIBRATION_EXAMPLES]
+            calibration = self.fit_calibration(raw, [allowed for _, _, allowed in CALIBRATION_EXAMPLES])
+            if self._score_pairs is None:
+                _DEFAULT_CALIBRATIONS[self.nli_model_name] = calibration
+            return calibration
+
+    def calibrate(self, probability: float) -> float:
+        """
+        Applies Platt scaling to a raw probability, fitting the default calibration first if none was given.
+
+        Args:
+            probability (float): The raw probability.
+
+        Returns:
+            float: The calibrated probability.
+        """
+        if self.calibration is None:
+            self.calibration = self._default_calibration()
+        slope, intercept = self.calibration
+        probability = min(max(probability, 1e-6), 1 - 1e-6)
+        logit = math.log(probability / (1 - probability))
+        return 1.0 / (1.0 + math.exp(-(slope * logit + intercept)))
+
+    def fit_calibration(self, raw_probabilities: List[float], labels: List[bool], iterations: int = 50) -> Tuple[float, float]:
+        """
+        Fits the Platt scaling to labelled examples with Newton's method.
+
+        Args:
+            raw_probabilities (List[float]): Raw probabilities from raw_probability().
+            labels (List[bool]): Whether each action was in fact allowed.
+            iterations (int): Number of Newton steps.
+
+        Returns:
+            Tuple[float, float]: The fitted slope and intercept, which are also applied to this engine.
+        """
+        p = np.clip(np.asarray(raw_probabilities, dtype=np.float64), 1e-6, 1 - 1e-6)
+        features = np.stack([np.log(p / (1 - p)), np.ones_like(p)], axis=1)
+        targets = np.asarray(labels, dtype=np.float64)
+        weights = np.array([1.0, 0.0])
+        for _ in range(iterations):
+            predictions = 1.0 / (1.0 + np.exp(-features @ weights))
+            gradient = features.T @ (predictions - targets)
+            # A small ridge term keeps the Hessian invertible on separable data
+            hessian = features.T @ (features * (predictions * (1 - predictions))[:, None]) + 1e-3 * np.eye(2)
+            weights -= np.linalg.solve(hessian, gradient)
+        self.calibration = (float(weights[0]), float(weights[1]))
+        return self.calibration
+
+    def _ask_llm(self, question: str, evidence: List[str]) -> Optional[bool]:
+        """
+        Asks the LLM to decide, with the evidence chunks in the prompt. The LLM's own dialogue is left untouched.
+
+        Returns:
+            Optional[bool]: The LLM's verdict, or None if the request failed or its answer could not be read.
+        """
+        from WargamesAI.utils import json_schemas
+
+        context = "\n".join(f"- {chunk}" for chunk in evidence)
+        prompt = self.llm.generate_json_prompt(json_schemas.VerdictModel, f"Relevant text:\n{context}\n\n{question}")
+        try:
+            answer = self.llm.ask_questions_batch([prompt])[0]
+        except ValueError as e:
+            print(f"Could not read the LLM verdict: {e}")
+            return None
+        except BackendError as e:
+            print(f"The LLM verdict failed, keeping the classifier's: {e}")
+            return None
+        verdict = str(answer.get("VERDICT", "") if isinstance(answer, dict) else answer).strip().lower()
+        if verdict.startswith(("true", "yes")):
+            return True
+        if verdict.startswith(("false", "no")):
+            return False
+        return None
+
+    def judge(self, claim: str, pdf_path: str, question: Optional[str] = None, kind: str = "verdict") -> Verdict:
+        """
+        Decides whether a claimed action is allowed by a document.
+
+        Args:
+            claim (str): The action as a statement, e.g. "A player does the following: ...".
+            pdf_path (str): The rules or bio PDF.
+            question (str): The yes/no question asked to the LLM on escalation. Defaults to the claim.
+            kind (str): What is being checked, e.g. "legality", used when recording and replaying games.
+
+        Returns:
+            Verdict: The verdict.
+        """
+        replay = get_replay()
+        if replay is not None:
+            probability, escalated = replay.verdict(kind, claim)
+            return Verdict(probability, escalated=escalated)
+
+        evidence = self.rag.retrieve_from_pdf_batch([claim], pdf_path, top_k=self.top_k)[0]
+        escalated = False
+
+        # With nothing retrieved there is nothing to contradict the action, or for the LLM to judge it against
+        if not evidence:
+            probability = 1.0
+        else:
+            probability = self.calibrate(self.raw_probability(claim, evidence))
+
+        low, high = self.uncertainty_band
+        if self.llm is not None and evidence and low < probability < high:
+            decision = self._ask_llm(question or claim, evidence)
+            if decision is not None:
+                probability = 1.0 if decision else 0.0
+                escalated = True
+
+        with self._lock:
+            self.judged += 1
+            self.escalated += escalated
+
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.record_verdict(kind, claim, probability, escalated)
+        return Verdict(probability, escalated=escalated, evidence=evidence)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns how many checks were made and how many were escalated to the LLM.
+
+        Returns:
+            dict: Judged and escalated counts and the escalation rate.
+        """
+        with self._lock:
+            return {
+                "judged": self.judged,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.judged if self.judged else 0.0,
+            }
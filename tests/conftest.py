@@ -0,0 +1,111 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from stand_in_server import StandInChatServer
+from WargamesAI.utils.easyRAG import EasyRAG
+from WargamesAI.utils.llm_backends import LLMBackend, get_default_backend, set_default_backend
+from WargamesAI.utils.verdict_engine import CALIBRATION_EXAMPLES, VerdictEngine
+
+# Claims the calibration examples forbid, which the stand-in classifier scores as contradicted
+FORBIDDEN_CLAIMS = {claim for _, claim, allowed in CALIBRATION_EXAMPLES if not allowed}
+
+
+class FailAfter(Exception):
+    """
+    Raised by FakeBackend once it has answered its allowance of questions, to interrupt a game.
+    """
+
+
+class FakeBackend(LLMBackend):
+    """
+    A backend answering each schema the umpire and agents ask for with a plausible answer. Answers depend only on the
+    question and the dialogue length, so runs are reproducible; with random_actions the actions come from the global
+    random module instead.
+    """
+
+    model_name = "fake"
+
+    def __init__(self, fail_after: int = None, random_actions: bool = False) -> None:
+        self.questions = []
+        self.fail_after = fail_after
+        self.random_actions = random_actions
+
+    def generate(self, messages, max_new_tokens, json_schema=None):
+        question = str(messages[-1]["content"])
+        self.questions.append(question)
+        if self.fail_after is not None and len(self.questions) > self.fail_after:
+            raise FailAfter()
+        if "WINNING" in question:
+            return json.dumps({"WINNING_TEAN": "A", "WINNING_PLAYER": "None"})
+        if "ACTION" in question and "RATIONALE" in question:
+            number = random.randint(0, 99) if self.random_actions else len(messages) % 5
+            return json.dumps({"ACTION": f"act {number}", "RATIONALE": "r", "TARGETS": "Someone"})
+        if "ITEM" in question:
+            return json.dumps([{"ITEM": "DICE", "ACTION": "2d6"}])
+        if "VERDICT" in question:
+            return json.dumps({"VERDICT": "True", "REASON": "r"})
+        return '{"RESPONSE": "ok"}'
+
+
+@pytest.fixture
+def chat_server():
+    server = StandInChatServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def fake_backend():
+    """
+    Installs a FakeBackend as the default backend for the test.
+    """
+    previous = get_default_backend()
+    backend = FakeBackend()
+    set_default_backend(backend)
+    yield backend
+    set_default_backend(previous)
+
+
+@pytest.fixture
+def offline_retrieval(monkeypatch):
+    """
+    Replaces retrieval and the NLI classifier, so games can run without embedding or NLI models.
+    """
+    monkeypatch.setattr(
+        EasyRAG, "retrieve_from_pdf_batch", lambda self, queries, pdf_path, top_k=5: [["Units move one hex."] for _ in queries]
+    )
+    monkeypatch.setattr(
+        VerdictEngine,
+        "contradiction_probabilities",
+        lambda self, pairs: np.array([0.9 if claim in FORBIDDEN_CLAIMS else 0.05 for _, claim in pairs]),
+    )
+
+
+@pytest.fixture
+def build_game(tmp_path, offline_retrieval):
+    """
+    Returns a builder of a two-team game with dice and cards, whose PDFs are written under the test's directory.
+    """
+    from WargamesAI.agents import Agent
+    from WargamesAI.coordination import Game, Umpire
+
+    def build(seed=7, rounds=3):
+        turns = [{"TEAM": team, "PLAYER": player, "ACTIVITY": "do"} for team, player in (("A", "1"), ("B", "2"), ("B", "Umpire"))]
+        game = Game(
+            rounds=[list(turns) for _ in range(rounds)],
+            use_dice=True,
+            cards=["c1", "c2", "c3"],
+            game_rules_text="Simple rules.",
+            rules_folder=str(tmp_path / "rules"),
+        )
+        agents = {
+            name: Agent(game, deployment_directive=f"player {name}", bio_folder=str(tmp_path / "bios")) for name in "12"
+        }
+        game.add_team("A", [{"1": agents["1"]}])
+        game.add_team("B", [{"2": agents["2"]}])
+        return game, Umpire(game, seed=seed)
+
+    return build
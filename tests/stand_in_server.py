@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List
+
+
+class StandInChatServer:
+    """
+    A local stand-in for an OpenAI-compatible chat completions server, for testing OpenAIHTTPBackend without a model.
+    Every answer echoes the last message. Failures can be queued to exercise retries, and the connections and peak
+    number of in-flight requests are counted to check keep-alive reuse and batching.
+    """
+
+    def __init__(self, latency: float = 0.05) -> None:
+        """
+        Initializes the StandInChatServer and starts serving on a free local port.
+
+        Args:
+            latency (float): Seconds each answer takes, so concurrent requests overlap.
+        """
+        self.latency = latency
+        self.requests = 0
+        self.connections = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.payloads: List[dict] = []
+        self._failures: List[int] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests += 1
+                    server.payloads.append(payload)
+                    server.connections.add(self.client_address)
+                    status = server._failures.pop(0) if server._failures else 200
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                time.sleep(server.latency)
+                with server._lock:
+                    server.in_flight -= 1
+
+                if status == 200:
+                    content = f"echo: {payload['messages'][-1]['content']}"
+                    body = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]})
+                else:
+                    body = json.dumps({"error": {"code": status}})
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self) -> str:
+        """Returns the API base URL to give OpenAIHTTPBackend."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def fail_next(self, *statuses: int) -> None:
+        """
+        Answers the next requests with these HTTP error statuses, in order.
+
+        Args:
+            *statuses (int): The statuses, e.g. 429 or 503.
+        """
+        with self._lock:
+            self._failures.extend(statuses)
+
+    def close(self) -> None:
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
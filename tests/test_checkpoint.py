@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from conftest import FailAfter, FakeBackend
+from WargamesAI.coordination import GameRunner
+from WargamesAI.coordination.checkpoint import read_checkpoint, write_checkpoint
+from WargamesAI.utils.llm_backends import get_default_backend, set_default_backend
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    previous = get_default_backend()
+    yield
+    set_default_backend(previous)
+
+
+def fingerprint(game, umpire):
+    agents = [agent for actors in game._teams.values() for actor in actors for agent in actor.values()]
+    return json.dumps(
+        [
+            umpire.actions,
+            umpire._rng.random(),
+            umpire.llm.dialogue.to_state(),
+            umpire.get_game_status(),
+            [agent.llm.dialogue.to_state() for agent in agents],
+            game._cards,
+        ],
+        default=str,
+    )
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "game.ckpt.json.gz")
+    state = {"round_index": 2, "turns": [{"TEAM": "A", "ACTION": "act"}], "seed": None}
+
+    assert write_checkpoint(path, state) > 0
+    assert read_checkpoint(path) == state
+
+
+def test_checkpoint_version_is_checked(tmp_path):
+    import gzip
+
+    path = str(tmp_path / "old.ckpt.json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump({"version": 0, "state": {}}, file)
+    with pytest.raises(ValueError):
+        read_checkpoint(path)
+
+
+@pytest.mark.parametrize("every,fail_after", [("turn", 6), ("turn", 14), ("round", 9), ("round", 14)])
+def test_resumed_game_matches_an_uninterrupted_one(build_game, tmp_path, every, fail_after):
+    set_default_backend(FakeBackend())
+    game, umpire = build_game()
+    GameRunner(game, umpire).run_all_rounds()
+    expected = fingerprint(game, umpire)
+
+    path = str(tmp_path / f"{every}.ckpt.json.gz")
+    set_default_backend(FakeBackend(fail_after=fail_after))
+    game, umpire = build_game()
+    with pytest.raises(FailAfter):
+        GameRunner(game, umpire, checkpoint_path=path, checkpoint_every=every).run_all_rounds()
+
+    backend = FakeBackend()
+    set_default_backend(backend)
+    runner = GameRunner.resume(path, checkpoint_every=every)
+    runner.run_all_rounds()
+
+    assert fingerprint(runner.game, runner.umpire) == expected
+    # Restored agents and the umpire keep their dialogues, so they are not primed again
+    assert not any("Be ready to play" in question for question in backend.questions)
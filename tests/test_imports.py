@@ -0,0 +1,13 @@
+import pytest
+
+from WargamesAI.utils.benchmarks import measure_import_time
+
+# Cold-start budget for importing the package's public entry points
+IMPORT_BUDGET_SECONDS = 1.0
+
+
+@pytest.mark.parametrize("module", ["WargamesAI", "WargamesAI.coordination", "WargamesAI.agents.agent"])
+def test_imports_are_light(module):
+    result = measure_import_time(module, runs=3)
+    assert not result["heavy"], f"importing {module} eagerly imported {result['heavy']}"
+    assert result["median_s"] <= IMPORT_BUDGET_SECONDS
@@ -0,0 +1,70 @@
+import json
+import random
+
+import pytest
+
+from WargamesAI.coordination.umpire import Umpire
+from WargamesAI.utils import json_schemas
+from WargamesAI.utils.json_constraint import JsonGrammar, grammar_for_model
+
+# Answers to every schema the umpire and agents ask for, in the forms models give them
+SCHEMA_ANSWERS = {
+    "DefaultModel": ['{"RESPONSE": "True"}'],
+    "ActionResponseModel": [
+        '{"ACTION": "Advance", "RATIONALE": "Hold the bridge", "TARGETS": "Umpire"}',
+        '{\n  "ACTION": "Advance",\n  "RATIONALE": "Hold the bridge",\n  "TARGETS": ["Red", "Umpire"]\n}',
+    ],
+    "SystemUseModel": [
+        '[{"ITEM": "DICE", "ACTION": "2d6"}]',
+        '[{"ITEM": "CARD", "ACTION": "1"}, {"ITEM": "DICE", "ACTION": "1d4"}]',
+    ],
+    "TurnModel": ['{"TEAM": "None", "PLAYER": "Umpire", "ACTIVITY": "Brief the Red team"}'],
+    "WinModel": ['{"WINNING_TEAN": "Blue", "WINNING_PLAYER": "None"}'],
+    "VerdictModel": ['{"VERDICT": "True", "REASON": "The move follows the rules."}'],
+}
+
+
+def decode(grammar, answer, rng):
+    """
+    Steps an answer through a grammar a few characters per token, as a tokenizer would split it.
+    """
+    state = grammar.initial_state
+    position = 0
+    while position < len(answer):
+        assert not JsonGrammar.is_complete(state), f"the grammar ended '{answer}' early at {position}"
+        token = answer[position:position + rng.randint(1, 4)]
+        state = JsonGrammar.step(state, token)
+        assert state is not None, f"the grammar rejected '{answer}' at {position}"
+        position += len(token)
+    return state
+
+
+@pytest.mark.parametrize(
+    "name,answer", [(name, answer) for name, answers in SCHEMA_ANSWERS.items() for answer in answers]
+)
+def test_schema_answers_decode_and_validate(name, answer):
+    model = json_schemas.get_model(name)
+    state = decode(grammar_for_model(model), answer, random.Random(0))
+
+    assert JsonGrammar.is_complete(state)
+    model.model_validate(json.loads(answer))
+
+
+def test_umpire_reads_constrained_system_use():
+    for answer in SCHEMA_ANSWERS["SystemUseModel"]:
+        assert Umpire._system_use(json.loads(answer))["ITEM"] in ("DICE", "CARD")
+
+
+def test_action_targets_accept_a_name_or_a_list():
+    for answer in SCHEMA_ANSWERS["ActionResponseModel"]:
+        assert "Umpire" in json.loads(answer)["TARGETS"]
+
+
+def test_grammar_rejects_a_missing_key():
+    grammar = grammar_for_model(json_schemas.get_model("VerdictModel"))
+    state = grammar.initial_state
+    for character in '{"REASON": "x"}':
+        if state is None:
+            break
+        state = JsonGrammar.step(state, character)
+    assert state is None or not JsonGrammar.is_complete(state)
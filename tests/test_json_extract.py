@@ -0,0 +1,124 @@
+import json
+import random
+
+import pytest
+
+from WargamesAI.utils.benchmarks import MALFORMED_JSON_CORPUS
+from WargamesAI.utils import json_schemas
+from WargamesAI.utils.easyLLM import EasyLLM
+from WargamesAI.utils.json_extract import JsonExtractionError, JsonValidationError, extract_json
+from WargamesAI.utils.llm_backends import LLMBackend
+
+WORDS = ["Blue", "Red", "Umpire", "advance", "hold {the} line", "it's", "[sic]", "C:\\maps", "50%", 'say "go"']
+
+
+def render_sloppy_json(value, python_literals, single_quotes, trailing_commas):
+    """
+    Serializes a value the way a chat model might, optionally with Python literals, single-quoted strings and
+    trailing commas.
+    """
+    options = (python_literals, single_quotes, trailing_commas)
+    if isinstance(value, dict):
+        items = [
+            render_sloppy_json(key, *options) + ": " + render_sloppy_json(item, *options) for key, item in value.items()
+        ]
+        return "{" + ", ".join(items) + ("," if trailing_commas and items else "") + "}"
+    if isinstance(value, list):
+        items = [render_sloppy_json(item, *options) for item in value]
+        return "[" + ", ".join(items) + ("," if trailing_commas and items else "") + "]"
+    if python_literals and (value is None or isinstance(value, bool)):
+        return repr(value)
+    if single_quotes and isinstance(value, str) and "'" not in value and '"' not in value:
+        return "'" + json.dumps(value)[1:-1] + "'"
+    return json.dumps(value)
+
+
+def mangle(rng, value):
+    """
+    Renders a JSON value the way a chat model might: with prose, code fences, Python literals, single quotes or
+    trailing commas.
+    """
+    text = render_sloppy_json(value, rng.random() < 0.2, rng.random() < 0.2, rng.random() < 0.2)
+    if rng.random() < 0.3:
+        text = rng.choice(["```json\n{}\n```", "```\n{}\n```", "{}"]).format(text)
+    if rng.random() < 0.4:
+        text = rng.choice(["Here is my answer: ", "Sure!\n", "As the umpire, I rule: "]) + text
+    if rng.random() < 0.3:
+        text += rng.choice([" Hope this helps.", "\n\nNote: values are estimates.", " [end]"])
+    return text
+
+
+def random_answer(rng):
+    value = {
+        "ACTION": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6))),
+        "TARGETS": [rng.choice(WORDS) for _ in range(rng.randint(0, 3))],
+        "DONE": rng.choice([True, False, None]),
+    }
+    return [value] if rng.random() < 0.3 else value
+
+
+@pytest.mark.parametrize("text,expected", MALFORMED_JSON_CORPUS)
+def test_malformed_answers(text, expected):
+    assert extract_json(text) == expected
+
+
+def test_fuzzed_answers_are_recovered():
+    rng = random.Random(0)
+    for _ in range(2000):
+        value = random_answer(rng)
+        text = mangle(rng, value)
+        assert extract_json(text) == value, text
+
+
+def test_truncated_answers_never_raise_anything_else():
+    rng = random.Random(1)
+    for _ in range(500):
+        text = mangle(rng, random_answer(rng))
+        try:
+            extract_json(text[:rng.randrange(1, len(text))])
+        except JsonExtractionError:
+            pass
+
+
+def test_no_json_raises():
+    with pytest.raises(JsonExtractionError):
+        extract_json("I cannot answer that.")
+
+
+def test_unreadable_candidates_are_skipped_in_one_pass():
+    # Every nested "{" starts a candidate spanning the rest of the nest, so rescanning each would be quadratic
+    text = "{x " * 3000 + "}" * 3000 + ' {"RESPONSE": "Yes"}'
+    assert extract_json(text) == {"RESPONSE": "Yes"}
+
+
+def test_answers_not_matching_the_schema_fail_validation():
+    with pytest.raises(JsonValidationError) as raised:
+        extract_json('Example: {"TEAM": "Blue"}', json_schemas.VerdictModel)
+    assert raised.value.value == {"TEAM": "Blue"}
+    assert extract_json('{"TEAM": "Blue"} {"VERDICT": "True", "REASON": "r"}', json_schemas.VerdictModel)["VERDICT"]
+
+
+class ScriptedBackend(LLMBackend):
+    model_name = "scripted"
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def generate(self, messages, max_new_tokens, json_schema=None):
+        self.calls += 1
+        return self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+
+
+def test_invalid_answers_are_regenerated():
+    backend = ScriptedBackend(['{"TEAM": "Blue"}', '{"VERDICT": "False", "REASON": "r"}'])
+    llm = EasyLLM(backend=backend)
+    assert llm.ask_question(llm.generate_json_prompt(json_schemas.VerdictModel, "Is it legal?"))["VERDICT"] == "False"
+    assert backend.calls == 2
+
+
+def test_answers_still_invalid_after_the_retries_are_used_as_parsed():
+    backend = ScriptedBackend(['{"TEAM": "Blue"}'])
+    llm = EasyLLM(backend=backend, validation_retries=2)
+    assert llm.ask_question(llm.generate_json_prompt(json_schemas.VerdictModel, "Is it legal?")) == {"TEAM": "Blue"}
+    assert backend.calls == 3
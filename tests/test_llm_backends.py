@@ -0,0 +1,55 @@
+import pytest
+
+from WargamesAI.utils.llm_backends import BackendError, OpenAIHTTPBackend
+
+
+@pytest.fixture
+def backend(chat_server):
+    backend = OpenAIHTTPBackend(
+        chat_server.base_url, model_name="stand-in", max_connections=4, max_retries=3, backoff_factor=0.01
+    )
+    yield backend
+    backend.close()
+
+
+def test_normal_reply(backend, chat_server):
+    assert backend.generate([{"role": "user", "content": "hello"}], 16) == "echo: hello"
+    assert chat_server.payloads[0]["model"] == "stand-in"
+    assert chat_server.payloads[0]["max_tokens"] == 16
+
+
+def test_retries_after_429_and_5xx(backend, chat_server):
+    chat_server.fail_next(429, 503)
+    assert backend.generate([{"role": "user", "content": "retry"}], 16) == "echo: retry"
+    assert chat_server.requests == 3
+
+
+def test_gives_up_after_max_retries(backend, chat_server):
+    chat_server.fail_next(*[503] * 4)
+    with pytest.raises(BackendError):
+        backend.generate([{"role": "user", "content": "down"}], 16)
+    assert chat_server.requests == 4
+
+
+def test_client_errors_are_not_retried(backend, chat_server):
+    chat_server.fail_next(400)
+    with pytest.raises(BackendError):
+        backend.generate([{"role": "user", "content": "bad"}], 16)
+    assert chat_server.requests == 1
+
+
+def test_batch_runs_concurrently_over_reused_connections(backend, chat_server):
+    questions = [f"question {i}" for i in range(8)]
+    answers = backend.generate_batch([[{"role": "user", "content": q}] for q in questions], 16)
+
+    assert answers == [f"echo: {q}" for q in questions]
+    assert chat_server.peak_in_flight > 1
+    assert len(chat_server.connections) <= 4
+
+    backend.generate([{"role": "user", "content": "again"}], 16)
+    assert len(chat_server.connections) <= 4
+
+
+def test_seed_is_sent(backend, chat_server):
+    backend.generate([{"role": "user", "content": "seeded"}], 16, seed=7)
+    assert chat_server.payloads[0]["seed"] == 7
@@ -0,0 +1,36 @@
+import json
+import random
+
+from conftest import FakeBackend
+from WargamesAI.coordination import GameRunner
+from WargamesAI.utils.llm_backends import get_default_backend, set_default_backend
+from WargamesAI.utils.replay import recording, replaying
+
+
+def test_replayed_game_matches_the_recording_without_models(build_game, tmp_path):
+    path = str(tmp_path / "game.jsonl.gz")
+    previous = get_default_backend()
+    backend = FakeBackend(random_actions=True)
+    set_default_backend(backend)
+    try:
+        random.seed(0)
+        with recording(path) as recorder:
+            game, umpire = build_game()
+            recorded = GameRunner(game, umpire).run_all_rounds()
+            recorded_winner = umpire.deduce_winner()
+        assert recorder.events > 0
+        asked = len(backend.questions)
+
+        # Different global randomness must not matter: every answer, roll and draw comes from the log
+        random.seed(1)
+        with replaying(path) as log:
+            game, umpire = build_game()
+            replayed = GameRunner(game, umpire).run_all_rounds()
+            replayed_winner = umpire.deduce_winner()
+    finally:
+        set_default_backend(previous)
+
+    assert json.dumps(replayed, default=str) == json.dumps(recorded, default=str)
+    assert replayed_winner == recorded_winner
+    assert log.divergences == 0
+    assert len(backend.questions) == asked
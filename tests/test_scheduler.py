@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from WargamesAI.coordination.scheduler import TurnScheduler, serialized
+
+TEAMS = {"A": [{"1": None}, {"3": None}], "B": [{"2": None}, {"4": None}]}
+
+
+def turn(team, player, **extra):
+    return {"TEAM": team, "PLAYER": player, "ACTIVITY": "do", **extra}
+
+
+def test_turns_of_one_team_keep_their_order():
+    turns = [turn("A", "1"), turn("B", "2"), turn("A", "3"), turn("B", "4")]
+    assert TurnScheduler(teams=TEAMS).build_dependencies(turns) == [set(), set(), {0}, {1}]
+
+
+def test_players_are_independent_without_team_serialisation():
+    turns = [turn("A", "1"), turn("A", "3")]
+    assert TurnScheduler(teams=TEAMS, serialize_teams=False).build_dependencies(turns) == [set(), set()]
+
+
+def test_targets_and_depends_on_add_edges():
+    turns = [turn("A", "1"), turn("B", "2", TARGETS=["1"]), turn("B", "4", DEPENDS_ON=[0])]
+    assert TurnScheduler(teams=TEAMS, serialize_teams=False).build_dependencies(turns) == [set(), {0}, {0}]
+
+
+def test_umpire_turns_are_barriers():
+    turns = [turn("A", "1"), turn("None", "Umpire"), turn("B", "2")]
+    # Turn 2 waits for turn 0 through the umpire's turn
+    assert TurnScheduler(teams=TEAMS).build_dependencies(turns) == [set(), {0}, {1}]
+
+
+def test_depending_on_a_later_turn_is_rejected():
+    with pytest.raises(ValueError):
+        TurnScheduler(teams=TEAMS).build_dependencies([turn("A", "1", DEPENDS_ON=[1]), turn("B", "2")])
+
+
+def test_round_runs_independent_turns_concurrently_in_order():
+    turns = [turn("A", "1"), turn("B", "2"), turn("A", "3"), turn("B", "4")]
+    finished = []
+
+    async def engage(current):
+        await asyncio.sleep(0.05)
+        finished.append(current["PLAYER"])
+        return current["PLAYER"]
+
+    responses, report = asyncio.run(TurnScheduler(width=4, teams=TEAMS).run_round(turns, engage))
+
+    assert list(responses.values()) == ["1", "2", "3", "4"]
+    assert finished.index("1") < finished.index("3") and finished.index("2") < finished.index("4")
+    assert report.depth == 2
+    assert report.makespan_seconds < report.serial_seconds
+
+
+def test_serialised_work_bounds_the_critical_path():
+    turns = [turn("A", "1"), turn("B", "2")]
+    lock = threading.RLock()
+
+    def umpire_work():
+        with serialized(lock):
+            time.sleep(0.05)
+
+    async def engage(current):
+        await asyncio.to_thread(umpire_work)
+        return current["PLAYER"]
+
+    _, report = asyncio.run(TurnScheduler(width=2, teams=TEAMS).run_round(turns, engage))
+
+    assert report.serialized_seconds >= 0.1
+    assert report.critical_path_seconds >= report.serialized_seconds
+    # Waiting for the other turn's serialised work is not counted as turn time
+    assert report.speedup < 1.5
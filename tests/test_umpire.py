@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from WargamesAI.coordination.umpire import MAX_ACTION_ATTEMPTS, Umpire
+
+
+def ask(umpire, use_async):
+    if use_async:
+        return asyncio.run(umpire._ask_player_for_action_async("A", "1", "Advance."))
+    return umpire._ask_player_for_action("A", "1", "Advance.")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_players_are_asked_again_until_their_action_is_legal(build_game, fake_backend, monkeypatch, use_async):
+    _, umpire = build_game()
+    verdicts = iter([False, False, True])
+    monkeypatch.setattr(Umpire, "_check_legality_of_action", lambda self, action: next(verdicts))
+    asked = len(fake_backend.questions)
+
+    response = ask(umpire, use_async)
+
+    assert response["ACTION"].startswith("act")
+    assert umpire.actions[-1] == response
+    retries = [question for question in fake_backend.questions[asked:] if "deemed not legal" in question]
+    assert len(retries) == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_players_that_never_act_legally_give_up(build_game, fake_backend, monkeypatch, use_async):
+    _, umpire = build_game()
+    checks = []
+    monkeypatch.setattr(Umpire, "_check_legality_of_action", lambda self, action: checks.append(action) and False)
+
+    assert ask(umpire, use_async) is False
+    assert len(checks) == MAX_ACTION_ATTEMPTS
+    assert not umpire.actions
@@ -0,0 +1,55 @@
+from WargamesAI.coordination.verdicts import VerdictCache, action_digest
+from WargamesAI.utils.verdict_engine import VerdictEngine, describe_action
+
+
+def test_equivalent_actions_share_a_digest():
+    assert action_digest({"ACTION": "Attack  North"}) == action_digest({"action": "attack north"})
+    assert action_digest({"ACTION": "attack north"}) != action_digest({"ACTION": "attack south"})
+
+
+def test_actions_are_described_for_scoring_and_digests():
+    action = {"ACTION": "Attack\n north", "RATIONALE": "they are weak", "TARGETS": ["Red", "Umpire"]}
+    assert describe_action(action) == "Attack\n north because they are weak"
+    assert describe_action(action, rationale=False, targets=True, max_chars=80) == "Attack north (targets: Red, Umpire)"
+    assert describe_action(action, rationale=False, max_chars=8) == "Attac..."
+
+
+def test_cache_is_keyed_by_state_and_bounded():
+    cache = VerdictCache(max_entries=2)
+    first = cache.key({"ACTION": "advance"}, {"round": 1})
+    cache.put(first, True)
+
+    assert cache.get(first) is True
+    assert cache.get(cache.key({"ACTION": "advance"}, {"round": 2})) is None
+
+    cache.put(cache.key("b", {}), False)
+    cache.put(cache.key("c", {}), False)
+    assert cache.get(first) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_umpire_judges_a_resubmitted_action_once(build_game, fake_backend, monkeypatch):
+    judged = []
+    judge = VerdictEngine.judge
+
+    def counting_judge(self, *args, **kwargs):
+        judged.append(args)
+        return judge(self, *args, **kwargs)
+
+    monkeypatch.setattr(VerdictEngine, "judge", counting_judge)
+    _, umpire = build_game()
+
+    assert umpire._check_legality_of_action({"ACTION": "Attack  North"})
+    assert umpire._check_legality_of_action({"ACTION": "attack north"})
+    assert len(judged) == 1
+    assert umpire.verdict_cache.stats()["hits"] == 1
+
+
+def test_forbidden_actions_are_refused(build_game, fake_backend):
+    _, umpire = build_game()
+    engine = umpire.verdict_engine
+    verdict = engine.judge(
+        "A player does the following: move the infantry five hexes across the map in one turn", "rules.pdf"
+    )
+    assert not verdict.allowed
+    assert engine.calibration is not None